@@ -6,6 +6,7 @@ from pprint import pformat
 
 from .plugins import TouchDesigner
 from .container import TDGamContainer
+from .optable import OpTable
 
 
 class TDGamComponent(TDGamContainer):
@@ -36,8 +37,8 @@ class TDGamComponent(TDGamContainer):
             logging.error("Nothing selected!")
 
         self.type = "touchdesigner"  # planning ahead for Nuke UI...
-        # convert raw selection into useable TDGamComponentUI dict.
-        self.selection = self.convert_selection(selection)
+        # convert raw selection into a columnar table of op data.
+        self.ops = OpTable.from_selection(self.convert_selection(selection))
         self.parent_op = selection[0].parent()
         self.__setup()
 
@@ -46,6 +47,24 @@ class TDGamComponent(TDGamContainer):
             name=self.name,
             repo_dir=self.folder())
 
+    @property
+    def selection(self):
+        """Nested selection-data rebuilt from the component's op table.
+
+        :return: list of ParDict's with children nested under their parents.
+        :rtype:  list
+        """
+        return self.ops.to_selection()
+
+    @selection.setter
+    def selection(self, selection):
+        """Replace the component's op table with new selection-data.
+
+        :param selection: list of ParDict's, possibly with 'children' keys.
+        :type  selection: list
+        """
+        self.ops = OpTable.from_selection(selection)
+
     def rip_node_params(self):
         """Convert the current selection into tdgam ParDict.
 
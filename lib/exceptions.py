@@ -66,3 +66,22 @@ class GamPluginException(Exception):
 
     def __repr__(self):
         return self.msg
+
+
+class TDGamPackageException(Exception):
+    """Unable to read or write a TDGam component package."""
+
+    def __init__(self, msg, package_path=None):
+        """Initialize with a message, and the offending package path.
+
+        :param msg: exception message.
+        :type  msg: str
+        :param package_path: path to the offending package file.
+        :type  package_path: str
+        """
+        super(TDGamPackageException, self).__init__()
+        self.msg = msg
+        self.package_path = package_path
+
+    def __repr__(self):
+        return self.msg
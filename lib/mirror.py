@@ -0,0 +1,303 @@
+"""Machine-wide cache of bare mirrors of component remotes.
+
+Working copies of shared components are cloned from a local mirror instead
+of the remote, so importing the same component into several projects only
+hits the network once. Local clones hardlink the mirror's objects, shallow
+and partial (filtered) clones go through git's file:// transport.
+"""
+import hashlib
+import os
+from os import path as osp
+import re
+import shutil
+import time
+
+import git
+
+MIRROR_CACHE_PATH = osp.join(osp.expanduser("~"), "tdgam_mirrors")
+
+# file touched inside a mirror each time it's used, drives eviction order.
+ACCESS_MARKER = "tdgam_last_access"
+# file touched inside a mirror each time it's fetched from its remote.
+FETCH_MARKER = "tdgam_last_fetch"
+# file inside a mirror holding its size on disk, updated on every fetch.
+SIZE_MARKER = "tdgam_size"
+
+
+def remote_repo_name(remote_url):
+    """Retrieve the name of a remote repo from its url.
+
+    :param remote_url: the url of the remote repo.
+    :type  remote_url: str
+    :return: the repo name, ex: 'my_component' for '.../my_component.git'.
+    :rtype:  str
+    """
+    return re.sub(r"\.git$", "", remote_url.rstrip("/\\").split("/")[-1])
+
+
+def dir_size(path):
+    """Calculate the size on disk of all files in a directory-tree.
+
+    :param path: the path of the directory-tree.
+    :type  path: str
+    :return: size in bytes.
+    :rtype:  int
+    """
+    total = 0
+
+    for dir_path, _, filenames in os.walk(path):
+
+        for filename in filenames:
+
+            filepath = osp.join(dir_path, filename)
+            if not osp.islink(filepath):
+                total += osp.getsize(filepath)
+
+    return total
+
+
+class TDGamMirrorCache(object):
+    """Manage bare mirrors of remote component repos in a local directory."""
+
+    def __init__(self, cache_dir=MIRROR_CACHE_PATH,
+                 max_bytes=2 * 1024 ** 3, refresh_interval=300):
+        """Initialize with a cache directory and its size budget.
+
+        :param cache_dir: directory holding the mirrors.
+        :type  cache_dir: str
+        :param max_bytes: size budget, least recently used mirrors past it
+            are evicted.
+        :type  max_bytes: int
+        :param refresh_interval: seconds during which a fetched mirror is
+            considered fresh and isn't fetched again.
+        :type  refresh_interval: int
+        """
+        super(TDGamMirrorCache, self).__init__()
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+
+        if not osp.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def __repr__(self):
+        return "<TDGamMirrorCache: {cache_dir}>".format(
+            cache_dir=self.cache_dir)
+
+    def mirror_path(self, remote_url):
+        """Retrieve the path of the mirror for a remote url.
+
+        :param remote_url: the url of the remote repo.
+        :type  remote_url: str
+        :return: path to the bare mirror, whether it exists or not.
+        :rtype:  str
+        """
+        url_hash = hashlib.sha1(remote_url.encode("utf-8")).hexdigest()[:12]
+
+        return osp.join(self.cache_dir, "{}_{}.git".format(
+            remote_repo_name(remote_url), url_hash))
+
+    def mirror(self, remote_url, force_fetch=False):
+        """Create or refresh the mirror of a remote repo.
+
+        New mirrors are cloned in full with `--mirror`, existing ones are
+        fetched incrementally unless they were fetched less than
+        refresh_interval seconds ago.
+
+        :param remote_url: the url of the remote repo.
+        :type  remote_url: str
+        :param force_fetch: flag to fetch even if the mirror is fresh.
+        :type  force_fetch: bool
+        :return: the mirror repo.
+        :rtype:  git.Repo
+        """
+        mirror_path = self.mirror_path(remote_url)
+
+        if not osp.isdir(mirror_path):
+            mirror_repo = git.Repo.clone_from(
+                remote_url, mirror_path, mirror=True)
+            # allow filtered (partial) clones of the mirror.
+            with mirror_repo.config_writer() as config:
+                config.set_value("uploadpack", "allowFilter", "true")
+            self._touch(mirror_path, FETCH_MARKER)
+            self._record_size(mirror_path)
+
+        else:
+            mirror_repo = git.Repo(mirror_path)
+            if force_fetch or not self.is_fresh(remote_url):
+                mirror_repo.git.fetch("--prune", "origin")
+                self._touch(mirror_path, FETCH_MARKER)
+                self._record_size(mirror_path)
+
+        self._touch(mirror_path, ACCESS_MARKER)
+        self.evict(keep=[mirror_path])
+
+        return mirror_repo
+
+    def is_fresh(self, remote_url):
+        """Check if a mirror was fetched within the refresh interval.
+
+        :param remote_url: the url of the remote repo.
+        :type  remote_url: str
+        :return: True if the mirror exists and doesn't need a fetch.
+        :rtype:  bool
+        """
+        marker = osp.join(self.mirror_path(remote_url), FETCH_MARKER)
+        if not osp.isfile(marker):
+            return False
+
+        return time.time() - osp.getmtime(marker) < self.refresh_interval
+
+    def clone(self, remote_url, target_dir, depth=None, filter_spec=None,
+              branch=None):
+        """Create a working copy of a remote repo from its local mirror.
+
+        The working copy's origin points back at the remote url, so pushes
+        go to the remote. Update it through the mirror with `pull`.
+
+        :param remote_url: the url of the remote repo.
+        :type  remote_url: str
+        :param target_dir: directory of the working copy to create.
+        :type  target_dir: str
+        :param depth: create a shallow clone with this many commits.
+        :type  depth: int
+        :param filter_spec: partial clone filter, ex: 'blob:none'.
+        :type  filter_spec: str
+        :param branch: the branch to check out, defaults to the remote HEAD.
+        :type  branch: str
+        :return: the working copy repo.
+        :rtype:  git.Repo
+        """
+        mirror_path = self.mirror(remote_url).git_dir
+        kwargs = {}
+
+        if branch:
+            kwargs["branch"] = branch
+
+        if depth or filter_spec:
+            # shallow and filtered clones are ignored for plain local paths.
+            source = "file://" + mirror_path.replace(os.sep, "/")
+            if depth:
+                kwargs["depth"] = depth
+            if filter_spec:
+                kwargs["filter"] = filter_spec
+        else:
+            # local clones hardlink the mirror's object files.
+            source = mirror_path
+            kwargs["local"] = True
+
+        repo = git.Repo.clone_from(source, target_dir, **kwargs)
+        repo.remotes.origin.set_url(remote_url)
+
+        return repo
+
+    def pull(self, repo, remote_url, branch=None):
+        """Update a working copy from the local mirror of its remote.
+
+        The mirror is refreshed first, then its branches are fetched into
+        the working copy's origin remote-tracking branches and the given
+        branch is merged, like a `git pull` from the remote would.
+
+        :param repo: the working copy to update.
+        :type  repo: git.Repo
+        :param remote_url: the url of the remote repo.
+        :type  remote_url: str
+        :param branch: the branch to merge, defaults to the active branch.
+        :type  branch: str
+        :return: the working copy repo.
+        :rtype:  git.Repo
+        """
+        mirror_path = self.mirror(remote_url).git_dir
+        branch = branch or repo.active_branch.name
+
+        repo.git.fetch(mirror_path, "+refs/heads/*:refs/remotes/origin/*")
+        repo.git.merge("origin/" + branch)
+
+        return repo
+
+    def size(self, mirror_path):
+        """Retrieve the size on disk of a mirror.
+
+        The size is recorded each time the mirror is cloned or fetched, it
+        is only measured here for mirrors without a recorded size.
+
+        :param mirror_path: path to the bare mirror.
+        :type  mirror_path: str
+        :return: size in bytes.
+        :rtype:  int
+        """
+        try:
+            with open(osp.join(mirror_path, SIZE_MARKER)) as size_file:
+                return int(size_file.read())
+
+        except (IOError, OSError, ValueError):
+            return self._record_size(mirror_path)
+
+    def mirrors(self):
+        """Retrieve the paths of all cached mirrors.
+
+        :return: list of mirror paths, least recently used first.
+        :rtype:  list
+        """
+        mirror_paths = [
+            osp.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".git")
+            and osp.isdir(osp.join(self.cache_dir, name))
+        ]
+
+        return sorted(mirror_paths, key=self._last_access)
+
+    def evict(self, keep=()):
+        """Remove least recently used mirrors until within the size budget.
+
+        :param keep: mirror paths that must not be evicted.
+        :type  keep: iterable
+        :return: paths of the evicted mirrors.
+        :rtype:  list
+        """
+        mirror_paths = self.mirrors()
+        sizes = dict((path, self.size(path)) for path in mirror_paths)
+        total = sum(sizes.values())
+        evicted = []
+
+        for mirror_path in mirror_paths:
+
+            if total <= self.max_bytes:
+                break
+
+            if mirror_path in keep:
+                continue
+
+            shutil.rmtree(mirror_path)
+            total -= sizes[mirror_path]
+            evicted.append(mirror_path)
+
+        return evicted
+
+    @staticmethod
+    def _last_access(mirror_path):
+        """Retrieve the time a mirror was last used."""
+        marker = osp.join(mirror_path, ACCESS_MARKER)
+        if osp.isfile(marker):
+            return osp.getmtime(marker)
+
+        return osp.getmtime(mirror_path)
+
+    @staticmethod
+    def _record_size(mirror_path):
+        """Measure a mirror's size on disk and store it inside the mirror."""
+        size = dir_size(mirror_path)
+        with open(osp.join(mirror_path, SIZE_MARKER), "w") as size_file:
+            size_file.write(str(size))
+
+        return size
+
+    @staticmethod
+    def _touch(mirror_path, marker_name):
+        """Update the modification time of a marker file in a mirror."""
+        marker = osp.join(mirror_path, marker_name)
+        with open(marker, "a"):
+            pass
+        os.utime(marker, None)
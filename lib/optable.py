@@ -0,0 +1,327 @@
+"""Columnar in-memory representation of a component's selection-data.
+
+Instead of one nested dict per op, every property lives in its own column:
+interned strings for names and paths, `array`-backed columns for class ids,
+node coordinates and parent indices, and a parameter store shared by every
+op in the table. Ops are stored in pre-order, parents always come before
+their children, so the nested selection-data can be rebuilt in one pass.
+"""
+from array import array
+from itertools import compress
+import sys
+
+# parent index of ops at the top level of the selection.
+NO_PARENT = -1
+
+
+class OpTable(object):
+    """Column-oriented table of op data for a TDGam component.
+
+    Node coordinates are stored as integers, like Touch Designer's own
+    nodeCenterX/nodeCenterY.
+    """
+
+    def __init__(self):
+        """Initialize an empty table."""
+        super(OpTable, self).__init__()
+
+        self.names = []
+        self.paths = []
+        self.class_ids = array("H")
+        self.node_x = array("l")
+        self.node_y = array("l")
+        self.parents = array("l")
+        # 1 if the op's ParDict carried a 'children' key, even when empty.
+        self.has_children = array("b")
+        self.inputs = []
+        self.outputs = []
+
+        # class name <-> class id
+        self.class_names = []
+        self._class_ids_by_name = {}
+
+        # shared parameter store, op i owns par slots
+        # par_offsets[i]:par_offsets[i + 1] of par_name_ids/par_value_ids.
+        self.par_offsets = array("L", [0])
+        self.par_name_ids = array("L")
+        self.par_value_ids = array("L")
+        self._par_names = []
+        self._par_name_ids = {}
+        self._par_values = []
+        self._par_value_ids = {}
+
+        self._index_by_path = {}
+        # parent row index -> row indices of its direct children, in order.
+        self._child_indices = {NO_PARENT: []}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return "<OpTable: {count} ops, {classes} classes>".format(
+            count=len(self),
+            classes=len(self.class_names))
+
+    @classmethod
+    def from_selection(cls, selection):
+        """Build a table from nested selection-data.
+
+        :param selection: list of ParDict's, possibly with 'children' keys.
+        :type  selection: list
+        :return: the table holding every op of the selection.
+        :rtype:  TDGam.OpTable
+        """
+        table = cls()
+        table.extend(selection)
+
+        return table
+
+    def extend(self, selection, parent=NO_PARENT):
+        """Append nested selection-data to the table.
+
+        :param selection: list of ParDict's, possibly with 'children' keys.
+        :type  selection: list
+        :param parent: row index of the op the selection is nested in.
+        :type  parent: int
+        """
+        for op_data in selection:
+
+            index = self.append(op_data, parent)
+            if "children" in op_data:
+                self.extend(op_data["children"], index)
+
+    def append(self, op_data, parent=NO_PARENT):
+        """Append a single op, ignoring its children.
+
+        :param op_data: the ParDict of the op.
+        :type  op_data: dict
+        :param parent: row index of the op this op is nested in.
+        :type  parent: int
+        :return: the row index of the appended op.
+        :rtype:  int
+        """
+        index = len(self.paths)
+        path = sys.intern(op_data["path"])
+
+        self.names.append(sys.intern(op_data["name"]))
+        self.paths.append(path)
+        self.class_ids.append(self._class_id(op_data["class_name"]))
+        node_x, node_y = op_data.get("nodeCenter", (0, 0))
+        self.node_x.append(int(node_x))
+        self.node_y.append(int(node_y))
+        self.parents.append(parent)
+        self.has_children.append(1 if "children" in op_data else 0)
+        self.inputs.append(op_data.get("inputs", []))
+        self.outputs.append(op_data.get("outputs", []))
+
+        for par_name, par_value in op_data.get("pars", {}).items():
+
+            self.par_name_ids.append(self._intern(
+                par_name, self._par_names, self._par_name_ids))
+            self.par_value_ids.append(self._intern(
+                par_value, self._par_values, self._par_value_ids))
+
+        self.par_offsets.append(len(self.par_name_ids))
+        self._index_by_path[path] = index
+        self._child_indices.setdefault(parent, []).append(index)
+
+        return index
+
+    def index(self, path):
+        """Retrieve the row index of an op by its td path.
+
+        :param path: td path of the op.
+        :type  path: str
+        :return: the row index, or None if the op isn't in the table.
+        :rtype:  int|None
+        """
+        return self._index_by_path.get(path, None)
+
+    def class_name(self, index):
+        """Retrieve the class name of the op at the given row.
+
+        :param index: row index of the op.
+        :type  index: int
+        :return: the op's class name, ex: 'noiseTOP'.
+        :rtype:  str
+        """
+        return self.class_names[self.class_ids[index]]
+
+    def pars(self, index):
+        """Retrieve the parameters of the op at the given row.
+
+        :param index: row index of the op.
+        :type  index: int
+        :return: par name -> json string of the par's value.
+        :rtype:  dict
+        """
+        start = self.par_offsets[index]
+        end = self.par_offsets[index + 1]
+
+        return dict(zip(
+            (self._par_names[i] for i in self.par_name_ids[start:end]),
+            (self._par_values[i] for i in self.par_value_ids[start:end])))
+
+    def op_data(self, index, recurse=True):
+        """Rebuild the ParDict of the op at the given row.
+
+        :param index: row index of the op.
+        :type  index: int
+        :param recurse: flag to rebuild nested children as well.
+        :type  recurse: bool
+        :return: the op's ParDict.
+        :rtype:  dict
+        """
+        op_data = {
+            "name": self.names[index],
+            "path": self.paths[index],
+            "inputs": self.inputs[index],
+            "outputs": self.outputs[index],
+            "class_name": self.class_name(index),
+            "nodeCenter": [self.node_x[index], self.node_y[index]],
+            "pars": self.pars(index)
+        }
+        if self.has_children[index]:
+            op_data["children"] = [
+                self.op_data(child, recurse) for child in self.children(index)
+            ] if recurse else []
+
+        return op_data
+
+    def to_selection(self):
+        """Rebuild nested selection-data from the table.
+
+        :return: list of ParDict's with children nested under their parents.
+        :rtype:  list
+        """
+        selection = []
+        rebuilt = [None] * len(self)
+
+        for index in range(len(self)):
+
+            op_data = self.op_data(index, recurse=False)
+            rebuilt[index] = op_data
+
+            parent = self.parents[index]
+            if parent == NO_PARENT:
+                selection.append(op_data)
+            else:
+                rebuilt[parent]["children"].append(op_data)
+
+        return selection
+
+    def top_level(self):
+        """Retrieve the row indices of ops not nested in another op.
+
+        :return: list of row indices.
+        :rtype:  list
+        """
+        return self.children(NO_PARENT)
+
+    def children(self, index):
+        """Retrieve the row indices of ops directly nested in the given op.
+
+        :param index: row index of the parent op.
+        :type  index: int
+        :return: list of row indices.
+        :rtype:  list
+        """
+        return list(self._child_indices.get(index, ()))
+
+    def filter_class(self, class_name):
+        """Retrieve the row indices of all ops of the given class.
+
+        :param class_name: the class name to filter on, ex: 'noiseTOP'.
+        :type  class_name: str
+        :return: list of row indices.
+        :rtype:  list
+        """
+        class_id = self._class_ids_by_name.get(class_name, None)
+        if class_id is None:
+            return []
+
+        return list(compress(
+            range(len(self)), (id_ == class_id for id_ in self.class_ids)))
+
+    def centroid(self, indices=None):
+        """Calculate the average node center of the given ops.
+
+        :param indices: row indices to average, defaults to the top level.
+        :type  indices: list
+        :return: x, y positions
+        :rtype:  tuple
+        """
+        if indices is None:
+            indices = self.top_level()
+
+        if not indices:
+            return 0, 0
+
+        x_sum = sum(self.node_x[i] for i in indices)
+        y_sum = sum(self.node_y[i] for i in indices)
+
+        return int(x_sum / len(indices)), int(y_sum / len(indices))
+
+    def bounds(self, indices=None):
+        """Calculate the bounding node centers of the given ops.
+
+        :param indices: row indices to measure, defaults to the top level.
+        :type  indices: list
+        :return: leftmost, bottommost, rightmost, topmost positions.
+        :rtype:  tuple
+        """
+        if indices is None:
+            indices = self.top_level()
+
+        if not indices:
+            return 0, 0, 0, 0
+
+        xs = [self.node_x[i] for i in indices]
+        ys = [self.node_y[i] for i in indices]
+
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def diff(self, other):
+        """Compare this table against another table by op path.
+
+        :param other: the table to compare against, ex: a newer stash.
+        :type  other: TDGam.OpTable
+        :return: added, removed and changed td paths.
+        :rtype:  tuple of lists
+        """
+        added = [path for path in other.paths if self.index(path) is None]
+        removed = [path for path in self.paths if other.index(path) is None]
+        changed = []
+
+        for index, path in enumerate(self.paths):
+
+            other_index = other.index(path)
+            if other_index is None:
+                continue
+
+            if self.class_name(index) != other.class_name(other_index) \
+                    or self.names[index] != other.names[other_index] \
+                    or self.node_x[index] != other.node_x[other_index] \
+                    or self.node_y[index] != other.node_y[other_index] \
+                    or self.inputs[index] != other.inputs[other_index] \
+                    or self.outputs[index] != other.outputs[other_index] \
+                    or self.pars(index) != other.pars(other_index):
+                changed.append(path)
+
+        return added, removed, changed
+
+    def _class_id(self, class_name):
+        """Retrieve the id of a class name, registering it if needed."""
+        return self._intern(
+            class_name, self.class_names, self._class_ids_by_name)
+
+    @staticmethod
+    def _intern(value, values, ids):
+        """Retrieve the id of a value in a pool, adding it if needed."""
+        id_ = ids.get(value, None)
+        if id_ is None:
+            id_ = len(values)
+            values.append(value)
+            ids[value] = id_
+
+        return id_
@@ -0,0 +1,341 @@
+"""TDGam component package, single-file export/import format (.tdgampkg).
+
+Layout of a package file:
+
+    header      magic, format version, manifest offset and size.
+    entries     the raw bytes of every entry, back to back.
+    manifest    json describing every entry: name, offset, size and hash.
+
+The stash entry holds the component's selection-data in the compact binary
+encoding of TDGam.stash, zlib-compressed, asset entries hold the component's
+files as-is. The manifest is written last so packages can be built in a
+single sequential pass, and importing only needs the header and manifest
+before streaming entries out of a memory-map.
+"""
+import hashlib
+import json
+import mmap
+import os
+from os import path as osp
+import struct
+import zlib
+
+from .exceptions import TDGamComponentException
+from .exceptions import TDGamPackageException
+from .stash import selection_from_bytes
+from .stash import selection_to_bytes
+
+PACKAGE_EXT = ".tdgampkg"
+PACKAGE_VERSION = 1
+
+# magic, version, reserved, manifest offset, manifest size
+HEADER = struct.Struct("<8sHHQQ")
+MAGIC = b"TDGAMPKG"
+
+# name of the entry holding the selection-data.
+STASH_ENTRY = "stash"
+# prefix of entries holding the component's asset files.
+ASSET_PREFIX = "assets/"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def write_package(package_path, name, selection, assets=()):
+    """Write a component package to disk.
+
+    :param package_path: path of the package file to create.
+    :type  package_path: str
+    :param name: the name of the component.
+    :type  name: str
+    :param selection: list of ParDict's, possibly with 'children' keys.
+    :type  selection: list
+    :param assets: (relative path, filepath) pairs of files to include.
+    :type  assets: iterable of tuples
+    :return: the path to the package just written.
+    :rtype:  str
+    """
+    entries = []
+
+    with open(package_path, "wb") as package_file:
+
+        # reserve the header, it's rewritten once the manifest is placed.
+        package_file.write(HEADER.pack(MAGIC, PACKAGE_VERSION, 0, 0, 0))
+
+        stash_entry = _write_entry(
+            package_file,
+            STASH_ENTRY,
+            [zlib.compress(selection_to_bytes(selection))],
+            compression="zlib")
+        stash_entry["encoding"] = "binary"
+        entries.append(stash_entry)
+
+        for rel_path, filepath in assets:
+
+            with open(filepath, "rb") as asset_file:
+                entries.append(_write_entry(
+                    package_file,
+                    ASSET_PREFIX + rel_path.replace(os.sep, "/"),
+                    iter(lambda: asset_file.read(CHUNK_SIZE), b"")))
+
+        manifest = json.dumps({
+            "name": name,
+            "version": PACKAGE_VERSION,
+            "entries": entries
+        }, separators=(",", ":")).encode("utf-8")
+
+        manifest_offset = package_file.tell()
+        package_file.write(manifest)
+        package_file.seek(0)
+        package_file.write(HEADER.pack(
+            MAGIC, PACKAGE_VERSION, 0, manifest_offset, len(manifest)))
+
+    return package_path
+
+
+def _write_entry(package_file, name, chunks, compression=None):
+    """Append one entry's bytes to an open package and describe it.
+
+    :param package_file: the package file being written.
+    :type  package_file: file
+    :param name: the entry name stored in the manifest.
+    :type  name: str
+    :param chunks: the entry's bytes, as stored in the package.
+    :type  chunks: iterable of bytes
+    :param compression: compression applied to the bytes, if any.
+    :type  compression: str|None
+    :return: the manifest record for the entry.
+    :rtype:  dict
+    """
+    offset = package_file.tell()
+    sha = hashlib.sha256()
+
+    for chunk in chunks:
+
+        sha.update(chunk)
+        package_file.write(chunk)
+
+    return {
+        "name": name,
+        "offset": offset,
+        "size": package_file.tell() - offset,
+        "compression": compression,
+        "sha256": sha.hexdigest()
+    }
+
+
+class TDGamPackage(object):
+    """Read-only view of a .tdgampkg file backed by a memory-map."""
+
+    def __init__(self, package_path):
+        """Open a package and read its manifest.
+
+        :param package_path: path to the package file.
+        :type  package_path: str
+        :raise TDGamPackageException: if the file isn't a valid package.
+        """
+        super(TDGamPackage, self).__init__()
+
+        self.path = package_path
+        self._file = open(package_path, "rb")
+        try:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise TDGamPackageException("Empty package file.", package_path)
+
+        try:
+            self.manifest = self._read_manifest()
+            self._entries = dict(
+                (entry["name"], entry) for entry in self.manifest["entries"])
+
+        except Exception:
+            # don't keep a rejected package open, it'd stay locked on windows.
+            self.close()
+            raise
+
+    def __repr__(self):
+        return "<TDGamPackage: {name}, {path}>".format(
+            name=self.name,
+            path=self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def name(self):
+        """The name of the packaged component."""
+        return self.manifest["name"]
+
+    def close(self):
+        """Release the memory-map and the file handle."""
+        self._map.close()
+        self._file.close()
+
+    def assets(self):
+        """Retrieve the relative paths of all packaged asset files.
+
+        :return: list of relative paths, '/' separated.
+        :rtype:  list
+        """
+        return [entry["name"][len(ASSET_PREFIX):]
+                for entry in self.manifest["entries"]
+                if entry["name"].startswith(ASSET_PREFIX)]
+
+    def stash(self):
+        """Read the packaged selection-data.
+
+        :raise TDGamPackageException: if the stash is missing or corrupt.
+        :return: list of ParDict's, possibly with 'children' keys.
+        :rtype:  list
+        """
+        data = b"".join(self.iter_entry(STASH_ENTRY))
+
+        encoding = self._entries[STASH_ENTRY].get("encoding", None)
+        if encoding != "binary":
+            raise TDGamPackageException(
+                "Unsupported stash encoding: {}".format(encoding), self.path)
+
+        try:
+            return selection_from_bytes(data)
+        except TDGamComponentException as e:
+            raise TDGamPackageException(e.msg, self.path)
+
+    def iter_entry(self, name, verify=True):
+        """Stream an entry's bytes, decompressed, in chunks.
+
+        :param name: the entry name, ex: 'assets/textures/noise.png'.
+        :type  name: str
+        :param verify: flag to check the entry's hash once fully read.
+        :type  verify: bool
+        :raise TDGamPackageException: if the entry is missing or corrupt.
+        :return: generator of byte chunks.
+        :rtype:  generator
+        """
+        entry = self._entries.get(name, None)
+        if entry is None:
+            raise TDGamPackageException(
+                "No entry named: {}".format(name), self.path)
+
+        sha = hashlib.sha256()
+        decompressor = zlib.decompressobj() \
+            if entry["compression"] == "zlib" else None
+        end = entry["offset"] + entry["size"]
+
+        try:
+            for start in range(entry["offset"], end, CHUNK_SIZE):
+
+                chunk = self._map[start:min(start + CHUNK_SIZE, end)]
+                sha.update(chunk)
+                yield decompressor.decompress(chunk) \
+                    if decompressor else chunk
+
+            if decompressor:
+                yield decompressor.flush()
+
+        except zlib.error as e:
+            raise TDGamPackageException(
+                "Corrupt entry: {}, {}".format(name, e), self.path)
+
+        if verify and sha.hexdigest() != entry["sha256"]:
+            raise TDGamPackageException(
+                "Hash mismatch for entry: {}".format(name), self.path)
+
+    def extract_assets(self, target_dir):
+        """Stream every packaged asset file into a directory.
+
+        :param target_dir: the directory to extract into.
+        :type  target_dir: str
+        :raise TDGamPackageException: if an asset would land outside of
+            target_dir, ex: '../x', '..\\x', 'C:x' or through a symlink.
+        :return: list of extracted filepaths.
+        :rtype:  list
+        """
+        extracted = []
+        target_root = osp.realpath(target_dir)
+
+        for rel_path in self.assets():
+
+            filepath = osp.realpath(
+                osp.join(target_root, osp.normpath(rel_path)))
+            if osp.isabs(rel_path) or osp.splitdrive(rel_path)[0] \
+                    or "\\" in rel_path \
+                    or not filepath.startswith(target_root + os.sep):
+                raise TDGamPackageException(
+                    "Unsafe asset path: {}".format(rel_path), self.path)
+
+            if not osp.isdir(osp.dirname(filepath)):
+                os.makedirs(osp.dirname(filepath))
+
+            try:
+                with open(filepath, "wb") as asset_file:
+                    for chunk in self.iter_entry(ASSET_PREFIX + rel_path):
+                        asset_file.write(chunk)
+
+            except TDGamPackageException:
+                # don't leave a corrupt asset behind.
+                os.remove(filepath)
+                raise
+
+            extracted.append(filepath)
+
+        return extracted
+
+    def verify(self):
+        """Check the hash of every entry without extracting anything.
+
+        :return: names of the entries whose hash doesn't match.
+        :rtype:  list
+        """
+        corrupt = []
+
+        for entry in self.manifest["entries"]:
+
+            try:
+                for _ in self.iter_entry(entry["name"]):
+                    pass
+
+            except TDGamPackageException:
+                corrupt.append(entry["name"])
+
+        return corrupt
+
+    def _read_manifest(self):
+        """Read and validate the header, then parse the manifest.
+
+        :raise TDGamPackageException: if the header or manifest is invalid.
+        :return: the package manifest.
+        :rtype:  dict
+        """
+        if len(self._map) < HEADER.size:
+            raise TDGamPackageException("Truncated package header.", self.path)
+
+        magic, version, _, offset, size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise TDGamPackageException("Not a TDGam package.", self.path)
+
+        if version > PACKAGE_VERSION:
+            raise TDGamPackageException(
+                "Unsupported package version: {}".format(version), self.path)
+
+        if offset + size > len(self._map):
+            raise TDGamPackageException("Truncated package.", self.path)
+
+        try:
+            manifest = json.loads(
+                self._map[offset:offset + size].decode("utf-8"))
+        except ValueError as e:
+            # UnicodeDecodeError and json's decode errors alike.
+            raise TDGamPackageException(
+                "Corrupt manifest: {}".format(e), self.path)
+
+        if not isinstance(manifest, dict) \
+                or not isinstance(manifest.get("entries", None), list) \
+                or not all(isinstance(entry, dict) and "name" in entry
+                           for entry in manifest["entries"]):
+            raise TDGamPackageException("Corrupt manifest.", self.path)
+
+        return manifest
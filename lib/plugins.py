@@ -8,6 +8,7 @@ import json
 from .utilities import td_class_from_string
 from .exceptions import TDGamInvalidParameterValue
 from .exceptions import GamPluginException
+from .stash import RECURSABLE_CLASSES
 
 PLUGIN = None
 try:
@@ -84,10 +85,6 @@ class TouchDesigner(object):
         :return: list of dicts of jsonified op data.
         :rtype:  list
         """
-        recursables = ["containerCOMP",
-                       "baseCOMP",
-                       "geometryCOMP",
-                       "lightCOMP"]
         converted_selection = []
         for op_ in selection:
 
@@ -95,7 +92,7 @@ class TouchDesigner(object):
 
             # if this is a recursable op-type, create the 'children' key, and
             # recursively populate
-            if op_.__class__.__name__ in recursables:
+            if op_.__class__.__name__ in RECURSABLE_CLASSES:
                 converted_op["children"] = \
                     cls._recursive_get_op_data(op_.children)
 
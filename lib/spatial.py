@@ -0,0 +1,235 @@
+"""Spatial index over node bounding boxes of an op network.
+
+Boxes are bucketed into a uniform grid of square cells, so rect queries,
+nearest-node and free-slot searches only visit the cells around the area
+of interest instead of every node in the network.
+"""
+from math import hypot
+
+# default size of a node in a Touch Designer network.
+NODE_WIDTH = 130
+NODE_HEIGHT = 90
+
+
+class SpatialIndex(object):
+    """Uniform grid of node bounding boxes, keyed by td path."""
+
+    def __init__(self, cell_size=256):
+        """Initialize an empty index.
+
+        :param cell_size: width and height of a grid cell, in network units.
+        :type  cell_size: int
+        """
+        super(SpatialIndex, self).__init__()
+
+        self.cell_size = cell_size
+        # key -> (left, bottom, right, top)
+        self.boxes = {}
+        # (column, row) -> set of keys whose box touches the cell
+        self._cells = {}
+        # min column, min row, max column, max row of all cells ever used.
+        self._extent = None
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __repr__(self):
+        return "<SpatialIndex: {count} nodes, {cells} cells>".format(
+            count=len(self),
+            cells=len(self._cells))
+
+    def insert(self, key, x, y, width=NODE_WIDTH, height=NODE_HEIGHT):
+        """Add or move a node's bounding box.
+
+        :param key: the node's key, usually its td path.
+        :type  key: str
+        :param x: node center x.
+        :type  x: int
+        :param y: node center y.
+        :type  y: int
+        :param width: node width.
+        :type  width: int
+        :param height: node height.
+        :type  height: int
+        """
+        if key in self.boxes:
+            self.remove(key)
+
+        box = (x - width / 2.0, y - height / 2.0,
+               x + width / 2.0, y + height / 2.0)
+        self.boxes[key] = box
+
+        cells = self._cells_of(box)
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(key)
+
+        first, last = cells[0], cells[-1]
+        if self._extent is None:
+            self._extent = [first[0], first[1], last[0], last[1]]
+        else:
+            self._extent = [min(self._extent[0], first[0]),
+                            min(self._extent[1], first[1]),
+                            max(self._extent[2], last[0]),
+                            max(self._extent[3], last[1])]
+
+    def remove(self, key):
+        """Remove a node's bounding box.
+
+        :param key: the node's key, usually its td path.
+        :type  key: str
+        """
+        box = self.boxes.pop(key, None)
+        if box is None:
+            return
+
+        for cell in self._cells_of(box):
+
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    def query_rect(self, left, bottom, right, top):
+        """Retrieve the keys of nodes overlapping a rect.
+
+        :return: set of keys.
+        :rtype:  set
+        """
+        first, last = self._cell_at(left, bottom), self._cell_at(right, top)
+        cell_count = (last[0] - first[0] + 1) * (last[1] - first[1] + 1)
+        if cell_count > len(self.boxes):
+            # rect is larger than the network, checking every box is cheaper.
+            candidates = self.boxes
+        else:
+            candidates = set()
+            for cell in self._cells_of((left, bottom, right, top)):
+                candidates.update(self._cells.get(cell, ()))
+
+        found = set()
+        for key in candidates:
+
+            box = self.boxes[key]
+            if box[0] < right and box[2] > left \
+                    and box[1] < top and box[3] > bottom:
+                found.add(key)
+
+        return found
+
+    def nearest(self, x, y):
+        """Retrieve the key of the node whose center is nearest a point.
+
+        Grid rings are searched outwards from the point's cell, stopping
+        once no closer node can exist in the remaining rings.
+
+        :param x: point x.
+        :type  x: int
+        :param y: point y.
+        :type  y: int
+        :return: the nearest key, or None if the index is empty.
+        :rtype:  str|None
+        """
+        if not self.boxes:
+            return None
+
+        column, row = self._cell_at(x, y)
+        max_radius = self._max_radius(column, row)
+        best_key = None
+        best_distance = None
+
+        for radius in range(max_radius + 1):
+
+            for cell in self._ring(column, row, radius):
+
+                for key in self._cells.get(cell, ()):
+
+                    box = self.boxes[key]
+                    distance = hypot((box[0] + box[2]) / 2.0 - x,
+                                     (box[1] + box[3]) / 2.0 - y)
+                    if best_distance is None or distance < best_distance:
+                        best_key = key
+                        best_distance = distance
+
+            # nodes in further rings are at least this far away.
+            if best_distance is not None \
+                    and best_distance <= radius * self.cell_size:
+                break
+
+        return best_key
+
+    def free_slot(self, x, y, width=NODE_WIDTH, height=NODE_HEIGHT,
+                  margin=20):
+        """Find the free position nearest a point for a box of given size.
+
+        Candidate positions are laid out on a grid of the box's size around
+        the point and tried ring by ring, nearest ring first.
+
+        :param x: desired center x.
+        :type  x: int
+        :param y: desired center y.
+        :type  y: int
+        :param width: width of the box to place.
+        :type  width: int
+        :param height: height of the box to place.
+        :type  height: int
+        :param margin: minimum gap kept around the box.
+        :type  margin: int
+        :return: x, y center of the free slot.
+        :rtype:  tuple
+        """
+        step_x = width + margin
+        step_y = height + margin
+        half_w = step_x / 2.0
+        half_h = step_y / 2.0
+        radius = 0
+
+        while True:
+
+            candidates = sorted(
+                ((x + i * step_x, y + j * step_y)
+                 for i, j in self._ring(0, 0, radius)),
+                key=lambda pos: hypot(pos[0] - x, pos[1] - y))
+
+            for pos_x, pos_y in candidates:
+
+                if not self.query_rect(pos_x - half_w, pos_y - half_h,
+                                       pos_x + half_w, pos_y + half_h):
+                    return int(pos_x), int(pos_y)
+
+            radius += 1
+
+    def _cell_at(self, x, y):
+        """Retrieve the grid cell containing a point."""
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _cells_of(self, box):
+        """Retrieve every grid cell a box touches."""
+        left, bottom = self._cell_at(box[0], box[1])
+        right, top = self._cell_at(box[2], box[3])
+
+        return [(column, row)
+                for column in range(left, right + 1)
+                for row in range(bottom, top + 1)]
+
+    def _max_radius(self, column, row):
+        """Retrieve the ring radius covering every occupied cell."""
+        left, bottom, right, top = self._extent
+
+        return max(abs(left - column), abs(right - column),
+                   abs(bottom - row), abs(top - row))
+
+    @staticmethod
+    def _ring(column, row, radius):
+        """Retrieve the cells at exactly `radius` cells from a cell."""
+        if radius == 0:
+            return [(column, row)]
+
+        ring = []
+        for offset in range(-radius, radius + 1):
+            ring.append((column + offset, row - radius))
+            ring.append((column + offset, row + radius))
+
+        for offset in range(-radius + 1, radius):
+            ring.append((column - radius, row + offset))
+            ring.append((column + radius, row + offset))
+
+        return ring
@@ -0,0 +1,335 @@
+"""TDGam stash serialization.
+
+Converts selection-data (the nested ParDict lists produced by the plugins)
+to and from the tab-separated text used by stash tableDAT's. The whole
+table is built in memory so it can be assigned to a tableDAT in a single
+operation instead of one `appendRow` per op.
+
+Packages store selection-data in a compact binary encoding instead: every
+distinct string (paths, names, par names and values) is written once to a
+string table, values are tagged and reference strings by index, integers
+and lengths are varints.
+"""
+import json
+import struct
+
+from .exceptions import TDGamComponentException
+
+# column order of a stash tableDAT, first row of the table.
+STASH_COLUMNS = [
+    "path",
+    "parent",
+    "name",
+    "class_name",
+    "nodeCenter",
+    "inputs",
+    "outputs",
+    "pars"
+]
+
+# columns whose cells hold json instead of plain strings.
+JSON_COLUMNS = ["nodeCenter", "inputs", "outputs", "pars"]
+
+# op classes whose ParDict's always carry a 'children' key, even when empty.
+RECURSABLE_CLASSES = [
+    "containerCOMP",
+    "baseCOMP",
+    "geometryCOMP",
+    "lightCOMP"
+]
+
+
+def flatten_selection(selection, parent=""):
+    """Flatten nested selection-data into path-addressed rows.
+
+    Every op, including nested children, gets its own row. Children point
+    back to the op they were nested in through the 'parent' column.
+
+    :param selection: list of ParDict's, possibly with 'children' keys.
+    :type  selection: list
+    :param parent: td path of the op the selection is nested in.
+    :type  parent: str
+    :return: generator of row-lists in STASH_COLUMNS order.
+    :rtype:  generator
+    """
+    for op_data in selection:
+
+        row = []
+        for column in STASH_COLUMNS:
+
+            if column == "parent":
+                row.append(parent)
+
+            elif column in JSON_COLUMNS:
+                row.append(json.dumps(op_data.get(column, None)))
+
+            else:
+                row.append(str(op_data.get(column, "")))
+
+        yield row
+
+        if op_data.get("children", None):
+            for child_row in flatten_selection(
+                    op_data["children"], op_data["path"]):
+                yield child_row
+
+
+def selection_to_table_text(selection):
+    """Build the full text of a stash tableDAT from selection-data.
+
+    :param selection: list of ParDict's, possibly with 'children' keys.
+    :type  selection: list
+    :return: tab-separated table text, header row first.
+    :rtype:  str
+    """
+    lines = ["\t".join(STASH_COLUMNS)]
+    lines.extend("\t".join(row) for row in flatten_selection(selection))
+
+    return "\n".join(lines) + "\n"
+
+
+def selection_from_table_text(text):
+    """Rebuild nested selection-data from the text of a stash tableDAT.
+
+    :param text: tab-separated table text, header row first.
+    :type  text: str
+    :raise TDGamComponentException: if the header or a row is malformed.
+    :return: list of ParDict's with children nested under their parents.
+    :rtype:  list
+    """
+    lines = text.splitlines()
+    if not lines:
+        return []
+
+    titles = lines[0].split("\t")
+    missing = [column for column in STASH_COLUMNS if column not in titles]
+    if missing:
+        msg = "Not a stash table, missing columns: {}".format(
+            ", ".join(missing))
+        raise TDGamComponentException(msg)
+
+    selection = []
+    # td path -> ParDict, to nest children under already parsed parents.
+    by_path = {}
+
+    for line_number, line in enumerate(lines[1:], 2):
+
+        if not line:
+            continue
+
+        cells = line.split("\t")
+        if len(cells) != len(titles):
+            msg = "Malformed stash table row {}: expected {} cells, got {}" \
+                .format(line_number, len(titles), len(cells))
+            raise TDGamComponentException(msg)
+
+        row = dict(zip(titles, cells))
+        op_data = {}
+        for column in STASH_COLUMNS:
+
+            if column == "parent":
+                continue
+
+            elif column in JSON_COLUMNS:
+                op_data[column] = json.loads(row[column])
+
+            else:
+                op_data[column] = row[column]
+
+        if op_data["class_name"] in RECURSABLE_CLASSES:
+            op_data["children"] = []
+
+        parent = by_path.get(row["parent"], None)
+        if parent is None:
+            selection.append(op_data)
+        else:
+            parent.setdefault("children", []).append(op_data)
+
+        by_path[op_data["path"]] = op_data
+
+    return selection
+
+
+# tags of the values in a binary stash.
+(TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT,
+ TAG_FLOAT, TAG_STR, TAG_LIST, TAG_DICT) = range(8)
+
+FLOAT = struct.Struct("<d")
+
+
+def selection_to_bytes(selection):
+    """Encode selection-data, or any json-compatible value, to bytes.
+
+    :param selection: list of ParDict's, possibly with 'children' keys.
+    :type  selection: list
+    :return: the string table followed by the encoded value.
+    :rtype:  bytes
+    """
+    strings = []
+    string_ids = {}
+    values = bytearray()
+    _encode_value(selection, values, strings, string_ids)
+
+    data = bytearray()
+    _encode_varint(len(strings), data)
+    for string in strings:
+
+        encoded = string.encode("utf-8")
+        _encode_varint(len(encoded), data)
+        data.extend(encoded)
+
+    data.extend(values)
+
+    return bytes(data)
+
+
+def selection_from_bytes(data):
+    """Decode selection-data written by `selection_to_bytes`.
+
+    :param data: the encoded selection-data.
+    :type  data: bytes
+    :raise TDGamComponentException: if the data is truncated or malformed.
+    :return: list of ParDict's, possibly with 'children' keys.
+    :rtype:  list
+    """
+    data = bytes(data)
+    try:
+        count, offset = _decode_varint(data, 0)
+        strings = []
+        for _ in range(count):
+
+            size, offset = _decode_varint(data, offset)
+            if offset + size > len(data):
+                raise IndexError(offset + size)
+            strings.append(data[offset:offset + size].decode("utf-8"))
+            offset += size
+
+        selection, offset = _decode_value(data, offset, strings)
+
+    except (IndexError, KeyError, UnicodeDecodeError, struct.error) as e:
+        msg = "Malformed binary stash: {}".format(e)
+        raise TDGamComponentException(msg)
+
+    if offset != len(data):
+        msg = "Malformed binary stash: {} trailing bytes".format(
+            len(data) - offset)
+        raise TDGamComponentException(msg)
+
+    return selection
+
+
+def _encode_value(value, data, strings, string_ids):
+    """Append a tagged value to data, registering its strings."""
+    if value is None:
+        data.append(TAG_NONE)
+
+    elif value is True or value is False:
+        data.append(TAG_TRUE if value else TAG_FALSE)
+
+    elif isinstance(value, int):
+        data.append(TAG_INT)
+        # zigzag, small negative numbers stay small.
+        _encode_varint(value * 2 if value >= 0 else -value * 2 - 1, data)
+
+    elif isinstance(value, float):
+        data.append(TAG_FLOAT)
+        data.extend(FLOAT.pack(value))
+
+    elif isinstance(value, str):
+        data.append(TAG_STR)
+        _encode_varint(_string_id(value, strings, string_ids), data)
+
+    elif isinstance(value, (list, tuple)):
+        data.append(TAG_LIST)
+        _encode_varint(len(value), data)
+        for item in value:
+            _encode_value(item, data, strings, string_ids)
+
+    elif isinstance(value, dict):
+        data.append(TAG_DICT)
+        _encode_varint(len(value), data)
+        for key, item in value.items():
+            _encode_varint(_string_id(str(key), strings, string_ids), data)
+            _encode_value(item, data, strings, string_ids)
+
+    else:
+        msg = "Can't encode value of type {}: {!r}".format(
+            type(value).__name__, value)
+        raise TDGamComponentException(msg)
+
+
+def _decode_value(data, offset, strings):
+    """Decode the tagged value at offset, return it and the next offset."""
+    tag = data[offset]
+    offset += 1
+
+    if tag == TAG_NONE:
+        return None, offset
+
+    elif tag == TAG_FALSE:
+        return False, offset
+
+    elif tag == TAG_TRUE:
+        return True, offset
+
+    elif tag == TAG_INT:
+        zigzag, offset = _decode_varint(data, offset)
+        return (zigzag >> 1) ^ -(zigzag & 1), offset
+
+    elif tag == TAG_FLOAT:
+        return FLOAT.unpack_from(data, offset)[0], offset + FLOAT.size
+
+    elif tag == TAG_STR:
+        string_id, offset = _decode_varint(data, offset)
+        return strings[string_id], offset
+
+    elif tag == TAG_LIST:
+        count, offset = _decode_varint(data, offset)
+        items = []
+        for _ in range(count):
+            item, offset = _decode_value(data, offset, strings)
+            items.append(item)
+        return items, offset
+
+    elif tag == TAG_DICT:
+        count, offset = _decode_varint(data, offset)
+        items = {}
+        for _ in range(count):
+            string_id, offset = _decode_varint(data, offset)
+            items[strings[string_id]], offset = _decode_value(
+                data, offset, strings)
+        return items, offset
+
+    raise KeyError("unknown tag {}".format(tag))
+
+
+def _string_id(string, strings, string_ids):
+    """Retrieve the index of a string in the table, adding it if needed."""
+    string_id = string_ids.get(string, None)
+    if string_id is None:
+        string_id = len(strings)
+        strings.append(string)
+        string_ids[string] = string_id
+
+    return string_id
+
+
+def _encode_varint(number, data):
+    """Append a non-negative integer to data, 7 bits per byte."""
+    while number > 0x7f:
+        data.append(number & 0x7f | 0x80)
+        number >>= 7
+    data.append(number)
+
+
+def _decode_varint(data, offset):
+    """Decode the varint at offset, return it and the next offset."""
+    number = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return number, offset
+        shift += 7
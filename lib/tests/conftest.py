@@ -0,0 +1,23 @@
+"""Make the td-free TDGam modules importable outside of Touch Designer.
+
+The lib package's __init__ imports the Touch Designer ui, so the tests load
+its modules through a bare package of the same directory instead. Bundled
+third party packages are put on the path like start.py does.
+"""
+from os import path as osp
+import sys
+import types
+
+LIB_DIR = osp.dirname(osp.dirname(osp.abspath(__file__)))
+PACKAGE = "tdgam_lib"
+THIRDPARTY = osp.join(LIB_DIR, "third_party")
+
+for third_party_dir in ("GitPython", "gitdb", "smmap"):
+    third_party_path = osp.join(THIRDPARTY, third_party_dir)
+    if third_party_path not in sys.path:
+        sys.path.append(third_party_path)
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [LIB_DIR]
+    sys.modules[PACKAGE] = package
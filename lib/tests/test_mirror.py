@@ -0,0 +1,138 @@
+"""Tests for the mirror cache, against local bare repos."""
+import os
+from os import path as osp
+import shutil
+import tempfile
+import time
+import unittest
+
+import git
+
+from tdgam_lib.mirror import ACCESS_MARKER
+from tdgam_lib.mirror import dir_size
+from tdgam_lib.mirror import remote_repo_name
+from tdgam_lib.mirror import SIZE_MARKER
+from tdgam_lib.mirror import TDGamMirrorCache
+
+
+class TestMirrorCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = TDGamMirrorCache(osp.join(self.tmp_dir, "mirrors"))
+
+        # the 'remote': a bare repo fed by an authoring working copy.
+        self.remote_url = osp.join(self.tmp_dir, "remote", "noise.git")
+        git.Repo.init(self.remote_url, bare=True)
+        self.author = git.Repo.init(osp.join(self.tmp_dir, "author"))
+        with self.author.config_writer() as config:
+            config.set_value("user", "name", "TDGam")
+            config.set_value("user", "email", "tdgam@example.com")
+        self.author.create_remote("origin", self.remote_url)
+        self.commit("noise.json", "[]")
+        self.author.git.push("origin", "HEAD:refs/heads/master")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def commit(self, filename, text):
+        with open(osp.join(self.author.working_dir, filename), "w") as f:
+            f.write(text)
+        self.author.index.add([filename])
+        return self.author.index.commit("update " + filename)
+
+    def push(self, filename, text):
+        commit = self.commit(filename, text)
+        self.author.git.push("origin", "HEAD:refs/heads/master")
+        return commit
+
+    def test_remote_repo_name(self):
+        self.assertEqual(
+            remote_repo_name("https://github.com/a/noise.git/"), "noise")
+        self.assertEqual(remote_repo_name(self.remote_url), "noise")
+
+    def test_mirror(self):
+        mirror_path = self.cache.mirror_path(self.remote_url)
+        self.assertFalse(self.cache.is_fresh(self.remote_url))
+
+        mirror = self.cache.mirror(self.remote_url)
+        self.assertTrue(mirror.bare)
+        self.assertEqual(mirror.git_dir, mirror_path)
+        self.assertTrue(self.cache.is_fresh(self.remote_url))
+        self.assertEqual(self.cache.mirrors(), [mirror_path])
+        self.assertEqual(
+            mirror.head.commit, self.author.head.commit)
+
+        # fresh mirrors aren't fetched again
+        pushed = self.push("noise.json", "[1]")
+        self.assertNotEqual(
+            self.cache.mirror(self.remote_url).head.commit, pushed)
+        self.assertEqual(self.cache.mirror(
+            self.remote_url, force_fetch=True).head.commit, pushed)
+
+    def test_clone(self):
+        repo = self.cache.clone(
+            self.remote_url, osp.join(self.tmp_dir, "local"))
+        self.assertEqual(repo.head.commit, self.author.head.commit)
+        self.assertEqual(repo.remotes.origin.url, self.remote_url)
+        self.assertTrue(osp.isfile(osp.join(repo.working_dir, "noise.json")))
+
+        self.push("noise.json", "[1]")
+        self.push("noise.json", "[2]")
+        self.cache.mirror(self.remote_url, force_fetch=True)
+        shallow = self.cache.clone(
+            self.remote_url, osp.join(self.tmp_dir, "shallow"), depth=1)
+        self.assertEqual(shallow.head.commit, self.author.head.commit)
+        self.assertEqual(len(list(shallow.iter_commits())), 1)
+
+    def test_pull(self):
+        repo = self.cache.clone(
+            self.remote_url, osp.join(self.tmp_dir, "local"))
+        pushed = self.push("noise.json", "[1]")
+
+        # the remote is only reached through the mirror
+        self.cache.refresh_interval = 0
+        self.cache.pull(repo, self.remote_url)
+        self.assertEqual(repo.head.commit, pushed)
+        self.assertEqual(repo.remotes.origin.refs.master.commit, pushed)
+        self.assertEqual(
+            self.cache.mirror(self.remote_url).head.commit, pushed)
+
+    def test_size(self):
+        mirror_path = self.cache.mirror(self.remote_url).git_dir
+        size = self.cache.size(mirror_path)
+        self.assertGreater(size, 0)
+        self.assertAlmostEqual(size, dir_size(mirror_path), delta=32)
+
+        # the recorded size is used instead of scanning the mirror
+        with open(osp.join(mirror_path, SIZE_MARKER), "w") as f:
+            f.write("42")
+        self.assertEqual(self.cache.size(mirror_path), 42)
+
+        os.remove(osp.join(mirror_path, SIZE_MARKER))
+        self.assertGreater(self.cache.size(mirror_path), 0)
+        self.assertTrue(osp.isfile(osp.join(mirror_path, SIZE_MARKER)))
+
+    def test_evict(self):
+        other_url = osp.join(self.tmp_dir, "remote", "other.git")
+        shutil.copytree(self.remote_url, other_url)
+
+        old_path = self.cache.mirror(other_url).git_dir
+        # make sure the access times differ
+        past = time.time() - 60
+        os.utime(osp.join(old_path, ACCESS_MARKER), (past, past))
+        new_path = self.cache.mirror(self.remote_url).git_dir
+        self.assertEqual(self.cache.mirrors(), [old_path, new_path])
+
+        self.assertEqual(self.cache.evict(), [])
+
+        # least recently used first
+        self.cache.max_bytes = self.cache.size(new_path)
+        self.assertEqual(self.cache.evict(), [old_path])
+        self.assertEqual(self.cache.mirrors(), [new_path])
+
+        # mirroring evicts too, but never the mirror just used
+        self.cache.max_bytes = 0
+        self.cache.mirror(other_url)
+        self.assertEqual(
+            self.cache.mirrors(), [self.cache.mirror_path(other_url)])
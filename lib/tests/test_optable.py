@@ -0,0 +1,97 @@
+"""Tests for the columnar op table."""
+import unittest
+
+from tdgam_lib.optable import NO_PARENT
+from tdgam_lib.optable import OpTable
+
+from test_stash import op_data
+
+
+def selection():
+    """Build nested selection-data with an empty and a nested COMP."""
+    return [
+        op_data("/project1/noise1", nodeCenter=[-200, 150],
+                pars={"seed": "3"}),
+        op_data("/project1/base1", "baseCOMP", nodeCenter=[0, 0], children=[
+            op_data("/project1/base1/in1", "inTOP"),
+            op_data("/project1/base1/geo1", "geometryCOMP", children=[
+                op_data("/project1/base1/geo1/torus1", "torusSOP")
+            ]),
+            op_data("/project1/base1/container1", "containerCOMP",
+                    children=[])
+        ]),
+        op_data("/project1/level1", "levelTOP", nodeCenter=[200, -150],
+                pars={"seed": "3"}),
+    ]
+
+
+class TestOpTable(unittest.TestCase):
+
+    def test_round_trip(self):
+        table = OpTable.from_selection(selection())
+
+        self.assertEqual(len(table), 7)
+        self.assertEqual(table.to_selection(), selection())
+        self.assertEqual(
+            [table.op_data(i) for i in table.top_level()], selection())
+
+    def test_children(self):
+        table = OpTable.from_selection(selection())
+        base = table.index("/project1/base1")
+        geo = table.index("/project1/base1/geo1")
+
+        self.assertEqual(table.top_level(), [0, base, 6])
+        self.assertEqual(table.children(NO_PARENT), table.top_level())
+        self.assertEqual(
+            [table.paths[i] for i in table.children(base)],
+            ["/project1/base1/in1",
+             "/project1/base1/geo1",
+             "/project1/base1/container1"])
+        self.assertEqual(table.children(geo), [geo + 1])
+        self.assertEqual(table.children(0), [])
+
+        # the returned lists are copies
+        table.top_level().append(42)
+        self.assertEqual(table.top_level(), [0, base, 6])
+
+        table.append(op_data("/project1/noise2"))
+        self.assertEqual(table.top_level(), [0, base, 6, 7])
+
+    def test_queries(self):
+        table = OpTable.from_selection(selection())
+
+        self.assertEqual(table.filter_class("baseCOMP"), [1])
+        self.assertEqual(table.filter_class("moviefileinTOP"), [])
+        self.assertEqual(table.centroid(), (0, 0))
+        self.assertEqual(table.bounds(), (-200, -150, 200, 150))
+        # parameter values are pooled across ops
+        self.assertEqual(table.pars(0), table.pars(6))
+        self.assertEqual(len(table.par_value_ids), 2)
+        self.assertEqual(len(set(table.par_value_ids)), 1)
+
+    def test_diff(self):
+        table = OpTable.from_selection(selection())
+        newer = selection()
+        newer[0]["pars"]["seed"] = "4"
+        del newer[2]
+        newer.append(op_data("/project1/null1", "nullTOP"))
+
+        self.assertEqual(
+            table.diff(OpTable.from_selection(newer)),
+            (["/project1/null1"], ["/project1/level1"], ["/project1/noise1"]))
+
+    def test_diff_connections(self):
+        table = OpTable.from_selection(selection())
+        newer = selection()
+        # connect in1 -> geo1 inside base1
+        base_children = newer[1]["children"]
+        base_children[0]["outputs"] = ["/project1/base1/geo1"]
+        base_children[1]["inputs"] = ["/project1/base1/in1"]
+        # a different name stored for the same path
+        newer[2]["name"] = "level2"
+
+        self.assertEqual(
+            table.diff(OpTable.from_selection(newer)),
+            ([], [], ["/project1/base1/in1",
+                      "/project1/base1/geo1",
+                      "/project1/level1"]))
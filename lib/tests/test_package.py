@@ -0,0 +1,192 @@
+"""Round-trip tests for .tdgampkg packages and binary stashes."""
+import json
+import os
+from os import path as osp
+import shutil
+import tempfile
+import unittest
+
+from tdgam_lib.exceptions import TDGamComponentException
+from tdgam_lib.exceptions import TDGamPackageException
+from tdgam_lib.package import ASSET_PREFIX
+from tdgam_lib.package import HEADER
+from tdgam_lib.package import STASH_ENTRY
+from tdgam_lib.package import TDGamPackage
+from tdgam_lib.package import write_package
+from tdgam_lib.stash import selection_from_bytes
+from tdgam_lib.stash import selection_to_bytes
+
+from test_optable import selection
+
+
+class TestBinaryStash(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = selection_to_bytes(selection())
+        self.assertEqual(selection_from_bytes(data), selection())
+        # every path is stored once
+        self.assertLess(len(data), len(json.dumps(selection())))
+
+    def test_values(self):
+        values = [None, True, False, 0, -1, 63, -64, 2 ** 70, -2 ** 70,
+                  0.5, -1e300, "", u"nöise", [], {}, [[1, "a"]],
+                  {"a": {"b": [None, 1.5]}}]
+        self.assertEqual(
+            selection_from_bytes(selection_to_bytes(values)), values)
+
+    def test_malformed(self):
+        data = selection_to_bytes(selection())
+
+        for bad in (b"", data[:-1], data + b"\0", b"\0\x09"):
+            self.assertRaises(
+                TDGamComponentException, selection_from_bytes, bad)
+
+        self.assertRaises(
+            TDGamComponentException, selection_to_bytes, [object()])
+
+
+class TestPackage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.package_path = osp.join(self.tmp_dir, "noise.tdgampkg")
+
+        self.asset_dir = osp.join(self.tmp_dir, "assets")
+        os.makedirs(osp.join(self.asset_dir, "textures"))
+        self.assets = {
+            "readme.txt": b"noise component\n",
+            "textures/noise.bin": os.urandom(3 * 1024 * 1024 + 17),
+        }
+        for rel_path, data in self.assets.items():
+            with open(osp.join(self.asset_dir, rel_path), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, assets=None):
+        if assets is None:
+            assets = [(rel_path, osp.join(self.asset_dir, rel_path))
+                      for rel_path in sorted(self.assets)]
+
+        return write_package(self.package_path, "noise", selection(), assets)
+
+    def test_round_trip(self):
+        self.assertEqual(self.write(), self.package_path)
+        target_dir = osp.join(self.tmp_dir, "target")
+
+        with TDGamPackage(self.package_path) as package:
+
+            self.assertEqual(package.name, "noise")
+            self.assertEqual(package.stash(), selection())
+            self.assertEqual(sorted(package.assets()), sorted(self.assets))
+            self.assertEqual(package.verify(), [])
+
+            extracted = package.extract_assets(target_dir)
+
+        self.assertEqual(len(extracted), len(self.assets))
+        for rel_path, data in self.assets.items():
+            with open(osp.join(target_dir, rel_path), "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def patch(self, offset, data):
+        """Overwrite bytes of the package file."""
+        with open(self.package_path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+    def open_fds(self):
+        """Count the file descriptors open in this process, if possible."""
+        fd_dir = "/proc/self/fd"
+        return len(os.listdir(fd_dir)) if osp.isdir(fd_dir) else None
+
+    def test_corrupt(self):
+        self.write()
+        with TDGamPackage(self.package_path) as package:
+            asset = package._entries[ASSET_PREFIX + "textures/noise.bin"]
+            stash = package._entries[STASH_ENTRY]
+
+        self.patch(asset["offset"] + 1024, b"\0" * 8)
+
+        target_dir = osp.join(self.tmp_dir, "target")
+        with TDGamPackage(self.package_path) as package:
+
+            self.assertEqual(package.verify(), [asset["name"]])
+            self.assertRaises(TDGamPackageException,
+                              package.extract_assets, target_dir)
+
+        self.assertFalse(
+            osp.exists(osp.join(target_dir, "textures", "noise.bin")))
+
+        # a single flipped byte in the compressed stash
+        stash_offset = stash["offset"] + stash["size"] // 2
+        with open(self.package_path, "rb") as f:
+            f.seek(stash_offset)
+            byte = bytearray(f.read(1))
+        self.patch(stash_offset, bytes(bytearray([byte[0] ^ 0xff])))
+
+        with TDGamPackage(self.package_path) as package:
+
+            self.assertRaises(TDGamPackageException, package.stash)
+            self.assertIn(STASH_ENTRY, package.verify())
+
+    def test_corrupt_manifest(self):
+        self.write()
+        with open(self.package_path, "rb") as f:
+            _, _, _, offset, size = HEADER.unpack(f.read(HEADER.size))
+
+        open_fds = self.open_fds()
+        for manifest in (b"\xff" * size,
+                         b"{" * size,
+                         b"[]".ljust(size),
+                         b'{"entries": [1]}'.ljust(size)):
+
+            self.patch(offset, manifest)
+            try:
+                TDGamPackage(self.package_path)
+            except TDGamPackageException as e:
+                # the traceback keeps the rejected instance alive.
+                error = e
+            else:
+                self.fail("Corrupt manifest accepted: {!r}".format(manifest))
+
+            # rejected packages aren't left open
+            self.assertEqual(self.open_fds(), open_fds)
+            del error
+
+    def test_stash_encoding(self):
+        self.write()
+
+        with TDGamPackage(self.package_path) as package:
+
+            package._entries[STASH_ENTRY]["encoding"] = "json"
+            self.assertRaises(TDGamPackageException, package.stash)
+
+            del package._entries[STASH_ENTRY]["encoding"]
+            self.assertRaises(TDGamPackageException, package.stash)
+
+    def test_not_a_package(self):
+        with open(self.package_path, "wb") as f:
+            f.write(b"PK\3\4" + b"\0" * 64)
+
+        self.assertRaises(
+            TDGamPackageException, TDGamPackage, self.package_path)
+
+    def test_unsafe_asset_paths(self):
+        readme = osp.join(self.asset_dir, "readme.txt")
+        target_dir = osp.join(self.tmp_dir, "target")
+        os.makedirs(target_dir)
+        os.symlink(self.tmp_dir, osp.join(target_dir, "link"))
+
+        for rel_path in ("../escaped.txt",
+                         "textures/../../escaped.txt",
+                         "..\\..\\escaped.txt",
+                         "C:escaped.txt" if os.name == "nt" else "/escaped",
+                         "link/escaped.txt"):
+
+            self.write([(rel_path, readme)])
+            with TDGamPackage(self.package_path) as package:
+                self.assertRaises(TDGamPackageException,
+                                  package.extract_assets, target_dir)
+
+        self.assertFalse(osp.exists(osp.join(self.tmp_dir, "escaped.txt")))
@@ -0,0 +1,57 @@
+"""Tests for the spatial index of node bounding boxes."""
+import unittest
+
+from tdgam_lib.spatial import NODE_HEIGHT
+from tdgam_lib.spatial import NODE_WIDTH
+from tdgam_lib.spatial import SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpatialIndex(cell_size=100)
+        self.index.insert("/project1/noise1", 0, 0)
+        self.index.insert("/project1/level1", 200, 0)
+        self.index.insert("/project1/null1", -1000, 800)
+
+    def test_insert_remove(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.boxes["/project1/noise1"],
+                         (-NODE_WIDTH / 2.0, -NODE_HEIGHT / 2.0,
+                          NODE_WIDTH / 2.0, NODE_HEIGHT / 2.0))
+
+        # inserting an existing key moves it
+        self.index.insert("/project1/noise1", 5000, 5000)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.query_rect(-10, -10, 10, 10), set())
+
+        self.index.remove("/project1/noise1")
+        self.index.remove("/project1/noise1")
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.query_rect(4990, 4990, 5010, 5010), set())
+
+    def test_query_rect(self):
+        self.assertEqual(self.index.query_rect(-10, -10, 10, 10),
+                         set(["/project1/noise1"]))
+        self.assertEqual(self.index.query_rect(-10, -10, 150, 10),
+                         set(["/project1/noise1", "/project1/level1"]))
+        # touching edges don't overlap
+        self.assertEqual(self.index.query_rect(65, -10, 135, 10), set())
+        self.assertEqual(len(self.index.query_rect(-1e6, -1e6, 1e6, 1e6)), 3)
+
+    def test_nearest(self):
+        self.assertIsNone(SpatialIndex().nearest(0, 0))
+        self.assertEqual(self.index.nearest(90, 10), "/project1/noise1")
+        self.assertEqual(self.index.nearest(110, 10), "/project1/level1")
+        self.assertEqual(self.index.nearest(-5000, 5000), "/project1/null1")
+
+    def test_free_slot(self):
+        self.assertEqual(self.index.free_slot(-1000, 0), (-1000, 0))
+
+        x, y = self.index.free_slot(0, 0)
+        self.assertNotEqual((x, y), (0, 0))
+        self.assertEqual(self.index.query_rect(
+            x - NODE_WIDTH / 2.0, y - NODE_HEIGHT / 2.0,
+            x + NODE_WIDTH / 2.0, y + NODE_HEIGHT / 2.0), set())
+        # the nearest free ring is used
+        self.assertLessEqual(abs(y), NODE_HEIGHT + 20)
@@ -0,0 +1,69 @@
+"""Round-trip tests for stash tableDAT text."""
+import unittest
+
+from tdgam_lib.exceptions import TDGamComponentException
+from tdgam_lib.stash import selection_from_table_text
+from tdgam_lib.stash import selection_to_table_text
+
+
+def op_data(path, class_name="noiseTOP", **kwargs):
+    """Build a minimal ParDict for the op at the given path."""
+    data = {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "class_name": class_name,
+        "nodeCenter": [0, 0],
+        "inputs": [],
+        "outputs": [],
+        "pars": {}
+    }
+    data.update(kwargs)
+
+    return data
+
+
+class TestStash(unittest.TestCase):
+
+    def test_round_trip(self):
+        selection = [
+            op_data("/project1/noise1",
+                    nodeCenter=[-200, 150],
+                    outputs=["/project1/level1"],
+                    pars={"seed": "3", "type": "\"sparse\""}),
+            op_data("/project1/base1", "baseCOMP", children=[
+                op_data("/project1/base1/in1", "inTOP"),
+                op_data("/project1/base1/geo1", "geometryCOMP", children=[
+                    op_data("/project1/base1/geo1/torus1", "torusSOP")
+                ])
+            ]),
+            op_data("/project1/level1", "levelTOP",
+                    inputs=["/project1/noise1"]),
+        ]
+
+        text = selection_to_table_text(selection)
+        self.assertEqual(selection_from_table_text(text), selection)
+
+    def test_empty_comp_keeps_children(self):
+        selection = [
+            op_data("/project1/container1", "containerCOMP", children=[]),
+            op_data("/project1/text1", "textDAT"),
+        ]
+
+        rebuilt = selection_from_table_text(
+            selection_to_table_text(selection))
+        self.assertEqual(rebuilt, selection)
+        self.assertEqual(rebuilt[0]["children"], [])
+        self.assertNotIn("children", rebuilt[1])
+
+    def test_empty(self):
+        self.assertEqual(selection_from_table_text(""), [])
+        self.assertEqual(
+            selection_from_table_text(selection_to_table_text([])), [])
+
+    def test_malformed(self):
+        self.assertRaises(TDGamComponentException,
+                          selection_from_table_text, "path\tname\n")
+
+        text = selection_to_table_text([op_data("/project1/noise1")])
+        self.assertRaises(TDGamComponentException,
+                          selection_from_table_text, text + "a\tb\n")
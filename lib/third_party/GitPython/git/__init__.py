@@ -44,6 +44,8 @@ try:
     from git.diff import *                  # @NoMove @IgnorePep8
     from git.db import *                    # @NoMove @IgnorePep8
     from git.cmd import Git                 # @NoMove @IgnorePep8
+    if sys.version_info >= (3, 5):
+        from git.async_cmd import AsyncGit  # @NoMove @IgnorePep8
     from git.repo import Repo               # @NoMove @IgnorePep8
     from git.remote import *                # @NoMove @IgnorePep8
     from git.index import *                 # @NoMove @IgnorePep8
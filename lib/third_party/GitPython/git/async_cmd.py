@@ -0,0 +1,227 @@
+# async_cmd.py
+# Copyright (C) 2008, 2009 Michael Trier (mtrier@gmail.com) and contributors
+#
+# This module is part of GitPython and is released under
+# the BSD License: http://www.opensource.org/licenses/bsd-license.php
+"""Run git commands as asyncio subprocesses. Requires python 3.5 or newer."""
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import weakref
+
+from git.cmd import Git, PROC_CREATIONFLAGS
+from git.compat import defenc, safe_decode
+from .exc import (
+    GitCommandError,
+    GitCommandNotFound
+)
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+__all__ = ('AsyncGit',)
+
+
+class AsyncGit(object):
+
+    """
+    Calls git like :class:`git.cmd.Git`, but every call returns a coroutine running the
+    command as an asyncio subprocess, so many commands, possibly in many repositories,
+    can run concurrently from one event loop::
+
+     g = AsyncGit(git_dir)
+     status = await g.status(porcelain=True)
+     heads = await asyncio.gather(*(AsyncGit(d).rev_parse('HEAD') for d in dirs))
+
+    Arguments are transformed exactly as they are by :class:`Git`, whose working directory,
+    environment and options are used. ``kill_after_timeout`` kills the command after the
+    given amount of seconds, and cancelling the awaiting task kills the command as well.
+
+    The amount of commands running at once is limited by a semaphore, which is shared by
+    all instances running on the same event loop unless one is given explicitly.
+    """
+    __slots__ = ('_git', '_semaphore', 'timeout')
+
+    # Maximum amount of git processes run at once per event loop by all instances
+    # not using their own semaphore
+    max_concurrency = 16
+
+    _semaphores = weakref.WeakKeyDictionary()
+
+    def __init__(self, working_dir=None, git=None, semaphore=None, timeout=None):
+        """Initialize this instance
+
+        :param working_dir: directory to run commands in, ignored if git is given
+        :param git: :class:`Git` instance whose working directory, environment and options to use
+        :param semaphore: asyncio.Semaphore limiting the amount of commands run at once, shared
+            by all instances using it. If None, the per-loop default with max_concurrency is used
+        :param timeout: default for the ``kill_after_timeout`` of each command, in seconds"""
+        self._git = git if git is not None else Git(working_dir)
+        self._semaphore = semaphore
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        """:return: callable returning a coroutine which runs the git command of the given name"""
+        if name[0] == '_':
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call_process(name, *args, **kwargs)
+
+    def __call__(self, **kwargs):
+        """Specify command line options to the git executable for the next subcommand call,
+        see :meth:`Git.__call__`"""
+        self._git(**kwargs)
+        return self
+
+    @property
+    def git(self):
+        """:return: the :class:`Git` instance providing our settings"""
+        return self._git
+
+    @property
+    def working_dir(self):
+        """:return: Git directory we are working on"""
+        return self._git.working_dir
+
+    def _get_semaphore(self):
+        if self._semaphore is not None:
+            return self._semaphore
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _call_process(self, method, *args, **kwargs):
+        """Like :meth:`Git._call_process`, but returns a coroutine to be awaited for the
+        result. The command line is built right away."""
+        call, exec_kwargs = self._git._prepare_call(method, *args, **kwargs)
+        return self.execute(call, **exec_kwargs)
+
+    async def execute(self, command,
+                      istream=None,
+                      with_extended_output=False,
+                      with_exceptions=True,
+                      stdout_as_string=True,
+                      kill_after_timeout=None,
+                      with_stdout=True,
+                      env=None,
+                      max_chunk_size=None,
+                      **subprocess_kwargs):
+        """Run the command and return its output once it completed, see :meth:`Git.execute`.
+
+        :param istream: bytes to feed to the standard input of the command, or a file handle
+            passed to the subprocess
+        :param kill_after_timeout: seconds after which the command is killed and
+            GitCommandError raised, defaults to our timeout
+        :param max_chunk_size: ignored, as there is no output_stream
+        :return:
+            * str(output) if extended_output = False (Default)
+            * tuple(int(status), str(stdout), str(stderr)) if extended_output = True
+        :raise GitCommandError:
+        :raise ValueError: if execute keywords are given which need a synchronous process, like
+            as_process or output_stream"""
+        unsupported = {'as_process', 'output_stream', 'universal_newlines', 'shell'} & set(subprocess_kwargs)
+        if unsupported:
+            raise ValueError("AsyncGit does not support %s" % ', '.join(sorted(unsupported)))
+        if kill_after_timeout is None:
+            kill_after_timeout = self.timeout
+        git = self._git
+        if git.GIT_PYTHON_TRACE:
+            log.info(' '.join(command))
+
+        cwd = git._working_dir or os.getcwd()
+        inline_env = env
+        env = os.environ.copy()
+        env["LANGUAGE"] = "C"
+        env["LC_ALL"] = "C"
+        env.update(git._environment)
+        if inline_env is not None:
+            env.update(inline_env)
+
+        stdin_data = None
+        if isinstance(istream, bytes):
+            stdin_data = istream
+            istream = subprocess.PIPE
+        stdout_sink = subprocess.PIPE if with_stdout else subprocess.DEVNULL
+        log.debug("create_subprocess_exec(%s, cwd=%s)", command, cwd)
+
+        async with self._get_semaphore():
+            try:
+                proc = await asyncio.create_subprocess_exec(*command,
+                                                            env=env,
+                                                            cwd=cwd,
+                                                            stdin=istream,
+                                                            stderr=subprocess.PIPE,
+                                                            stdout=stdout_sink,
+                                                            creationflags=PROC_CREATIONFLAGS,
+                                                            **subprocess_kwargs)
+            except FileNotFoundError as err:
+                raise GitCommandNotFound(command, err)
+
+            try:
+                stdout_value, stderr_value = await asyncio.wait_for(proc.communicate(stdin_data),
+                                                                    kill_after_timeout)
+            except asyncio.TimeoutError:
+                await self._kill(proc)
+                stdout_value = b''
+                stderr_value = ('Timeout: the command "%s" did not complete in %s '
+                                'secs.' % (" ".join(command), kill_after_timeout)).encode(defenc)
+            except BaseException:
+                # cancelled, don't leave the command running without anyone waiting for it
+                await self._kill(proc)
+                raise
+            # end handle timeout
+        # end limit concurrency
+
+        stdout_value = stdout_value or b''
+        stderr_value = stderr_value or b''
+        # strip trailing "\n"
+        if stdout_value.endswith(b"\n"):
+            stdout_value = stdout_value[:-1]
+        if stderr_value.endswith(b"\n"):
+            stderr_value = stderr_value[:-1]
+        status = proc.returncode
+
+        if git.GIT_PYTHON_TRACE == 'full':
+            log.info("%s -> %d; stdout: '%s'; stderr: '%s'",
+                     " ".join(command), status, safe_decode(stdout_value), safe_decode(stderr_value))
+
+        if with_exceptions and status != 0:
+            raise GitCommandError(command, status, stderr_value, stdout_value)
+
+        if stdout_as_string:
+            stdout_value = safe_decode(stdout_value)
+
+        if with_extended_output:
+            return (status, stdout_value, safe_decode(stderr_value))
+        return stdout_value
+
+    @staticmethod
+    async def _kill(proc):
+        """Kill the given process and its children, like :meth:`Git.execute` does on timeout,
+        and reap it"""
+        if proc.returncode is None:
+            child_pids = []
+            try:
+                ps = await asyncio.create_subprocess_exec('ps', '--ppid', str(proc.pid),
+                                                          stdout=subprocess.PIPE,
+                                                          stderr=subprocess.DEVNULL,
+                                                          creationflags=PROC_CREATIONFLAGS)
+                for line in (await ps.communicate())[0].splitlines():
+                    if line.split() and line.split()[0].isdigit():
+                        child_pids.append(int(line.split()[0]))
+            except OSError:
+                pass
+            # Windows does not have SIGKILL, so use SIGTERM instead
+            sig = getattr(signal, 'SIGKILL', signal.SIGTERM)
+            for pid in [proc.pid] + child_pids:
+                try:
+                    os.kill(pid, sig)
+                except OSError:
+                    # It is possible that the process completed in the meanwhile
+                    pass
+            # end for each process
+        # The wait may itself be cancelled, the child watcher will reap the process then
+        await asyncio.shield(proc.wait())
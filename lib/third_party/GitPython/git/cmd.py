@@ -18,6 +18,7 @@ import subprocess
 import sys
 import threading
 from collections import OrderedDict
+from itertools import islice
 from textwrap import dedent
 
 from git.compat import (
@@ -184,6 +185,11 @@ class Git(LazyMixin):
     # Enables debugging of GitPython's git commands
     GIT_PYTHON_TRACE = os.environ.get("GIT_PYTHON_TRACE", False)
 
+    # Number of object requests written to the persistent cat-file command before
+    # reading its answers. The requests must fit into the pipe buffer, otherwise
+    # writing them blocks while git blocks writing answers nobody reads yet.
+    cat_file_batch_window = 64
+
     # If True, a shell will be used when executing git commands.
     # This should only be desirable on Windows, see https://github.com/gitpython-developers/GitPython/pull/126
     # and check `git/test_repo.py:TestRepo.test_untracked_files()` TC for an example where it is required.
@@ -975,6 +981,14 @@ class Git(LazyMixin):
            git rev-list max-count 10 --header master
 
         :return: Same as ``execute``"""
+        call, exec_kwargs = self._prepare_call(method, *args, **kwargs)
+        return self.execute(call, **exec_kwargs)
+
+    def _prepare_call(self, method, *args, **kwargs):
+        """Build the command line for the given git command as :meth:`_call_process` does,
+        without running it. The git options set by ``__call__`` are consumed.
+
+        :return: tuple(command_list, execute_kwargs)"""
         # Handle optional arguments prior to calling transform_kwargs
         # otherwise these'll end up in args, which is bad.
         exec_kwargs = {k: v for k, v in kwargs.items() if k in execute_kwargs}
@@ -1011,7 +1025,7 @@ class Git(LazyMixin):
         call.append(dashify(method))
         call.extend(args)
 
-        return self.execute(call, **exec_kwargs)
+        return call, exec_kwargs
 
     def _parse_object_header(self, header_line):
         """
@@ -1094,6 +1108,44 @@ class Git(LazyMixin):
         hexsha, typename, size = self.__get_object_header(cmd, ref)
         return (hexsha, typename, size, self.CatFileContentStream(size, cmd.stdout))
 
+    def iter_object_data(self, refs):
+        """ As get_object_data, for many refs at once. Requests are pipelined to the
+        persistent cat-file command in windows of cat_file_batch_window refs, instead
+        of waiting for each answer before sending the next request.
+
+        :return: iterator yielding (hexsha, type_string, size_as_int, data_string)
+            for each ref, in order
+        :raise ValueError: if a ref cannot be resolved
+        :note: not threadsafe. If the iterator is not exhausted, or a ref can't be
+            resolved, the persistent command is restarted on next use"""
+        cmd = self._get_persistent_cmd("cat_file_all", "cat_file", batch=True)
+        refs = iter(refs)
+        pending = 0                 # requests sent but not yet answered
+        try:
+            while True:
+                window = list(islice(refs, self.cat_file_batch_window))
+                if not window:
+                    break
+                cmd.stdin.write(b''.join(self._prepare_ref(ref) for ref in window))
+                cmd.stdin.flush()
+                pending = len(window)
+
+                while pending:
+                    hexsha, typename, size = self._parse_object_header(cmd.stdout.readline())
+                    data = cmd.stdout.read(size)
+                    cmd.stdout.read(1)      # trailing newline
+                    pending -= 1
+                    yield (hexsha, typename, size, data)
+                # END for each answer
+            # END for each window
+        finally:
+            if pending and self.cat_file_all is cmd:
+                # unread answers would be taken for those of the next request
+                cmd.__del__()
+                self.cat_file_all = None
+            # END handle interrupted batch
+        # END assure the command stays usable
+
     def clear_cache(self):
         """Clear all kinds of internal caches to release resources.
 
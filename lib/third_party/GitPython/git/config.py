@@ -12,6 +12,8 @@ import inspect
 import logging
 import os
 import re
+import threading
+import time
 from collections import OrderedDict
 
 from git.compat import (
@@ -191,6 +193,90 @@ class _OMD(OrderedDict):
         return [(k, self.getall(k)) for k in self]
 
 
+def _frozen_items(section):
+    """:return: tuple((option, (value, ...)), ...) of all items in the given _OMD"""
+    return tuple((k, tuple(vs)) for k, vs in section.items_all() if k != '__name__')
+
+
+def _merge_items(section, items):
+    """Add the values of the given _frozen_items to the given _OMD"""
+    for k, vs in items:
+        if k in section:
+            section.getall(k).extend(vs)
+        else:
+            section.setall(k, list(vs))
+    # END for each option
+
+
+class ConfigFileCache(object):
+
+    """Least recently used cache of parsed configuration files keyed by their absolute path.
+
+    Each entry is only used while the file's modification time, size and inode are unchanged.
+    Files modified within the last racy_seconds are not cached, as changes within the
+    resolution of the file system's timestamps would go unnoticed.
+
+    An instance can be shared by all repositories, and by multiple threads."""
+    __slots__ = ('_max_files', '_entries', '_lock', 'hits', 'misses')
+
+    # files whose modification time is this recent are always read from disk
+    racy_seconds = 2
+
+    def __init__(self, max_files=256):
+        self._max_files = max_files
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _stat_key(st):
+        return (st.st_mtime, st.st_size, st.st_ino)
+
+    def get(self, path, st):
+        """:return: parsed contents cached for the file at the given absolute path if they
+            are valid for the file's stat result st, or None"""
+        key = self._stat_key(st)
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+            # END handle miss
+            self._entries[path] = entry
+            self.hits += 1
+        return entry[1]
+
+    def set(self, path, st, contents):
+        """Cache the parsed contents of the file at the given absolute path, which had the
+        stat result st before it was read"""
+        if time.time() - st.st_mtime < self.racy_seconds:
+            return
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = (self._stat_key(st), contents)
+            while len(self._entries) > self._max_files:
+                self._entries.popitem(last=False)
+            # END evict oldest
+        # END with lock
+
+    def invalidate(self, path):
+        """Drop the entry of the file at the given path, if there is one"""
+        with self._lock:
+            self._entries.pop(osp.abspath(path), None)
+
+    def clear(self):
+        """Drop all cached entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        # END with lock
+
+
 class GitConfigParser(with_metaclass(MetaParserBuilder, cp.RawConfigParser, object)):
 
     """Implements specifics required to read git style configuration files.
@@ -216,6 +302,10 @@ class GitConfigParser(with_metaclass(MetaParserBuilder, cp.RawConfigParser, obje
     t_lock = LockFile
     re_comment = re.compile(r'^\s*[#;]')
 
+    # Parsed configuration files shared by all readers. Subclasses changing the way files are
+    # parsed should set it to None to always read files from disk
+    file_cache = ConfigFileCache()
+
     #} END configuration
 
     optvalueonly_source = r'\s*(?P<option>[^:=\s][^:=]*)'
@@ -417,6 +507,57 @@ class GitConfigParser(with_metaclass(MetaParserBuilder, cp.RawConfigParser, obje
         if e:
             raise e
 
+    def _read_file(self, file_path):
+        """Read the configuration file at the given path into our sections, taking its parsed
+        contents from the file_cache if they are still valid
+
+        :raise IOError: if the file cannot be read
+        :raise OSError: if the file cannot be read"""
+        cache = self.file_cache
+        if cache is None:
+            with open(file_path, 'rb') as fp:
+                self._read(fp, fp.name)
+            return
+        # END handle disabled cache
+
+        path = osp.abspath(file_path)
+        st = os.stat(path)
+        contents = cache.get(path, st)
+        if contents is None:
+            sections, defaults, proxies = self._sections, self._defaults, self._proxies
+            self._sections, self._defaults, self._proxies = self._dict(), self._dict(), self._dict()
+            try:
+                with open(file_path, 'rb') as fp:
+                    self._read(fp, fp.name)
+                contents = (tuple((name, _frozen_items(section)) for name, section in self._sections.items()),
+                            _frozen_items(self._defaults))
+            except Exception:
+                contents = None
+            finally:
+                self._sections, self._defaults, self._proxies = sections, defaults, proxies
+            # END parse into empty sections
+
+            if contents is None:
+                # let the file merge and fail as it always did
+                with open(file_path, 'rb') as fp:
+                    self._read(fp, fp.name)
+                return
+            # END handle parse errors
+            cache.set(path, st, contents)
+        # END handle cache miss
+
+        section_contents, default_contents = contents
+        for name, options in section_contents:
+            cursect = self._sections.get(name)
+            if cursect is None:
+                cursect = self._dict((('__name__', name),))
+                self._sections[name] = cursect
+                self._proxies[name] = None
+            # END create section
+            _merge_items(cursect, options)
+        # END for each section
+        _merge_items(self._defaults, default_contents)
+
     def _has_includes(self):
         return self._merge_includes and self.has_section('include')
 
@@ -448,10 +589,9 @@ class GitConfigParser(with_metaclass(MetaParserBuilder, cp.RawConfigParser, obje
             else:
                 # assume a path if it is not a file-object
                 try:
-                    with open(file_path, 'rb') as fp:
-                        file_ok = True
-                        self._read(fp, fp.name)
-                except IOError:
+                    self._read_file(file_path)
+                    file_ok = True
+                except (IOError, OSError):
                     continue
 
             # Read includes and append those that we didn't handle yet
@@ -553,6 +693,8 @@ class GitConfigParser(with_metaclass(MetaParserBuilder, cp.RawConfigParser, obje
         if not hasattr(fp, "seek"):
             with open(self._file_or_files, "wb") as fp:
                 self._write(fp)
+            if self.file_cache is not None:
+                self.file_cache.invalidate(self._file_or_files)
         else:
             fp.seek(0)
             # make sure we do not overwrite into an existing file
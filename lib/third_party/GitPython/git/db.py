@@ -1,4 +1,6 @@
 """Module with our own gitdb implementation - it uses the git command"""
+from io import BytesIO
+
 from git.util import bin_to_hex, hex_to_bin
 from gitdb.base import (
     OInfo,
@@ -42,6 +44,12 @@ class GitCmdObjectDB(LooseObjectDB):
         hexsha, typename, size, stream = self._git.stream_object_data(bin_to_hex(sha))
         return OStream(hex_to_bin(hexsha), typename, size, stream)
 
+    def stream_batch(self, shas):
+        """As ``stream``, for many shas at once, pipelining the requests to git
+        :return: list of OStream instances, in the order of the given shas"""
+        return [OStream(hex_to_bin(hexsha), typename, size, BytesIO(data))
+                for hexsha, typename, size, data in self._git.iter_object_data(bin_to_hex(sha) for sha in shas)]
+
     # { Interface
 
     def partial_to_complete_sha_hex(self, partial_hexsha):
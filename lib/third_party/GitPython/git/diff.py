@@ -3,22 +3,30 @@
 #
 # This module is part of GitPython and is released under
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php
+from itertools import chain
 import re
+from stat import S_IFMT, S_IFDIR, S_IFLNK
+import threading
+
+from gitdb.exc import BadName, BadObject
 
-from git.cmd import handle_process_output
 from git.compat import (
     defenc,
+    force_bytes,
     PY3
 )
-from git.util import finalize_process, hex_to_bin
+from git.util import finalize_process, hex_to_bin, bin_to_hex
 
 from .compat import binary_type
 from .objects.blob import Blob
+from .objects.fun import diff_tree_entries
 from .objects.util import mode_str_to_int
 
 
 __all__ = ('Diffable', 'DiffIndex', 'Diff', 'NULL_TREE')
 
+S_IFGITLINK = S_IFLNK | S_IFDIR     # a submodule
+
 # Special object to compare against the empty tree in diffs
 NULL_TREE = object()
 
@@ -54,6 +62,110 @@ def decode_path(path, has_ab_prefix=True):
     return path
 
 
+def _drain(stream):
+    for _line in stream:
+        pass
+
+
+def _iter_output(proc, chunk_size=-1):
+    """:return: generator yielding tuple(chunk, starts_line) of the output of proc, each chunk
+        being a line, or a part of it with at most chunk_size bytes.
+        Stderr is drained in the background meanwhile, and the process is finalized once
+        all output was read. A generator which is closed early closes stdout instead, which
+        makes git stop."""
+    if proc.stderr:
+        pump = threading.Thread(target=_drain, args=(proc.stderr,))
+        pump.daemon = True
+        pump.start()
+    # END drain stderr
+
+    readline = proc.stdout.readline
+    starts_line = True
+    try:
+        while True:
+            chunk = readline(chunk_size)
+            if not chunk:
+                break
+            yield chunk, starts_line
+            starts_line = chunk.endswith(b'\n')
+        # END for each chunk
+    finally:
+        proc.stdout.close()
+    # END assure stdout is closed
+    finalize_process(proc)
+
+
+_chunk_re = re.compile(b'[^\n]{0,63}\n|[^\n]{1,64}')
+
+
+def _count_chunks(data):
+    """:return: dict mapping each line of data, lines being split after 64 bytes, to the
+        amount of bytes it makes up in data, the way git's diffcore-delta counts them"""
+    # text files are compared ignoring the carriage return of line endings
+    if b'\0' not in data[:8000]:
+        data = data.replace(b'\r\n', b'\n')
+    counts = dict()
+    for chunk in _chunk_re.findall(data):
+        counts[chunk] = counts.get(chunk, 0) + len(chunk)
+    return counts
+
+
+def _tree_binsha(item):
+    """:return: binary sha of the tree the given commit, tree or tag refers to, or None"""
+    while getattr(item, 'type', None) == 'tag':
+        item = item.object
+    item_type = getattr(item, 'type', None)
+    if item_type == 'commit':
+        return item.tree.binsha
+    if item_type == 'tree':
+        return item.binsha
+    return None
+
+
+def _diff_tree_with_index(repo, tree_sha):
+    """:return: list of tuple(tree_entry, index_entry) of the tree against the index
+        of the repository as yielded by git.index.fun.diff_tree_index_entries, or None
+        if git is needed to compare them the way ``git diff --cached`` does"""
+    if repo.bare:
+        return None
+    # the porcelain diff respects configuration which plumbing commands ignore
+    reader = repo.config_reader()
+    if reader.has_section('diff') and \
+            any(o.lower() in ('orderfile', 'ignoresubmodules', 'relative') for o in reader.options('diff')):
+        return None
+    # END handle configuration
+
+    from git.index import IndexFile     # avoid circular import
+    from git.index.fun import diff_tree_index_entries
+    from git.index.typ import IndexEntries
+    index = IndexFile(repo)
+    try:
+        entries = index.entries
+    except AssertionError:
+        # index versions we can't read
+        return None
+    # END read index
+    if isinstance(entries, IndexEntries):
+        cache_tree = entries.cache_tree
+        entries = entries.sorted_entries()
+        keys = entries.keys()
+    else:
+        cache_tree = None
+        entries = index._entries_sorted()
+        keys = [(entry.path, entry.stage) for entry in entries]
+    # END get sorted entries
+
+    # the paths tell unmerged and sparse directory entries apart without unpacking the entries
+    paths = [force_bytes(path, encoding=defenc) for path, stage in keys if not stage and path[-1:] != '/']
+    if len(paths) != len(keys):
+        return None
+    pairs = list(diff_tree_index_entries(repo.odb, tree_sha, entries, paths, cache_tree))
+    # submodules may be configured to be ignored
+    if any(S_IFMT(e[1]) == S_IFGITLINK for pair in pairs for e in pair if e is not None):
+        return None
+    return pairs
+
+
 class Diffable(object):
 
     """Common interface for all object that can be diffed against another object of compatible type.
@@ -99,13 +211,43 @@ class Diffable(object):
 
         :param kwargs:
             Additional arguments passed to git-diff, such as
-            R=True to swap both sides of the diff.
+            R=True to swap both sides of the diff, or max_patch_size and
+            in_process as described in ``iter_diff``.
 
         :return: git.DiffIndex
 
         :note:
             On a bare repository, 'other' needs to be provided as Index or as
             as Tree/Commit, or a git command error will occur"""
+        return DiffIndex(self.iter_diff(other, paths, create_patch, **kwargs))
+
+    def iter_diff(self, other=Index, paths=None, create_patch=False, max_patch_size=None, in_process=None,
+                  **kwargs):
+        """As ``diff``, but yield each Diff as soon as git produced it entirely, which keeps
+        memory bounded even if the patch of all files is very large.
+
+        :param max_patch_size:
+            If not None, the maximum amount of bytes kept of the patch of each file,
+            the remainder is read but dropped. The patch is kept entirely otherwise.
+
+        :param in_process:
+            If None, diffs of trees against trees or the index without patches and paths
+            are computed without running git, unless git could detect renames among
+            the changes. If True, renames are detected in-process as well, approximating
+            git's similarity measure, and ValueError is raised for diffs which need git.
+            If False, git is always used.
+
+        :return: iterator yielding git.Diff instances"""
+        if in_process is not False:
+            index = None
+            if not create_patch and not paths and set(kwargs) <= set(('R',)):
+                index = self._diff_in_process(other, kwargs.get('R', False), in_process)
+            if index is not None:
+                return iter(index)
+            if in_process:
+                raise ValueError("Cannot compute the diff of %r against %r in-process" % (self, other))
+        # END handle in-process diff
+
         args = []
         args.append("--abbrev=40")        # we need full shas
         args.append("--full-index")       # get full index paths, not only filenames
@@ -146,13 +288,47 @@ class Diffable(object):
         kwargs['as_process'] = True
         proc = diff_cmd(*self._process_diff_args(args), **kwargs)
 
-        diff_method = (Diff._index_from_patch_format
-                       if create_patch
-                       else Diff._index_from_raw_format)
-        index = diff_method(self.repo, proc)
-
-        proc.wait()
-        return index
+        if create_patch:
+            return Diff._iter_from_patch_format(self.repo, proc, max_patch_size)
+        return Diff._iter_from_raw_format(self.repo, proc)
+
+    def _diff_in_process(self, other, reverse=False, find_renames=False):
+        """Compare our tree with the tree-ish or the index other without running git.
+
+        :param reverse: if True, swap both sides of the diff
+        :param find_renames: see ``Diff._index_from_tree_entries``
+        :return: git.DiffIndex like git's raw format describes it, or None if git
+            is needed to compute it"""
+        repo = self.repo
+        if other is None or other is NULL_TREE:
+            return None
+        a_sha = _tree_binsha(self)
+        if a_sha is None:
+            return None
+
+        if other is Diffable.Index:
+            pairs = _diff_tree_with_index(repo, a_sha)
+            if pairs is None:
+                return None
+        else:
+            if getattr(other, 'type', None) not in ('commit', 'tree', 'tag'):
+                # rev_parse would resolve an empty rev to HEAD, git rejects it
+                if not other:
+                    return None
+                try:
+                    other = repo.rev_parse(str(other))
+                except (BadName, BadObject, ValueError, KeyError, IndexError):
+                    return None
+            # END resolve revisions and references
+            b_sha = _tree_binsha(other)
+            if b_sha is None:
+                return None
+            pairs = list(diff_tree_entries(repo.odb, a_sha, b_sha))
+        # END handle other
+
+        if reverse:
+            pairs = [(b, a) for a, b in pairs]
+        return Diff._index_from_tree_entries(repo, pairs, find_renames)
 
 
 class DiffIndex(list):
@@ -251,6 +427,9 @@ class Diff(object):
     # can be used for comparisons
     NULL_HEX_SHA = "0" * 40
     NULL_BIN_SHA = b"\0" * 20
+    # maximum amount of files on each side compared by content to find renames, like
+    # git's diff.renameLimit
+    rename_limit = 1000
 
     __slots__ = ("a_blob", "b_blob", "a_mode", "b_mode", "a_rawpath", "b_rawpath",
                  "new_file", "deleted_file", "raw_rename_from", "raw_rename_to",
@@ -400,117 +579,311 @@ class Diff(object):
 
         return None
 
+    @classmethod
+    def _from_header(cls, repo, header):
+        """:return: Diff created from the given match of our header regex, without patch"""
+        a_path_fallback, b_path_fallback, \
+            old_mode, new_mode, \
+            rename_from, rename_to, \
+            new_file_mode, deleted_file_mode, \
+            a_blob_id, b_blob_id, b_mode, \
+            a_path, b_path = header.groups()
+
+        new_file, deleted_file = bool(new_file_mode), bool(deleted_file_mode)
+
+        a_path = cls._pick_best_path(a_path, rename_from, a_path_fallback)
+        b_path = cls._pick_best_path(b_path, rename_to, b_path_fallback)
+
+        # Make sure the mode is set if the path is set. Otherwise the resulting blob is invalid
+        # We just use the one mode we should have parsed
+        a_mode = old_mode or deleted_file_mode or (a_path and (b_mode or new_mode or new_file_mode))
+        b_mode = b_mode or new_mode or new_file_mode or (b_path and a_mode)
+        return Diff(repo,
+                    a_path,
+                    b_path,
+                    a_blob_id and a_blob_id.decode(defenc),
+                    b_blob_id and b_blob_id.decode(defenc),
+                    a_mode and a_mode.decode(defenc),
+                    b_mode and b_mode.decode(defenc),
+                    new_file, deleted_file,
+                    rename_from,
+                    rename_to,
+                    None, None, None)
+
+    @classmethod
+    def _iter_from_patch_format(cls, repo, proc, max_patch_size=None, chunk_size=64 * 1024):
+        """Create Diffs from the output of proc which must be in patch format, reading it
+        incrementally.
+
+        :param repo: is the repository we are operating on - it is required
+        :param proc: process whose stdout yields the output of 'git diff'
+        :param max_patch_size: if not None, the maximum amount of bytes of each patch we keep
+        :param chunk_size: maximum amount of bytes we read at once, even within a line
+        :return: generator yielding git.Diff instances as soon as their patch is complete"""
+        diff = None         # Diff whose patch we are reading
+        patch = None        # its patch so far
+        header = None       # chunks of the header we are reading, if any
+
+        def keep(data):
+            if max_patch_size is None:
+                patch.extend(data)
+            else:
+                patch.extend(data[:max_patch_size - len(patch)])
+        # END utility
+
+        # None signals the end of the output, which ends a pending header as well
+        for chunk, starts_line in chain(_iter_output(proc, chunk_size), ((None, True),)):
+            if header is not None:
+                # the header ends with the first hunk, or the next file
+                if chunk is not None and not (starts_line and chunk.startswith((b'@@', b'diff --git '))):
+                    header.append(chunk)
+                    continue
+                # END keep reading header
+
+                text = b''.join(header)
+                header = None
+                match = cls.re_header.match(text)
+                # a header we can't parse is part of the previous patch, as our regex skips it
+                if match is not None:
+                    if diff is not None:
+                        diff.diff = bytes(patch)
+                        yield diff
+                    # END yield completed diff
+                    diff = cls._from_header(repo, match)
+                    patch = bytearray()
+                    text = text[match.end():]
+                # END start next diff
+                if diff is not None:
+                    keep(text)
+            # END handle header end
+
+            if chunk is None:
+                break
+            if starts_line and chunk.startswith(b'diff --git '):
+                header = [chunk]
+            elif diff is not None:
+                keep(chunk)
+            # END handle chunk
+        # END for each chunk
+
+        if diff is not None:
+            diff.diff = bytes(patch)
+            yield diff
+        # END yield last diff
+
     @classmethod
     def _index_from_patch_format(cls, repo, proc):
         """Create a new DiffIndex from the given text which must be in patch format
         :param repo: is the repository we are operating on - it is required
         :param stream: result of 'git diff' as a stream (supporting file protocol)
         :return: git.DiffIndex """
+        return DiffIndex(cls._iter_from_patch_format(repo, proc))
 
-        ## FIXME: Here SLURPING raw, need to re-phrase header-regexes linewise.
-        text = []
-        handle_process_output(proc, text.append, None, finalize_process, decode_streams=False)
-
-        # for now, we have to bake the stream
-        text = b''.join(text)
-        index = DiffIndex()
-        previous_header = None
-        for header in cls.re_header.finditer(text):
-            a_path_fallback, b_path_fallback, \
-                old_mode, new_mode, \
-                rename_from, rename_to, \
-                new_file_mode, deleted_file_mode, \
-                a_blob_id, b_blob_id, b_mode, \
-                a_path, b_path = header.groups()
-
-            new_file, deleted_file = bool(new_file_mode), bool(deleted_file_mode)
-
-            a_path = cls._pick_best_path(a_path, rename_from, a_path_fallback)
-            b_path = cls._pick_best_path(b_path, rename_to, b_path_fallback)
-
-            # Our only means to find the actual text is to see what has not been matched by our regex,
-            # and then retro-actively assign it to our index
-            if previous_header is not None:
-                index[-1].diff = text[previous_header.end():header.start()]
-            # end assign actual diff
-
-            # Make sure the mode is set if the path is set. Otherwise the resulting blob is invalid
-            # We just use the one mode we should have parsed
-            a_mode = old_mode or deleted_file_mode or (a_path and (b_mode or new_mode or new_file_mode))
-            b_mode = b_mode or new_mode or new_file_mode or (b_path and a_mode)
-            index.append(Diff(repo,
-                              a_path,
-                              b_path,
-                              a_blob_id and a_blob_id.decode(defenc),
-                              b_blob_id and b_blob_id.decode(defenc),
-                              a_mode and a_mode.decode(defenc),
-                              b_mode and b_mode.decode(defenc),
-                              new_file, deleted_file,
-                              rename_from,
-                              rename_to,
-                              None, None, None))
-
-            previous_header = header
-        # end for each header we parse
-        if index:
-            index[-1].diff = text[header.end():]
-        # end assign last diff
+    @classmethod
+    def _from_raw_line(cls, repo, line):
+        """:return: Diff parsed from the given line in raw format, or None if it isn't one"""
+        # handles
+        # :100644 100644 687099101... 37c5e30c8... M    .gitignore
+        line = line.decode(defenc)
+        if not line.startswith(":"):
+            return None
+
+        meta, _, path = line[1:].partition('\t')
+        old_mode, new_mode, a_blob_id, b_blob_id, _change_type = meta.split(None, 4)
+        # Change type can be R100
+        # R: status letter
+        # 100: score (in case of copy and rename)
+        change_type = _change_type[0]
+        score_str = ''.join(_change_type[1:])
+        score = int(score_str) if score_str.isdigit() else None
+        path = path.strip()
+        a_path = path.encode(defenc)
+        b_path = path.encode(defenc)
+        deleted_file = False
+        new_file = False
+        rename_from = None
+        rename_to = None
+
+        # NOTE: We cannot conclude from the existence of a blob to change type
+        # as diffs with the working do not have blobs yet
+        if change_type == 'D':
+            b_blob_id = None
+            deleted_file = True
+        elif change_type == 'A':
+            a_blob_id = None
+            new_file = True
+        elif change_type == 'R':
+            a_path, b_path = path.split('\t', 1)
+            a_path = a_path.encode(defenc)
+            b_path = b_path.encode(defenc)
+            rename_from, rename_to = a_path, b_path
+        elif change_type == 'T':
+            # Nothing to do
+            pass
+        # END add/remove handling
+
+        return Diff(repo, a_path, b_path, a_blob_id, b_blob_id, old_mode, new_mode,
+                    new_file, deleted_file, rename_from, rename_to, '',
+                    change_type, score)
 
-        return index
+    @classmethod
+    def _iter_from_raw_format(cls, repo, proc):
+        """Create Diffs from the output of proc which must be in raw format, reading it incrementally.
+        :return: generator yielding git.Diff instances"""
+        for line, _starts_line in _iter_output(proc):
+            diff = cls._from_raw_line(repo, line)
+            if diff is not None:
+                yield diff
+        # END for each line
 
     @classmethod
     def _index_from_raw_format(cls, repo, proc):
         """Create a new DiffIndex from the given stream which must be in raw format.
         :return: git.DiffIndex"""
-        # handles
-        # :100644 100644 687099101... 37c5e30c8... M    .gitignore
-
-        index = DiffIndex()
+        return DiffIndex(cls._iter_from_raw_format(repo, proc))
 
-        def handle_diff_line(line):
-            line = line.decode(defenc)
-            if not line.startswith(":"):
-                return
-
-            meta, _, path = line[1:].partition('\t')
-            old_mode, new_mode, a_blob_id, b_blob_id, _change_type = meta.split(None, 4)
-            # Change type can be R100
-            # R: status letter
-            # 100: score (in case of copy and rename)
-            change_type = _change_type[0]
-            score_str = ''.join(_change_type[1:])
-            score = int(score_str) if score_str.isdigit() else None
-            path = path.strip()
-            a_path = path.encode(defenc)
-            b_path = path.encode(defenc)
-            deleted_file = False
-            new_file = False
-            rename_from = None
-            rename_to = None
-
-            # NOTE: We cannot conclude from the existence of a blob to change type
-            # as diffs with the working do not have blobs yet
-            if change_type == 'D':
-                b_blob_id = None
-                deleted_file = True
-            elif change_type == 'A':
-                a_blob_id = None
-                new_file = True
-            elif change_type == 'R':
-                a_path, b_path = path.split('\t', 1)
-                a_path = a_path.encode(defenc)
-                b_path = b_path.encode(defenc)
-                rename_from, rename_to = a_path, b_path
-            elif change_type == 'T':
-                # Nothing to do
-                pass
-            # END add/remove handling
-
-            diff = Diff(repo, a_path, b_path, a_blob_id, b_blob_id, old_mode, new_mode,
-                        new_file, deleted_file, rename_from, rename_to, '',
-                        change_type, score)
-            index.append(diff)
-
-        handle_process_output(proc, handle_diff_line, None, finalize_process, decode_streams=False)
+    @classmethod
+    def _index_from_tree_entries(cls, repo, pairs, find_renames=False):
+        """Create a new DiffIndex like git's raw format describes it from pairs of entries
+        as yielded by git.objects.fun.diff_tree_entries.
+
+        :param find_renames: If True, deleted and added files are paired to renames
+            like ``git diff -M`` does it, see ``_find_renames``. Otherwise None is returned
+            if git could find renames among them
+        :return: git.DiffIndex or None"""
+        deleted = [i for i, (a, b) in enumerate(pairs) if b is None]
+        added = [i for i, (a, b) in enumerate(pairs) if a is None]
+        renames = {}
+        if deleted and added:
+            renames = cls._find_renames(repo, pairs, deleted, added, find_renames)
+            if renames is None:
+                return None
+        # END find renames
+        sources = set(source for source, _score in renames.values())
 
+        index = DiffIndex()
+        for i, (a, b) in enumerate(pairs):
+            if i in sources:
+                continue
+            score = rename_from = rename_to = None
+            if i in renames:
+                source, score = renames[i]
+                a = pairs[source][0]
+                change_type = 'R'
+                rename_from, rename_to = a[2], b[2]
+            elif a is None:
+                change_type = 'A'
+            elif b is None:
+                change_type = 'D'
+            elif S_IFMT(a[1]) != S_IFMT(b[1]):
+                change_type = 'T'
+            else:
+                change_type = 'M'
+            # END get change type
+            index.append(Diff(repo, (a or b)[2], (b or a)[2],
+                              a and bin_to_hex(a[0]).decode('ascii'), b and bin_to_hex(b[0]).decode('ascii'),
+                              '%06o' % (a[1] if a else 0), '%06o' % (b[1] if b else 0),
+                              a is None, b is None, rename_from, rename_to, '', change_type, score))
+        # END for each pair
         return index
+
+    @classmethod
+    def _find_renames(cls, repo, pairs, deleted, added, find_similar=False):
+        """Pair deleted and added files of the same type to renames, those with identical
+        contents first.
+
+        :param deleted: indices of the deletions in pairs
+        :param added: indices of the additions in pairs
+        :param find_similar:
+            If True, the remaining files are paired by the similarity of their contents if it
+            reaches 50%, measured like git's diffcore-delta does but without hash collisions.
+            If the files are more than rename_limit on each side, that is skipped like git does.
+            Otherwise None is returned if any files remain, or if identical contents
+            don't pair up unambiguously, as git's choice would be needed
+        :return: dict mapping the index of each renamed addition to tuple(index of its deletion, score)"""
+        sources = dict()
+        for i in deleted:
+            a = pairs[i][0]
+            sources.setdefault((a[0], S_IFMT(a[1])), list()).append(i)
+        # END for each deletion
+        targets = dict()
+        for i in added:
+            b = pairs[i][1]
+            targets.setdefault((b[0], S_IFMT(b[1])), list()).append(i)
+        # END for each addition
+
+        renames = dict()
+        for key, target_indices in targets.items():
+            source_indices = sources.get(key)
+            if not source_indices:
+                continue
+            if not find_similar and (len(source_indices) > 1 or len(target_indices) > 1):
+                return None
+            for i in target_indices:
+                if not source_indices:
+                    break
+                # prefer the file with the same name
+                basename = pairs[i][1][2].rsplit(b'/', 1)[-1]
+                for source in source_indices:
+                    if pairs[source][0][2].rsplit(b'/', 1)[-1] == basename:
+                        break
+                else:
+                    source = source_indices[0]
+                source_indices.remove(source)
+                renames[i] = (source, 100)
+            # END for each target
+        # END for each set of identical additions
+
+        remaining_sources = sorted(i for source_indices in sources.values() for i in source_indices)
+        remaining_targets = sorted(i for i in added if i not in renames)
+        if not remaining_sources or not remaining_targets:
+            return renames
+        if not find_similar:
+            return None
+        if len(remaining_sources) * len(remaining_targets) > cls.rename_limit ** 2:
+            return renames
+        # END handle inexact renames
+
+        max_score = 60000
+        min_score = max_score // 2
+        odb = repo.odb
+        sizes = dict()
+        chunks = dict()
+        for i in remaining_sources + remaining_targets:
+            entry = pairs[i][0] or pairs[i][1]
+            if entry[0] not in sizes:
+                sizes[entry[0]] = odb.info(entry[0]).size
+        # END for each file
+
+        candidates = []
+        for target in remaining_targets:
+            b = pairs[target][1]
+            for source in remaining_sources:
+                a = pairs[source][0]
+                if S_IFMT(a[1]) != S_IFMT(b[1]):
+                    continue
+                max_size = max(sizes[a[0]], sizes[b[0]])
+                delta_size = max_size - min(sizes[a[0]], sizes[b[0]])
+                if not max_size or max_size * (max_score - min_score) < delta_size * max_score:
+                    continue
+                # END skip files whose size differs too much
+                for sha in (a[0], b[0]):
+                    if sha not in chunks:
+                        chunks[sha] = _count_chunks(odb.stream(sha).read())
+                # END read contents
+                a_chunks, b_chunks = chunks[a[0]], chunks[b[0]]
+                copied = sum(min(count, b_chunks[chunk]) for chunk, count in a_chunks.items() if chunk in b_chunks)
+                score = copied * max_score // max_size
+                if score >= min_score:
+                    candidates.append((-score, target, source))
+            # END for each source
+        # END for each target
+
+        used = set()
+        for score, target, source in sorted(candidates):
+            if target in renames or source in used:
+                continue
+            used.add(source)
+            renames[target] = (source, -score * 100 // max_score)
+        # END for each candidate
+        return renames
@@ -6,7 +6,7 @@
 import glob
 from io import BytesIO
 import os
-from stat import S_ISLNK
+from stat import S_ISDIR, S_ISLNK, S_IFMT
 import subprocess
 import tempfile
 
@@ -46,10 +46,20 @@ from gitdb.db import MemoryDB
 import git.diff as diff
 import os.path as osp
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # python 2 without the futures backport, files are hashed one after another
+    ThreadPoolExecutor = None
+
 from .fun import (
     entry_key,
+    entry_stat_matches,
+    hash_worktree_file,
     write_cache,
     read_cache,
+    read_index_extensions,
+    write_index_extensions,
     aggressive_tree_merge,
     write_tree_from_cache,
     stat_mode_to_index_mode,
@@ -58,6 +68,10 @@ from .fun import (
 )
 from .typ import (
     BaseIndexEntry,
+    CacheTree,
+    CE_STAGEMASK,
+    CE_VALID,
+    IndexEntries,
     IndexEntry,
 )
 from .util import (
@@ -158,7 +172,9 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
 
     def _deserialize(self, stream):
         """Initialize this instance with index values read from the given stream"""
-        self.version, self.entries, self._extension_data, conten_sha = read_cache(stream)  # @UnusedVariable
+        self.version, self.entries, extension_data, conten_sha = read_cache(stream)  # @UnusedVariable
+        # extensions we maintain are attached to the entries, others are kept as they are
+        self._extension_data = read_index_extensions(self.entries, extension_data)
         return self
 
     def _entries_sorted(self):
@@ -166,11 +182,16 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         return sorted(self.entries.values(), key=lambda e: (e.path, e.stage))
 
     def _serialize(self, stream, ignore_extension_data=False):
-        entries = self._entries_sorted()
-        extension_data = self._extension_data
-        if ignore_extension_data:
-            extension_data = None
-        write_cache(entries, stream, extension_data)
+        extension_data = b''
+        if isinstance(self.entries, IndexEntries):
+            # entries which were never accessed are copied from their raw record
+            entries = self.entries.sorted_records()
+            extension_data = write_index_extensions(self.entries)
+        else:
+            entries = self._entries_sorted()
+        if not ignore_extension_data:
+            extension_data += self._extension_data
+        write_cache(entries, stream, extension_data or None)
         return self
 
     #} END serializable interface
@@ -185,15 +206,11 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
             the one you gave.
 
         :param ignore_extension_data:
-            If True, the TREE type extension data read in the index will not
-            be written to disk. NOTE that no extension data is actually written.
-            Use this if you have altered the index and
-            would like to use git-write-tree afterwards to create a tree
-            representing your written changes.
-            If this data is present in the written index, git-write-tree
-            will instead write the stored/cached tree.
-            Alternatively, use IndexFile.write_tree() to handle this case
-            automatically
+            If True, extension data of extensions we don't maintain will not be
+            written to disk. The TREE, UNTR and FSMN extensions are kept up to
+            date while the entries change and are always written: cached trees
+            containing changed entries are invalidated, the untracked cache and
+            the fsmonitor data are dropped once any entry changes.
 
         :return: self"""
         # make sure we have our entries read before getting a write lock
@@ -534,8 +551,19 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         # we obtain no lock as we just flush our contents to disk as tree
         # If we are a new index, the entries access will load our data accordingly
         mdb = MemoryDB()
-        entries = self._entries_sorted()
-        binsha, tree_items = write_tree_from_cache(entries, mdb, slice(0, len(entries)))
+        cache_tree = None
+        if isinstance(self.entries, IndexEntries):
+            # trees of directories without changed entries are reused from the cache tree
+            entries = self.entries.sorted_entries()
+            if self.entries.cache_tree is None:
+                self.entries.cache_tree = CacheTree()
+            cache_tree = self.entries.cache_tree
+            if len(entries) and cache_tree.entry_count == len(entries):
+                return Tree(self.repo, cache_tree.binsha, path='')
+            # END nothing changed since the tree was written
+        else:
+            entries = self._entries_sorted()
+        binsha, tree_items = write_tree_from_cache(entries, mdb, slice(0, len(entries)), cache_tree=cache_tree)
 
         # copy changed trees only
         mdb.stream_copy(mdb.sha_iter(), self.repo.odb)
@@ -582,7 +610,7 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         # END for each item
         return (paths, entries)
 
-    def _store_path(self, filepath, fprogress):
+    def _store_path(self, filepath, fprogress=None):
         """Store file at filepath in the database and return the base index entry
         Needs the git_working_dir decorator active ! This must be assured in the calling code"""
         st = os.lstat(filepath)     # handles non-symlinks as well
@@ -592,15 +620,40 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         else:
             open_stream = lambda: open(filepath, 'rb')
         with open_stream() as stream:
-            fprogress(filepath, False, filepath)
+            if fprogress:
+                fprogress(filepath, False, filepath)
             istream = self.repo.odb.store(IStream(Blob.type, st.st_size, stream))
-            fprogress(filepath, True, filepath)
+            if fprogress:
+                fprogress(filepath, True, filepath)
         return BaseIndexEntry((stat_mode_to_index_mode(st.st_mode),
                                istream.binsha, 0, to_native_path_linux(filepath)))
 
+    def _store_paths(self, filepaths, fprogress, max_workers=None):
+        """Store the files at the given paths in the database using a pool of threads,
+        as reading, hashing and compressing their data releases the GIL.
+        Progress is reported from the calling thread, in the order of the paths.
+        Needs the git_working_dir decorator active ! This must be assured in the calling code
+
+        :param max_workers: amount of threads storing files, see ThreadPoolExecutor
+        :return: list of base index entries, one for each path in the given order"""
+        if ThreadPoolExecutor is None or len(filepaths) < 2 or max_workers == 1:
+            return [self._store_path(filepath, fprogress) for filepath in filepaths]
+        # END handle serial storage
+
+        entries = []
+        with ThreadPoolExecutor(max_workers) as pool:
+            for filepath in filepaths:
+                fprogress(filepath, False, filepath)
+            for filepath, entry in izip(filepaths, pool.map(self._store_path, filepaths)):
+                fprogress(filepath, True, filepath)
+                entries.append(entry)
+            # END for each stored file
+        # END with pool
+        return entries
+
     @unbare_repo
     @git_working_dir
-    def _entries_for_paths(self, paths, path_rewriter, fprogress, entries):
+    def _entries_for_paths(self, paths, path_rewriter, fprogress, entries, max_workers=None):
         entries_added = []
         if path_rewriter:
             for path in paths:
@@ -623,14 +676,12 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
 
         # HANDLE PATHS
         assert len(entries_added) == 0
-        for filepath in self._iter_expand_paths(paths):
-            entries_added.append(self._store_path(filepath, fprogress))
-        # END for each filepath
+        entries_added.extend(self._store_paths(list(self._iter_expand_paths(paths)), fprogress, max_workers))
         # END path handling
         return entries_added
 
     def add(self, items, force=True, fprogress=lambda *args: None, path_rewriter=None,
-            write=True, write_extension_data=False):
+            write=True, write_extension_data=False, max_workers=None):
         """Add files from the working tree, specific blobs or BaseIndexEntries
         to the index.
 
@@ -711,16 +762,18 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
             the changes only exist in memory and are not available to git commands.
 
         :param write_extension_data:
-            If True, extension data will be written back to the index. This can lead to issues in case
-            it is containing the 'TREE' extension, which will cause the `git commit` command to write an
-            old tree, instead of a new one representing the now changed index.
-            This doesn't matter if you use `IndexFile.commit()`, which ignores the `TREE` extension altogether.
-            You should set it to True if you intend to use `IndexFile.commit()` exclusively while maintaining
-            support for third-party extensions. Besides that, you can usually safely ignore the built-in
-            extensions when using GitPython on repositories that are not handled manually at all.
+            If True, extension data of extensions we don't maintain will be written back to the index.
+            The 'TREE', 'UNTR' and 'FSMN' extensions are kept in sync with the entries and always
+            written, see ``write()``. You should set it to True if you want to keep third-party
+            extensions, which may not describe the changed index anymore.
             All current built-in extensions are listed here:
             http://opensource.apple.com/source/Git/Git-26/src/git-htmldocs/technical/index-format.txt
 
+        :param max_workers:
+            Amount of threads writing files into the object database concurrently, see
+            ThreadPoolExecutor. 1 writes them one after another. Objects are compressed
+            with the object database's compression_level, zlib.Z_BEST_SPEED by default.
+
         :return:
             List(BaseIndexEntries) representing the entries just actually added.
 
@@ -738,7 +791,7 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         # That way, we are OK on a bare repository as well.
         # If there are no paths, the rewriter has nothing to do either
         if paths:
-            entries_added.extend(self._entries_for_paths(paths, path_rewriter, fprogress, entries))
+            entries_added.extend(self._entries_for_paths(paths, path_rewriter, fprogress, entries, max_workers))
 
         # HANDLE ENTRIES
         if entries:
@@ -754,9 +807,10 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
             if null_entries_indices:
                 @git_working_dir
                 def handle_null_entries(self):
-                    for ei in null_entries_indices:
+                    new_entries = self._store_paths([entries[ei].path for ei in null_entries_indices],
+                                                    fprogress, max_workers)
+                    for ei, new_entry in izip(null_entries_indices, new_entries):
                         null_entry = entries[ei]
-                        new_entry = self._store_path(null_entry.path, fprogress)
 
                         # update null entry
                         entries[ei] = BaseIndexEntry(
@@ -1203,19 +1257,11 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
         return self
 
     @default_index
-    def diff(self, other=diff.Diffable.Index, paths=None, create_patch=False, **kwargs):
-        """Diff this index against the working copy or a Tree or Commit object
-
-        For a documentation of the parameters and return values, see
-        Diffable.diff
-
-        :note:
-            Will only work with indices that represent the default git index as
-            they have not been initialized with a stream.
-        """
+    def iter_diff(self, other=diff.Diffable.Index, paths=None, create_patch=False, max_patch_size=None, **kwargs):
+        """As ``diff``, but yield each Diff as soon as it is available, see Diffable.iter_diff"""
         # index against index is always empty
         if other is self.Index:
-            return diff.DiffIndex()
+            return iter(diff.DiffIndex())
 
         # index against anything but None is a reverse diff with the respective
         # item. Handle existing -R flags properly. Transform strings to the object
@@ -1228,12 +1274,140 @@ class IndexFile(LazyMixin, diff.Diffable, Serializable):
             # invert the existing R flag
             cur_val = kwargs.get('R', False)
             kwargs['R'] = not cur_val
-            return other.diff(self.Index, paths, create_patch, **kwargs)
+            return other.iter_diff(self.Index, paths, create_patch, max_patch_size, **kwargs)
         # END diff against other item handling
 
         # if other is not None here, something is wrong
         if other is not None:
             raise ValueError("other must be None, Diffable.Index, a Tree or Commit, was %r" % other)
 
-        # diff against working copy - can be handled by superclass natively
-        return super(IndexFile, self).diff(other, paths, create_patch, **kwargs)
+        # diff against working copy - our stat data usually avoids running git at all
+        if not create_patch and set(kwargs) <= set(('in_process',)) and kwargs.get('in_process') is not False:
+            if paths is not None and not isinstance(paths, (tuple, list)):
+                paths = [paths]
+            index = self._diff_working_tree(paths)
+            if index is not None:
+                return iter(index)
+        # END handle stat based diff
+        return super(IndexFile, self).iter_diff(other, paths, create_patch, max_patch_size, **kwargs)
+
+    @default_index
+    def diff(self, other=diff.Diffable.Index, paths=None, create_patch=False, **kwargs):
+        """Diff this index against the working copy or a Tree or Commit object
+
+        For a documentation of the parameters and return values, see
+        Diffable.diff
+
+        :note:
+            Will only work with indices that represent the default git index as
+            they have not been initialized with a stream.
+        """
+        return diff.DiffIndex(self.iter_diff(other, paths, create_patch, **kwargs))
+
+    def _diff_working_tree(self, paths=None, ignore_submodules=False, first_only=False, max_workers=None):
+        """Diff our entries against the working tree without running git.
+
+        Files whose stat data still matches the one cached in their entry are assumed
+        unchanged, only the others are hashed, using a pool of threads, and compared
+        to the entry's sha.
+
+        :param paths: list of paths relative to the working tree to limit the diff to
+        :param ignore_submodules: if True, submodules are skipped instead of requiring git
+        :param first_only: if True, stop at the first difference found
+        :param max_workers: amount of threads hashing files, see ThreadPoolExecutor
+        :return: git.DiffIndex as returned by ``diff(None)``, or None if the entries
+            or the repository's configuration require git to compute the diff, which is
+            the case for unmerged entries, submodules, pathspec globs and gitattributes"""
+        if self.repo.bare or (paths and any(c in p for p in paths for c in '*?[')):
+            return None
+        # END handle pathspecs
+        if osp.isfile(osp.join(self.repo.git_dir, 'info', 'attributes')):
+            return None
+        reader = self.repo.config_reader()
+        if reader.get_value('core', 'attributesfile', ''):
+            return None
+        autocrlf = reader.get_value('core', 'autocrlf', False) in (True, 'input')
+        filemode = reader.get_value('core', 'filemode', True)
+        trust_ctime = reader.get_value('core', 'trustctime', True)
+
+        prefixes = [to_native_path_linux(self._to_relative_path(p)).rstrip('/') for p in paths or ()]
+        try:
+            st = os.stat(self.path)
+            mtime_ns = getattr(st, 'st_mtime_ns', None)
+            racy_mtime = divmod(mtime_ns, 1000000000) if mtime_ns is not None else (int(st.st_mtime), 0)
+        except OSError:
+            racy_mtime = None
+        # END get index file mtime
+
+        if isinstance(self.entries, IndexEntries):
+            entries = self.entries.sorted_entries()
+        else:
+            entries = self._entries_sorted()
+        working_tree_dir = self.repo.working_tree_dir + '/'
+        changes = []
+        candidates = []
+        for entry in entries:
+            # tuple access is significantly faster than the properties
+            entry_mode, path = entry[0], entry[3]
+            if entry[2] & CE_STAGEMASK or path.endswith('.gitattributes'):
+                return None
+            if prefixes and not any(path == p or path.startswith(p + '/') for p in prefixes):
+                continue
+            if entry_mode == S_IFGITLINK:
+                if ignore_submodules:
+                    continue
+                return None
+            # END handle submodules
+            if entry[2] & CE_VALID:
+                # assumed unchanged
+                continue
+
+            filepath = working_tree_dir + path
+            try:
+                st = os.lstat(filepath)
+            except OSError:
+                st = None
+            # END handle missing files
+            if st is None or S_ISDIR(st.st_mode):
+                changes.append((entry, 0, 'D'))
+            else:
+                mode = stat_mode_to_index_mode(st.st_mode)
+                if not filemode and S_IFMT(mode) == S_IFMT(entry_mode):
+                    mode = entry_mode
+                if mode != entry_mode:
+                    changes.append((entry, mode, 'M' if S_IFMT(mode) == S_IFMT(entry_mode) else 'T'))
+                elif not entry_stat_matches(entry, st, racy_mtime, trust_ctime):
+                    candidates.append((entry, mode, filepath, st))
+                # END handle stat data
+            # END handle file state
+            if first_only and changes:
+                break
+        # END for each entry
+
+        if candidates and not (first_only and changes):
+            def hash_candidate(candidate):
+                return hash_worktree_file(candidate[2], candidate[3], autocrlf)
+
+            if ThreadPoolExecutor is not None and len(candidates) > 1:
+                with ThreadPoolExecutor(max_workers) as pool:
+                    shas = list(pool.map(hash_candidate, candidates))
+            else:
+                shas = [hash_candidate(c) for c in candidates]
+            # END hash files
+            for (entry, mode, filepath, st), binshas in izip(candidates, shas):
+                if entry.binsha not in binshas:
+                    changes.append((entry, mode, 'M'))
+            # END for each hashed file
+            changes.sort(key=lambda change: change[0].path)
+        # END handle files to hash
+
+        index = diff.DiffIndex()
+        for entry, mode, change_type in changes[:1] if first_only else changes:
+            rawpath = entry.path.encode(defenc)
+            deleted = change_type == 'D'
+            index.append(diff.Diff(self.repo, rawpath, rawpath, entry.hexsha,
+                                   None if deleted else diff.Diff.NULL_HEX_SHA,
+                                   '%o' % entry.mode, '%06o' % mode, False, deleted,
+                                   None, None, '', change_type, None))
+        # END for each change
+        return index
@@ -1,7 +1,9 @@
 # Contains standalone functions to accompany the index implementation and make it
 # more versatile
 # NOTE: Autodoc hates it if this is a docstring
+from bisect import bisect_left
 from io import BytesIO
+import hashlib
 import os
 from stat import (
     S_IFDIR,
@@ -11,12 +13,14 @@ from stat import (
     S_IFMT,
     S_IFREG,
 )
+from struct import error as struct_error
 import subprocess
 
 from git.cmd import PROC_CREATIONFLAGS, handle_process_output
 from git.compat import (
     PY3,
     defenc,
+    xrange,
     force_text,
     force_bytes,
     is_posix,
@@ -30,7 +34,10 @@ from git.exc import (
 from git.objects.fun import (
     tree_to_stream,
     traverse_tree_recursive,
-    traverse_trees_recursive
+    traverse_trees_recursive,
+    _iter_tree_blobs,
+    _pair_items,
+    _tree_items
 )
 from git.util import IndexFileSHA1Writer, finalize_process
 from gitdb.base import IStream
@@ -40,9 +47,17 @@ import os.path as osp
 
 from .typ import (
     BaseIndexEntry,
-    IndexEntry,
+    CacheTree,
+    FSMonitorData,
+    IndexEntries,
+    UntrackedCache,
+    UntrackedCacheDir,
+    CE_FLAGS_OFFSET,
+    CE_FLAGS_STRUCT,
     CE_NAMEMASK,
-    CE_STAGESHIFT
+    CE_STAGEMASK,
+    CE_STAGESHIFT,
+    CE_STRUCT
 )
 from .util import (
     pack,
@@ -53,8 +68,23 @@ from .util import (
 S_IFGITLINK = S_IFLNK | S_IFDIR     # a submodule
 CE_NAMEMASK_INV = ~CE_NAMEMASK
 
+# entries are padded with 1 to 8 null bytes to a multiple of 8 bytes, indexed by
+# the unpadded entry size modulo 8
+CE_PADDING = tuple(b"\0" * (8 - i) for i in range(8))
+
+# signatures of the index extensions we understand
+EXT_CACHE_TREE = b"TREE"
+EXT_UNTRACKED_CACHE = b"UNTR"
+EXT_FSMONITOR = b"FSMN"
+# extensions pointing at byte offsets of the index file, stale once it is rewritten
+EXT_OFFSET_TABLES = (b"EOIE", b"IEOT")
+
 __all__ = ('write_cache', 'read_cache', 'write_tree_from_cache', 'entry_key',
-           'stat_mode_to_index_mode', 'S_IFGITLINK', 'run_commit_hook', 'hook_path')
+           'stat_mode_to_index_mode', 'S_IFGITLINK', 'run_commit_hook', 'hook_path',
+           'read_extensions', 'write_extensions', 'read_cache_tree', 'write_cache_tree',
+           'read_untracked_cache', 'read_fsmonitor', 'read_index_extensions',
+           'write_index_extensions', 'entry_stat_matches', 'hash_worktree_file',
+           'diff_tree_index_entries')
 
 
 def hook_path(name, git_dir):
@@ -111,7 +141,8 @@ def stat_mode_to_index_mode(mode):
 def write_cache(entries, stream, extension_data=None, ShaStreamCls=IndexFileSHA1Writer):
     """Write the cache represented by entries to a stream
 
-    :param entries: **sorted** list of entries
+    :param entries: **sorted** list of entries. Raw on-disk records, as returned by
+        ``IndexEntries.sorted_records``, are written as they are
     :param stream: stream to wrap into the AdapterStreamCls - it is used for
         final output.
 
@@ -123,30 +154,30 @@ def write_cache(entries, stream, extension_data=None, ShaStreamCls=IndexFileSHA1
     # wrap the stream into a compatible writer
     stream = ShaStreamCls(stream)
 
-    tell = stream.tell
-    write = stream.write
-
     # header
     version = 2
-    write(b"DIRC")
-    write(pack(">LL", version, len(entries)))
+    chunks = [b"DIRC", pack(">LL", version, len(entries))]
+    append = chunks.append
+    pack_entry = CE_STRUCT.pack
+    fixed_size = CE_STRUCT.size
 
-    # body
+    # body - assembled in memory, and written at once
     for entry in entries:
-        beginoffset = tell()
-        write(entry[4])         # ctime
-        write(entry[5])         # mtime
+        if not isinstance(entry, tuple):
+            append(entry)
+            continue
+        # END handle raw records
         path = entry[3]
         path = force_bytes(path, encoding=defenc)
         plen = len(path) & CE_NAMEMASK      # path length
         assert plen == len(path), "Path %s too long to fit into index" % entry[3]
         flags = plen | (entry[2] & CE_NAMEMASK_INV)     # clear possible previous values
-        write(pack(">LLLLLL20sH", entry[6], entry[7], entry[0],
-                   entry[8], entry[9], entry[10], entry[1], flags))
-        write(path)
-        real_size = ((tell() - beginoffset + 8) & ~7)
-        write(b"\0" * ((beginoffset + real_size) - tell()))
+        append(pack_entry(entry[4], entry[5], entry[6], entry[7], entry[0],
+                          entry[8], entry[9], entry[10], entry[1], flags))
+        append(path)
+        append(CE_PADDING[(fixed_size + plen) & 7])
     # END for each entry
+    stream.write(b"".join(chunks))
 
     # write previously cached extensions data
     if extension_data is not None:
@@ -182,31 +213,27 @@ def read_cache(stream):
     """Read a cache file from the given stream
     :return: tuple(version, entries_dict, extension_data, content_sha)
     * version is the integer version number
-    * entries dict is a dictionary which maps IndexEntry instances to a path at a stage
+    * entries dict is a dictionary which maps IndexEntry instances to a path at a stage.
+      Only the keys are parsed right away, see ``IndexEntries``
     * extension_data is '' or 4 bytes of type + 4 bytes of size + size bytes
     * content_sha is a 20 byte sha on all cache file contents"""
     version, num_entries = read_header(stream)
-    count = 0
-    entries = {}
-
-    read = stream.read
-    tell = stream.tell
-    while count < num_entries:
-        beginoffset = tell()
-        ctime = unpack(">8s", read(8))[0]
-        mtime = unpack(">8s", read(8))[0]
-        (dev, ino, mode, uid, gid, size, sha, flags) = \
-            unpack(">LLLLLL20sH", read(20 + 4 * 6 + 2))
+    offsets = {}
+
+    # read everything in one go, entries are located by offset within the data
+    data = stream.read(~0)
+    unpack_flags = CE_FLAGS_STRUCT.unpack_from
+    fixed_size = CE_STRUCT.size
+    offset = 0
+    for _ in xrange(num_entries):
+        flags = unpack_flags(data, offset + CE_FLAGS_OFFSET)[0]
         path_size = flags & CE_NAMEMASK
-        path = read(path_size).decode(defenc)
-
-        real_size = ((tell() - beginoffset + 8) & ~7)
-        read((beginoffset + real_size) - tell())
-        entry = IndexEntry((mode, sha, flags, path, ctime, mtime, dev, ino, uid, gid, size))
+        path = data[offset + fixed_size:offset + fixed_size + path_size].decode(defenc)
         # entry_key would be the method to use, but we safe the effort
-        entries[(path, entry.stage)] = entry
-        count += 1
+        offsets[(path, (flags & CE_STAGEMASK) >> CE_STAGESHIFT)] = offset
+        offset += (fixed_size + path_size + 8) & ~7
     # END for each entry
+    entries = IndexEntries(data, offsets)
 
     # the footer contains extension data and a sha on the content so far
     # Keep the extension footer,and verify we have a sha in the end
@@ -214,7 +241,7 @@ def read_cache(stream):
     # 4 bytes ID
     # 4 bytes length of chunk
     # repeated 0 - N times
-    extension_data = stream.read(~0)
+    extension_data = data[offset:]
     assert len(extension_data) > 19, "Index Footer was not at least a sha on content as it was only %i bytes in size"\
                                      % len(extension_data)
 
@@ -226,7 +253,286 @@ def read_cache(stream):
     return (version, entries, extension_data, content_sha)
 
 
-def write_tree_from_cache(entries, odb, sl, si=0):
+def read_extensions(extension_data):
+    """:return: list of tuple(signature, data) of each extension in the given
+        extension data, in the order they are stored"""
+    extensions = []
+    offset = 0
+    end = len(extension_data)
+    while offset + 8 <= end:
+        signature = extension_data[offset:offset + 4]
+        size = unpack(">L", extension_data[offset + 4:offset + 8])[0]
+        extensions.append((signature, extension_data[offset + 8:offset + 8 + size]))
+        offset += 8 + size
+    # END for each extension
+    return extensions
+
+
+def write_extensions(extensions):
+    """:return: extension data made from the given list of tuple(signature, data)"""
+    return b"".join(signature + pack(">L", len(data)) + data for signature, data in extensions)
+
+
+def _read_cache_tree_node(data, offset):
+    """:return: tuple(CacheTree, offset) of the node at offset and all its sub nodes"""
+    end = data.index(b"\0", offset)
+    name = data[offset:end].decode(defenc)
+    offset = end + 1
+    end = data.index(b"\n", offset)
+    entry_count, subtree_count = data[offset:end].split(b" ")
+    node = CacheTree(name, int(entry_count))
+    offset = end + 1
+    if node.valid:
+        node.binsha = data[offset:offset + 20]
+        offset += 20
+    # END handle invalidated trees
+    for _ in xrange(int(subtree_count)):
+        child, offset = _read_cache_tree_node(data, offset)
+        node.children[child.name] = child
+    # END for each subtree
+    return node, offset
+
+
+def read_cache_tree(data):
+    """:return: root CacheTree parsed from the data of a TREE extension"""
+    return _read_cache_tree_node(data, 0)[0]
+
+
+def write_cache_tree(cache_tree):
+    """:return: data of a TREE extension describing the given root CacheTree"""
+    chunks = []
+    append = chunks.append
+
+    def write_node(node):
+        append(force_bytes(node.name, encoding=defenc))
+        append(("\0%i %i\n" % (node.entry_count, len(node.children))).encode('ascii'))
+        if node.valid:
+            append(node.binsha)
+        for child in node.children.values():
+            write_node(child)
+    # END write_node
+
+    write_node(cache_tree)
+    return b"".join(chunks)
+
+
+def _decode_varint(data, offset):
+    """:return: tuple(value, offset) of the varint at offset, encoded the way git's
+        decode_varint expects it"""
+    c = bytearray(data[offset:offset + 1])[0]
+    offset += 1
+    value = c & 127
+    while c & 128:
+        c = bytearray(data[offset:offset + 1])[0]
+        offset += 1
+        value = ((value + 1) << 7) + (c & 127)
+    # END while more bytes follow
+    return value, offset
+
+
+def _read_ewah(data, offset):
+    """:return: tuple(positions, offset) of the ewah compressed bitmap at offset, positions
+        being the sorted list of all set bits"""
+    bit_size, word_count = unpack(">LL", data[offset:offset + 8])
+    offset += 8
+    words = unpack(">%iQ" % word_count, data[offset:offset + word_count * 8])
+    offset += word_count * 8 + 4     # skip the position of the last run length word
+    positions = []
+    pos = 0
+    wi = 0
+    while wi < word_count:
+        rlw = words[wi]
+        wi += 1
+        run_length = (rlw >> 1) & 0xffffffff
+        if rlw & 1:
+            positions.extend(xrange(pos, pos + run_length * 64))
+        pos += run_length * 64
+        for word in words[wi:wi + (rlw >> 33)]:
+            bit = 0
+            while word:
+                if word & 1:
+                    positions.append(pos + bit)
+                word >>= 1
+                bit += 1
+            # END for each set bit
+            pos += 64
+        # END for each literal word
+        wi += rlw >> 33
+    # END for each run length word
+    return [p for p in positions if p < bit_size], offset
+
+
+def read_untracked_cache(data):
+    """:return: UntrackedCache parsed from the data of an UNTR extension"""
+    ident_size, offset = _decode_varint(data, 0)
+    ident = data[offset:offset + ident_size]
+    offset += ident_size
+    # stat data of info/exclude and core.excludesFile, which we don't check
+    offset += 36 * 2
+    dir_flags = unpack(">L", data[offset:offset + 4])[0]
+    offset += 4 + 20 * 2
+    end = data.index(b"\0", offset)
+    exclude_per_dir = data[offset:end].decode(defenc)
+    offset = end + 1
+
+    dirs = []
+    dir_count, offset = _decode_varint(data, offset)
+
+    def read_dir(parent_path, offset):
+        untracked_count, offset = _decode_varint(data, offset)
+        subdir_count, offset = _decode_varint(data, offset)
+        end = data.index(b"\0", offset)
+        name = data[offset:end].decode(defenc)
+        offset = end + 1
+        untracked = []
+        for _ in xrange(untracked_count):
+            end = data.index(b"\0", offset)
+            untracked.append(data[offset:end].decode(defenc))
+            offset = end + 1
+        # END for each untracked name
+        path = parent_path + name
+        dirs.append(UntrackedCacheDir(path, untracked))
+        for _ in xrange(subdir_count):
+            offset = read_dir(path + '/' if path else '', offset)
+        return offset
+    # END read_dir
+
+    if dir_count:
+        offset = read_dir('', offset)
+        valid, offset = _read_ewah(data, offset)
+        check_only, offset = _read_ewah(data, offset)
+        exclude_valid, offset = _read_ewah(data, offset)
+        for index in check_only:
+            dirs[index].check_only = True
+        for index in valid:
+            ctime, mtime = unpack(">LL", data[offset:offset + 8]), unpack(">LL", data[offset + 8:offset + 16])
+            dirs[index].valid = True
+            dirs[index].ctime, dirs[index].mtime = ctime, mtime
+            offset += 36
+        # END for each valid directory
+        for index in exclude_valid:
+            dirs[index].exclude_binsha = data[offset:offset + 20]
+            offset += 20
+        # END for each directory with an exclude file
+    # END handle directories
+    return UntrackedCache(ident, dir_flags, exclude_per_dir, dirs, data)
+
+
+def read_fsmonitor(data):
+    """:return: FSMonitorData parsed from the data of an FSMN extension"""
+    version = unpack(">L", data[:4])[0]
+    if version == 1:
+        token = unpack(">Q", data[4:12])[0]
+        offset = 12
+    else:
+        end = data.index(b"\0", 4)
+        token = data[4:end].decode(defenc)
+        offset = end + 1
+    # END handle version
+    dirty = _read_ewah(data, offset + 4)[0]
+    return FSMonitorData(version, token, dirty, data)
+
+
+def read_index_extensions(entries, extension_data):
+    """Parse the extensions we understand out of the given extension data and attach
+    them to entries, an IndexEntries instance.
+
+    :return: extension data of all extensions we don't understand, to be written back as is"""
+    unknown = []
+    for signature, data in read_extensions(extension_data):
+        try:
+            if signature == EXT_CACHE_TREE:
+                entries.cache_tree = read_cache_tree(data)
+            elif signature == EXT_UNTRACKED_CACHE:
+                entries.untracked_cache = read_untracked_cache(data)
+            elif signature == EXT_FSMONITOR:
+                entries.fsmonitor = read_fsmonitor(data)
+            elif signature not in EXT_OFFSET_TABLES:
+                unknown.append((signature, data))
+            # END handle signature
+        except (ValueError, IndexError, struct_error):
+            # a format we don't know, keep it as it is
+            unknown.append((signature, data))
+        # END handle unparseable extensions
+    # END for each extension
+    return write_extensions(unknown)
+
+
+def write_index_extensions(entries):
+    """:return: extension data of the extensions attached to the given IndexEntries"""
+    extensions = []
+    if entries.cache_tree is not None:
+        extensions.append((EXT_CACHE_TREE, write_cache_tree(entries.cache_tree)))
+    if entries.untracked_cache is not None:
+        extensions.append((EXT_UNTRACKED_CACHE, entries.untracked_cache.data))
+    if entries.fsmonitor is not None:
+        extensions.append((EXT_FSMONITOR, entries.fsmonitor.data))
+    return write_extensions(extensions)
+
+
+def entry_stat_matches(entry, st, racy_mtime=None, trust_ctime=True):
+    """Check whether the stat data cached in an index entry still describes a file
+
+    :param entry: IndexEntry of the file
+    :param st: result of os.lstat on the file in the working tree
+    :param racy_mtime: Tuple(seconds, nano_seconds) of the index file's mtime. Files
+        modified at or after it may have changed within the same timestamp granularity
+        without the entry noticing, their stat data is never trusted
+    :param trust_ctime: if False, the ctime is not compared
+    :return: True if the file can be assumed to have the entry's content without
+        reading it"""
+    mtime = unpack(">LL", entry[5])
+    if entry[10] != (st.st_size & 0xffffffff) or mtime == (0, 0):
+        return False
+    if int(st.st_mtime) != mtime[0]:
+        return False
+    # entries written without nano seconds only compare seconds
+    if mtime[1] and getattr(st, 'st_mtime_ns', mtime[1]) % 1000000000 != mtime[1]:
+        return False
+    if trust_ctime and int(st.st_ctime) != unpack(">L", entry[4][:4])[0]:
+        return False
+    if entry[7] and entry[7] != (st.st_ino & 0xffffffff):
+        return False
+    if racy_mtime is not None and mtime >= racy_mtime:
+        return False
+    return True
+
+
+def _is_binary(data):
+    """:return: True if data looks binary the way git's auto text detection sees it"""
+    return b"\0" in data[:8000]
+
+
+def hash_worktree_file(filepath, st, autocrlf=False):
+    """Compute the blob sha(s) of a file in the working tree, without storing it
+
+    :param filepath: path to the file, which may be a symlink
+    :param st: result of os.lstat on the file
+    :param autocrlf: if True, text files have their line endings converted from CRLF
+        to LF before hashing, like git does when adding them
+    :return: list of candidate binary shas of the blob git would store for the
+        file. There are two if line endings were converted, as git keeps CRLF
+        line endings of blobs which had them already"""
+    if S_ISLNK(st.st_mode):
+        data = force_bytes(os.readlink(filepath), encoding=defenc)
+    else:
+        with open(filepath, 'rb') as fp:
+            data = fp.read()
+    # END handle symlinks
+    candidates = [data]
+    if autocrlf and b"\r\n" in data and not _is_binary(data):
+        candidates.insert(0, data.replace(b"\r\n", b"\n"))
+    # END handle line endings
+    shas = []
+    for content in candidates:
+        sha = hashlib.sha1(("blob %i\0" % len(content)).encode('ascii'))
+        sha.update(content)
+        shas.append(sha.digest())
+    # END for each candidate
+    return shas
+
+
+def write_tree_from_cache(entries, odb, sl, si=0, cache_tree=None):
     """Create a tree from the given sorted list of entries and put the respective
     trees into the given object database
 
@@ -234,12 +540,20 @@ def write_tree_from_cache(entries, odb, sl, si=0):
     :param odb: object database to store the trees in
     :param si: start index at which we should start creating subtrees
     :param sl: slice indicating the range we should process on the entries list
+    :param cache_tree: if not None, the CacheTree node describing the processed range.
+        Sub trees it knows to be valid are not written again, and all nodes are
+        updated to describe the trees written
     :return: tuple(binsha, list(tree_entry, ...)) a tuple of a sha and a list of
         tree entries being a tuple of hexsha, mode, name"""
     tree_items = []
     tree_items_append = tree_items.append
     ci = sl.start
     end = sl.stop
+    if cache_tree is not None:
+        # only keep nodes of sub trees which still exist
+        subtrees = cache_tree.children
+        cache_tree.children = {}
+    # END prepare cache tree
     while ci < end:
         entry = entries[ci]
         if entry.stage != 0:
@@ -253,19 +567,36 @@ def write_tree_from_cache(entries, odb, sl, si=0):
         else:
             # find common base range
             base = entry.path[si:rbound]
-            xi = ci
-            while xi < end:
-                oentry = entries[xi]
-                orbound = oentry.path.find('/', si)
-                if orbound == -1 or oentry.path[si:orbound] != base:
-                    break
-                # END abort on base mismatch
-                xi += 1
-            # END find common base
-
-            # enter recursion
-            # ci - 1 as we want to count our current item as well
-            sha, tree_entry_list = write_tree_from_cache(entries, odb, slice(ci - 1, xi), rbound + 1)  # @UnusedVariable
+            subtree = None
+            xi = None
+            if cache_tree is not None:
+                subtree = subtrees.get(base) or CacheTree(base)
+                cache_tree.children[base] = subtree
+                if subtree.entry_count > 0 and _is_tree_range(entries, ci - 1, ci - 1 + subtree.entry_count, end,
+                                                              entry.path[:rbound + 1]):
+                    xi = ci - 1 + subtree.entry_count
+                # END check cached range
+            # END handle cache tree
+
+            if xi is None:
+                xi = ci
+                while xi < end:
+                    oentry = entries[xi]
+                    orbound = oentry.path.find('/', si)
+                    if orbound == -1 or oentry.path[si:orbound] != base:
+                        break
+                    # END abort on base mismatch
+                    xi += 1
+                # END find common base
+
+                # enter recursion
+                # ci - 1 as we want to count our current item as well
+                sha, tree_entry_list = write_tree_from_cache(entries, odb, slice(ci - 1, xi), rbound + 1,
+                                                             subtree)  # @UnusedVariable
+            else:
+                # the sub tree was written before and none of its entries changed
+                sha = subtree.binsha
+            # END handle cached trees
             tree_items_append((sha, S_IFDIR, base))
 
             # skip ahead
@@ -279,9 +610,23 @@ def write_tree_from_cache(entries, odb, sl, si=0):
     sio.seek(0)
 
     istream = odb.store(IStream(str_tree_type, len(sio.getvalue()), sio))
+    if cache_tree is not None:
+        cache_tree.entry_count = end - sl.start
+        cache_tree.binsha = istream.binsha
+    # END update cache tree
     return (istream.binsha, tree_items)
 
 
+def _is_tree_range(entries, start, stop, end, prefix):
+    """:return: True if entries[start:stop] are exactly the entries within end starting
+        with prefix, the path of a directory including its trailing slash"""
+    if stop > end:
+        return False
+    if not entries[stop - 1].path.startswith(prefix):
+        return False
+    return stop == end or not entries[stop].path.startswith(prefix)
+
+
 def _tree_entry_to_baseindexentry(tree_entry, stage):
     return BaseIndexEntry((tree_entry[1], tree_entry[0], stage << CE_STAGESHIFT, tree_entry[2]))
 
@@ -382,3 +727,72 @@ def aggressive_tree_merge(odb, tree_shas):
     # END for each entries tuple
 
     return out
+
+
+def diff_tree_index_entries(odb, tree_sha, entries, paths, cache_tree=None):
+    """Compare a tree with the entries of an index, walking both in lockstep. Directories
+    whose tree recorded in the cache_tree equals the one of the tree are skipped, along
+    with their entries.
+
+    :param odb: object database to read the trees from
+    :param tree_sha: binary sha of the tree to compare from, or None for the empty tree
+    :param entries: sequence of all IndexEntries of stage 0 sorted by path. Only those
+        which are compared are accessed
+    :param paths: list of the paths of the entries as bytes
+    :param cache_tree: root CacheTree of the index, or None
+    :return: generator yielding tuple(tree_entry, index_entry) like
+        git.objects.fun.diff_tree_entries does"""
+    return _diff_tree_index(odb, tree_sha, entries, paths, 0, len(paths), cache_tree, b'')
+
+
+def _diff_tree_index(odb, tree_sha, entries, paths, lo, hi, node, path_prefix):
+    """Implements diff_tree_index_entries for the entries[lo:hi] below path_prefix,
+    node being the CacheTree of their directory or None"""
+    # turn the entries into tree items, directories being tuple(binsha, mode, name,
+    # lo, hi, node) with binsha being None if the cache doesn't know their tree
+    items = []
+    prefix_len = len(path_prefix)
+    i = lo
+    while i < hi:
+        path = paths[i]
+        slash = path.find(b'/', prefix_len)
+        if slash < 0:
+            entry = entries[i]
+            items.append((entry[1], entry[0], path[prefix_len:]))
+            i += 1
+            continue
+        # END handle files
+        name = path[prefix_len:slash]
+        # all paths of the directory sort before the one with its slash incremented
+        end = bisect_left(paths, path[:slash] + b'0', i, hi)
+        child = node.children.get(safe_decode(name)) if node is not None else None
+        child_sha = child.binsha if child is not None and child.valid else None
+        items.append((child_sha, S_IFDIR, name, i, end, child))
+        i = end
+    # END for each entry
+
+    tree_items = _tree_items(odb.stream(tree_sha).read()) if tree_sha is not None else []
+    for a, b in _pair_items(tree_items, items):
+        if a is not None and b is not None:
+            if a[0] == b[0] and a[1] == b[1]:
+                continue
+            path = path_prefix + a[2]
+            if S_ISDIR(a[1]):
+                for pair in _diff_tree_index(odb, a[0], entries, paths, b[3], b[4], b[5], path + b'/'):
+                    yield pair
+            else:
+                yield (a[0], a[1], path), (b[0], b[1], path)
+        elif a is not None:
+            if S_ISDIR(a[1]):
+                for entry in _iter_tree_blobs(odb, a[0], path_prefix + a[2] + b'/'):
+                    yield entry, None
+            else:
+                yield (a[0], a[1], path_prefix + a[2]), None
+        elif S_ISDIR(b[1]):
+            for i in xrange(b[3], b[4]):
+                entry = entries[i]
+                yield None, (entry[1], entry[0], paths[i])
+        else:
+            yield None, (b[0], b[1], path_prefix + b[2])
+        # END handle sides
+    # END for each pair of items
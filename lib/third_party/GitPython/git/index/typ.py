@@ -1,6 +1,9 @@
 """Module with additional types used by the index"""
 
 from binascii import b2a_hex
+import os
+from struct import Struct
+import sys
 
 from .util import (
     pack,
@@ -8,8 +11,14 @@ from .util import (
 )
 from git.objects import Blob
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 
-__all__ = ('BlobFilter', 'BaseIndexEntry', 'IndexEntry')
+
+__all__ = ('BlobFilter', 'BaseIndexEntry', 'IndexEntry', 'IndexEntries', 'CacheTree',
+           'UntrackedCache', 'UntrackedCacheDir', 'FSMonitorData')
 
 #{ Invariants
 CE_NAMEMASK = 0x0fff
@@ -18,6 +27,16 @@ CE_EXTENDED = 0x4000
 CE_VALID = 0x8000
 CE_STAGESHIFT = 12
 
+# fixed-width part of an entry on disk:
+# ctime, mtime, dev, ino, mode, uid, gid, size, sha, flags
+CE_STRUCT = Struct(">8s8sLLLLLL20sH")
+# just the flags, at the end of the fixed-width part
+CE_FLAGS_STRUCT = Struct(">H")
+CE_FLAGS_OFFSET = CE_STRUCT.size - CE_FLAGS_STRUCT.size
+
+# dicts keep their insertion order
+DICT_ORDERED = sys.version_info[:2] >= (3, 7)
+
 #} END invariants
 
 
@@ -174,3 +193,243 @@ class IndexEntry(BaseIndexEntry):
         time = pack(">LL", 0, 0)
         return IndexEntry((blob.mode, blob.binsha, stage << CE_STAGESHIFT, blob.path,
                            time, time, 0, 0, 0, 0, blob.size))
+
+
+class IndexEntries(MutableMapping):
+
+    """Entries dictionary of an index, backed by the raw index data it was read from.
+
+    Keys are known up front, but the IndexEntry of a key is only unpacked from the
+    raw data the first time it is accessed. Entries assigned afterwards are stored
+    as they are, like in a plain dict."""
+    __slots__ = ('_data', '_entries', '_in_order', 'cache_tree', 'untracked_cache', 'fsmonitor')
+
+    def __init__(self, data=b'', offsets=None):
+        """
+        :param data: raw index data, starting right after the index header
+        :param offsets: dict mapping (path, stage) keys to the offset of the
+            respective entry in data"""
+        self._data = data
+        self._entries = offsets if offsets is not None else {}
+        # entries are stored sorted on disk, this stays true until a key is added
+        self._in_order = DICT_ORDERED
+        # index extensions kept in sync with the entries, see _changed()
+        self.cache_tree = None
+        self.untracked_cache = None
+        self.fsmonitor = None
+
+    def __getitem__(self, key):
+        entry = self._entries[key]
+        if not isinstance(entry, tuple):
+            ctime, mtime, dev, ino, mode, uid, gid, size, sha, flags = CE_STRUCT.unpack_from(self._data, entry)
+            entry = IndexEntry((mode, sha, flags, key[0], ctime, mtime, dev, ino, uid, gid, size))
+            self._entries[key] = entry
+        # END unpack on first access
+        return entry
+
+    def __setitem__(self, key, entry):
+        if self._in_order and key not in self._entries:
+            self._in_order = False
+        self._changed(key[0])
+        self._entries[key] = entry
+
+    def __delitem__(self, key):
+        del self._entries[key]
+        self._changed(key[0])
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "%s(%i entries)" % (type(self).__name__, len(self))
+
+    def keys(self):
+        return self._entries.keys()
+
+    def copy(self):
+        """:return: plain dict with all entries unpacked"""
+        return dict(self.items())
+
+    def _changed(self, path):
+        """Update the extensions describing the entries after the entry at path changed.
+        The cached trees containing the path are invalidated, the untracked cache and
+        the fsmonitor bitmap can't be updated without a worktree scan and are dropped"""
+        if self.cache_tree is not None:
+            self.cache_tree.invalidate(path)
+        self.untracked_cache = None
+        self.fsmonitor = None
+
+    def sorted_entries(self):
+        """:return: sequence of all entries sorted by path, then by stage. Entries are
+            only unpacked once they are indexed"""
+        keys = self._entries.keys() if self._in_order else sorted(self._entries)
+        return _SortedEntries(self, list(keys))
+
+    def sorted_records(self):
+        """:return: list of all entries sorted by path, then by stage. Entries which
+            were never accessed are returned as their raw, padded on-disk record
+            which can be written out as is"""
+        data = self._data
+        fixed_size = CE_STRUCT.size
+        unpack_flags = CE_FLAGS_STRUCT.unpack_from
+        records = []
+        append = records.append
+        items = self._entries.items() if self._in_order else sorted(self._entries.items())
+        for key, entry in items:
+            if isinstance(entry, tuple):
+                append(entry)
+                continue
+            # END handle unpacked entries
+            path_size = unpack_flags(data, entry + CE_FLAGS_OFFSET)[0] & CE_NAMEMASK
+            append(data[entry:entry + ((fixed_size + path_size + 8) & ~7)])
+        # END for each key
+        return records
+
+
+class _SortedEntries(object):
+
+    """Read-only sequence over the entries of an IndexEntries instance, in a given key order"""
+    __slots__ = ('_entries', '_keys')
+
+    def __init__(self, entries, keys):
+        self._entries = entries
+        self._keys = keys
+
+    def __getitem__(self, index):
+        return self._entries[self._keys[index]]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        """:return: list of the (path, stage) keys of the entries, in order"""
+        return self._keys
+
+
+class CacheTree(object):
+
+    """Node of the cached tree extension (TREE) of an index.
+
+    Each node describes a directory of the index: the amount of index entries it
+    contains and the sha of the tree object made from them. A node with an
+    entry_count of -1 is invalid, its tree needs to be written again."""
+    __slots__ = ('name', 'entry_count', 'binsha', 'children')
+
+    def __init__(self, name='', entry_count=-1, binsha=None):
+        self.name = name
+        self.entry_count = entry_count
+        self.binsha = binsha
+        # name -> CacheTree of each sub directory
+        self.children = {}
+
+    def __repr__(self):
+        return "%s(%r, %i, %i children)" % (type(self).__name__, self.name, self.entry_count, len(self.children))
+
+    @property
+    def valid(self):
+        """:return: True if binsha is the tree of all entry_count entries of this node"""
+        return self.entry_count >= 0
+
+    def invalidate(self, path):
+        """Invalidate this node and all nodes containing the given entry path
+
+        :param path: path of an index entry relative to this node"""
+        node = self
+        node.entry_count, node.binsha = -1, None
+        tokens = path.split('/')
+        for name in tokens[:-1]:
+            node = node.children.get(name)
+            if node is None:
+                return
+            # END handle untracked trees
+            node.entry_count, node.binsha = -1, None
+        # END for each parent directory
+        # the entry may replace a directory of the same name
+        node.children.pop(tokens[-1], None)
+
+
+class UntrackedCacheDir(object):
+
+    """Directory recorded in the untracked cache extension"""
+    __slots__ = ('path', 'untracked', 'valid', 'check_only', 'ctime', 'mtime', 'exclude_binsha')
+
+    def __init__(self, path, untracked):
+        self.path = path
+        self.untracked = untracked
+        self.valid = False
+        self.check_only = False
+        # Tuple(seconds, nano_seconds), only set for valid directories
+        self.ctime = None
+        self.mtime = None
+        # sha of the directory's exclude file, if it has one
+        self.exclude_binsha = None
+
+    def __repr__(self):
+        return "%s(%r, %i untracked)" % (type(self).__name__, self.path, len(self.untracked))
+
+    def is_unchanged(self, working_tree_dir):
+        """:return: True if the directory is valid and was not modified since it was
+            recorded, in which case its list of untracked files is still accurate"""
+        if not self.valid:
+            return False
+        try:
+            st = os.stat(os.path.join(working_tree_dir, self.path) if self.path else working_tree_dir)
+        except OSError:
+            return False
+        # END handle removed directories
+        mtime_ns = getattr(st, 'st_mtime_ns', None)
+        if mtime_ns is None:
+            return int(st.st_mtime) == self.mtime[0]
+        return divmod(mtime_ns, 1000000000) == self.mtime
+
+
+class UntrackedCache(object):
+
+    """Untracked cache extension (UNTR) of an index, as written by git.
+
+    It is read to tell which directories were not modified since git last listed
+    their untracked files, the raw data is written back as long as the entries of
+    the index did not change."""
+    __slots__ = ('ident', 'dir_flags', 'exclude_per_dir', 'dirs', 'data')
+
+    def __init__(self, ident, dir_flags, exclude_per_dir, dirs, data):
+        self.ident = ident
+        self.dir_flags = dir_flags
+        self.exclude_per_dir = exclude_per_dir
+        # UntrackedCacheDir instances, parents before their sub directories
+        self.dirs = dirs
+        self.data = data
+
+    def __repr__(self):
+        return "%s(%i directories)" % (type(self).__name__, len(self.dirs))
+
+    def unchanged_dirs(self, working_tree_dir):
+        """:return: list of UntrackedCacheDir instances whose directory does not need
+            to be listed again to find its untracked files"""
+        return [d for d in self.dirs if d.is_unchanged(working_tree_dir)]
+
+
+class FSMonitorData(object):
+
+    """File system monitor extension (FSMN) of an index.
+
+    The raw data is written back as long as the entries of the index did not change,
+    as the bitmap of dirty entries refers to entries by position."""
+    __slots__ = ('version', 'token', 'dirty', 'data')
+
+    def __init__(self, version, token, dirty, data):
+        self.version = version
+        # nano seconds since epoch for version 1, an opaque string for version 2
+        self.token = token
+        # positions of the entries the monitor reported as possibly modified
+        self.dirty = dirty
+        self.data = data
+
+    def __repr__(self):
+        return "%s(%i, %r, %i dirty)" % (type(self).__name__, self.version, self.token, len(self.dirty))
@@ -35,6 +35,7 @@ from time import (
 )
 import os
 from io import BytesIO
+from itertools import islice
 import logging
 
 log = logging.getLogger('git.objects.commit')
@@ -61,6 +62,9 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
     # INVARIANTS
     default_encoding = "UTF-8"
 
+    # number of commits whose data is fetched at once when iterating in bulk
+    bulk_batch_size = 256
+
     # object configuration
     type = "commit"
     __slots__ = ("tree",
@@ -174,6 +178,9 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
         # as the empty paths version will ignore merge commits for some reason.
         if paths:
             return len(self.repo.git.rev_list(self.hexsha, '--', paths, **kwargs).splitlines())
+        elif not kwargs:
+            # plain history walks don't need git, see Repo.commit_graph
+            return self.repo.commit_graph.count(self.binsha)
         else:
             return len(self.repo.git.rev_list(self.hexsha, **kwargs).splitlines())
 
@@ -186,7 +193,7 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
         return self.repo.git.name_rev(self)
 
     @classmethod
-    def iter_items(cls, repo, rev, paths='', **kwargs):
+    def iter_items(cls, repo, rev, paths='', bulk=False, **kwargs):
         """Find all commits matching the given criteria.
 
         :param repo: is the Repo
@@ -194,6 +201,10 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
         :param paths:
             is an optional path or list of paths, if set only Commits that include the path
             or paths will be considered
+        :param bulk:
+            if True, the commits' data is fetched in batches and parsed before they are
+            returned, instead of lazily with one object database request per commit.
+            Use it if you access more than the hexsha of the returned commits
         :param kwargs:
             optional keyword arguments to git rev-list where
             ``max_count`` is the maximum number of commits to fetch
@@ -212,7 +223,10 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
         # END if paths
 
         proc = repo.git.rev_list(rev, args, as_process=True, **kwargs)
-        return cls._iter_from_process_or_stream(repo, proc)
+        commits = cls._iter_from_process_or_stream(repo, proc)
+        if bulk:
+            return cls._iter_with_data(repo, commits)
+        return commits
 
     def iter_parents(self, paths='', **kwargs):
         """Iterate _all_ parents of this commit.
@@ -278,6 +292,31 @@ class Commit(base.Object, Iterable, Diffable, Traversable, Serializable):
         if hasattr(proc_or_stream, 'wait'):
             finalize_process(proc_or_stream)
 
+    @classmethod
+    def _iter_with_data(cls, repo, commits):
+        """Deserialize the given commits in batches of bulk_batch_size, using the object
+        database's stream_batch method if it has one
+
+        :return: iterator yielding the given commits, with all their data set"""
+        odb = repo.odb
+        stream_batch = getattr(odb, 'stream_batch', None)
+        if stream_batch is None:
+            def stream_batch(shas):
+                return [odb.stream(sha) for sha in shas]
+        # END handle databases without batch support
+
+        commits = iter(commits)
+        while True:
+            batch = list(islice(commits, cls.bulk_batch_size))
+            if not batch:
+                break
+            for commit, ostream in zip(batch, stream_batch([commit.binsha for commit in batch])):
+                commit.size = ostream.size
+                commit._deserialize(BytesIO(ostream.read()))
+                yield commit
+            # END for each commit
+        # END for each batch
+
     @classmethod
     def create_from_tree(cls, repo, tree, message, parent_commits=None, head=False, author=None, committer=None,
                          author_date=None, commit_date=None):
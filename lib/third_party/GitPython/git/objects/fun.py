@@ -10,7 +10,7 @@ from git.compat import (
 )
 
 __all__ = ('tree_to_stream', 'tree_entries_from_data', 'traverse_trees_recursive',
-           'traverse_tree_recursive')
+           'traverse_tree_recursive', 'diff_tree_entries')
 
 
 def tree_to_stream(entries, write):
@@ -42,50 +42,31 @@ def tree_to_stream(entries, write):
     # END for each item
 
 
-def tree_entries_from_data(data):
-    """Reads the binary representation of a tree and returns tuples of Tree items
-    :param data: data block with tree data (as bytes)
-    :return: list(tuple(binsha, mode, tree_relative_path), ...)"""
-    ord_zero = ord('0')
-    space_ord = ord(' ')
+def _tree_items(data):
+    """:return: list(tuple(binsha, mode, name), ...) of the binary tree data, the
+        name being kept as bytes"""
+    out = []
+    append = out.append
+    find = data.find
     len_data = len(data)
     i = 0
-    out = []
     while i < len_data:
-        mode = 0
-
-        # read mode
-        # Some git versions truncate the leading 0, some don't
-        # The type will be extracted from the mode later
-        while byte_ord(data[i]) != space_ord:
-            # move existing mode integer up one level being 3 bits
-            # and add the actual ordinal value of the character
-            mode = (mode << 3) + (byte_ord(data[i]) - ord_zero)
-            i += 1
-        # END while reading mode
-
-        # byte is space now, skip it
-        i += 1
+        # Some git versions truncate the leading 0 of the mode, some don't
+        space = find(b' ', i)
+        null = find(b'\0', space)
+        append((data[null + 1:null + 21], int(data[i:space], 8), data[space + 1:null]))
+        i = null + 21
+    # END for each entry
+    return out
 
-        # parse name, it is NULL separated
 
-        ns = i
-        while byte_ord(data[i]) != 0:
-            i += 1
-        # END while not reached NULL
-
-        # default encoding for strings in git is utf8
-        # Only use the respective unicode object if the byte stream was encoded
-        name = data[ns:i]
-        name = safe_decode(name)
-
-        # byte is NULL, get next 20
-        i += 1
-        sha = data[i:i + 20]
-        i = i + 20
-        out.append((sha, mode, name))
-    # END for each byte in data stream
-    return out
+def tree_entries_from_data(data):
+    """Reads the binary representation of a tree and returns tuples of Tree items
+    :param data: data block with tree data (as bytes)
+    :return: list(tuple(binsha, mode, tree_relative_path), ...)"""
+    # default encoding for strings in git is utf8
+    # Only use the respective unicode object if the byte stream was encoded
+    return [(sha, mode, safe_decode(name)) for sha, mode, name in _tree_items(data)]
 
 
 def _find_by_name(tree_data, name, is_dir, start_at):
@@ -205,3 +186,87 @@ def traverse_tree_recursive(odb, tree_sha, path_prefix):
     # END for each item
 
     return entries
+
+
+def _sort_key(item):
+    """:return: the name git sorts the given tree entry by, which for trees is followed by a slash"""
+    if S_ISDIR(item[1]):
+        return item[2] + b'/'
+    return item[2]
+
+
+def _pair_items(a_items, b_items):
+    """:return: generator yielding tuple(a_item, b_item) for each name in the given sorted
+        lists of tree items, the item being None on the side the name doesn't exist in"""
+    i = j = 0
+    len_a, len_b = len(a_items), len(b_items)
+    while i < len_a and j < len_b:
+        a_key, b_key = _sort_key(a_items[i]), _sort_key(b_items[j])
+        if a_key == b_key:
+            yield a_items[i], b_items[j]
+            i += 1
+            j += 1
+        elif a_key < b_key:
+            yield a_items[i], None
+            i += 1
+        else:
+            yield None, b_items[j]
+            j += 1
+        # END advance the smaller side
+    # END while both sides have items
+    for item in a_items[i:]:
+        yield item, None
+    for item in b_items[j:]:
+        yield None, item
+
+
+def _iter_tree_blobs(odb, tree_sha, path_prefix):
+    """:return: generator yielding tuple(binsha, mode, path) for all non-tree entries
+        below the tree with the given binary sha"""
+    for sha, mode, name in _tree_items(odb.stream(tree_sha).read()):
+        if S_ISDIR(mode):
+            for entry in _iter_tree_blobs(odb, sha, path_prefix + name + b'/'):
+                yield entry
+        else:
+            yield (sha, mode, path_prefix + name)
+    # END for each item
+
+
+def diff_tree_entries(odb, a_sha, b_sha, path_prefix=b''):
+    """Compare two trees by walking their sorted entries in lockstep. Sub-trees with
+    the same sha on both sides are skipped without being read.
+
+    :param odb: object database to read the trees from
+    :param a_sha: binary sha of the tree to compare from, or None for the empty tree
+    :param b_sha: binary sha of the tree to compare to, or None for the empty tree
+    :param path_prefix: bytes to prefix the returned paths with
+    :return: generator yielding tuple(a_entry, b_entry) for each differing blob or
+        submodule in the order of its path, an entry being tuple(binsha, mode, path) with
+        path being bytes, or None if the path doesn't exist on the respective side.
+        A blob replaced by a tree of the same name is yielded as deletion and additions"""
+    a_items = _tree_items(odb.stream(a_sha).read()) if a_sha is not None else []
+    b_items = _tree_items(odb.stream(b_sha).read()) if b_sha is not None else []
+    for a, b in _pair_items(a_items, b_items):
+        if a is not None and b is not None:
+            if a[0] == b[0] and a[1] == b[1]:
+                continue
+            path = path_prefix + a[2]
+            if S_ISDIR(a[1]):
+                for pair in diff_tree_entries(odb, a[0], b[0], path + b'/'):
+                    yield pair
+            else:
+                yield (a[0], a[1], path), (b[0], b[1], path)
+        elif a is not None:
+            if S_ISDIR(a[1]):
+                for entry in _iter_tree_blobs(odb, a[0], path_prefix + a[2] + b'/'):
+                    yield entry, None
+            else:
+                yield (a[0], a[1], path_prefix + a[2]), None
+        else:
+            if S_ISDIR(b[1]):
+                for entry in _iter_tree_blobs(odb, b[0], path_prefix + b[2] + b'/'):
+                    yield None, entry
+            else:
+                yield None, (b[0], b[1], path_prefix + b[2])
+        # END handle sides
+    # END for each pair of items
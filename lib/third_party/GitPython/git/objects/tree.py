@@ -3,6 +3,10 @@
 #
 # This module is part of GitPython and is released under
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php
+from array import array
+from collections import OrderedDict
+import threading
+
 from git.util import join_path
 import git.diff as diff
 from git.util import to_bin_sha
@@ -11,10 +15,9 @@ from . import util
 from .base import IndexObject
 from .blob import Blob
 from .submodule.base import Submodule
-from git.compat import string_types
+from git.compat import string_types, safe_decode
 
 from .fun import (
-    tree_entries_from_data,
     tree_to_stream
 )
 
@@ -73,6 +76,187 @@ def merge_sort(a, cmp):
         k = k + 1
 
 
+class TreeEntries(object):
+
+    """Read-only sequence of the (binsha, mode, name) entries of a tree, parsed into
+    parallel arrays of sha offsets into the tree data, modes and names.
+
+    Entry tuples are only created for the entries accessed by index, names are looked
+    up using a dict built on first use."""
+    __slots__ = ('_data', '_offsets', '_modes', '_names', '_index')
+
+    def __init__(self, data, offsets, modes, names):
+        self._data = data
+        self._offsets = offsets
+        self._modes = modes
+        self._names = names
+        self._index = None
+
+    @classmethod
+    def from_data(cls, data):
+        """:return: TreeEntries parsed from the binary representation of a tree"""
+        offsets = array('L')
+        modes = array('L')
+        names = []
+        find = data.find
+        len_data = len(data)
+        i = 0
+        while i < len_data:
+            # Some git versions truncate the leading 0 of the mode, some don't
+            space = find(b' ', i)
+            null = find(b'\0', space)
+            modes.append(int(data[i:space], 8))
+            # default encoding for strings in git is utf8
+            names.append(safe_decode(data[space + 1:null]))
+            offsets.append(null + 1)
+            i = null + 21
+        # END for each entry
+        return cls(data, offsets, modes, names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        offset = self._offsets[index]
+        return (self._data[offset:offset + 20], self._modes[index], self._names[index])
+
+    def __iter__(self):
+        data = self._data
+        for offset, mode, name in zip(self._offsets, self._modes, self._names):
+            yield (data[offset:offset + 20], mode, name)
+        # END for each entry
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __repr__(self):
+        return "%s(%i entries)" % (type(self).__name__, len(self))
+
+    @property
+    def names(self):
+        """:return: list of the names of all entries, in order"""
+        return self._names
+
+    @property
+    def modes(self):
+        """:return: array of the modes of all entries, in order"""
+        return self._modes
+
+    def binsha(self, index):
+        """:return: binary sha of the entry at the given index"""
+        offset = self._offsets[index]
+        return self._data[offset:offset + 20]
+
+    def size(self):
+        """:return: amount of bytes of tree data we represent"""
+        return len(self._data)
+
+    def find(self, name):
+        """:return: index of the entry with the given name, or -1 if there is none"""
+        index = self._index
+        if index is None:
+            index = self._index = dict((n, i) for i, n in enumerate(self._names))
+        # END build index on first use
+        return index.get(name, -1)
+
+    def find_binsha(self, binsha):
+        """:return: index of the first entry with the given binary sha, or -1 if there is none"""
+        startswith = self._data.startswith
+        for i, offset in enumerate(self._offsets):
+            if startswith(binsha, offset):
+                return i
+        # END for each entry
+        return -1
+
+
+class TreeEntriesCache(object):
+
+    """Least recently used cache of TreeEntries keyed by the binary sha of their tree,
+    and bounded by the total amount of tree data they represent.
+
+    As trees are identified by their content, an instance can be shared by all
+    repositories, and by multiple threads."""
+    __slots__ = ('_max_bytes', '_entries', '_size', '_lock', 'hits', 'misses')
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, binsha):
+        return binsha in self._entries
+
+    def max_bytes(self):
+        """:return: byte budget of this cache"""
+        return self._max_bytes
+
+    def size(self):
+        """:return: amount of tree data represented by the cached entries"""
+        return self._size
+
+    def get(self, binsha):
+        """:return: TreeEntries cached for the tree with the given binary sha, or None.
+            A hit makes them the most recently used ones"""
+        with self._lock:
+            entries = self._entries.pop(binsha, None)
+            if entries is None:
+                self.misses += 1
+                return None
+            # END handle miss
+            self._entries[binsha] = entries
+            self.hits += 1
+        return entries
+
+    def set(self, binsha, entries):
+        """Cache the entries of the tree with the given binary sha, evicting the least
+        recently used ones to stay within our byte budget"""
+        cached = self._entries
+        with self._lock:
+            previous = cached.pop(binsha, None)
+            if previous is not None:
+                self._size -= previous.size()
+            # END handle replacement
+            cached[binsha] = entries
+            self._size += entries.size()
+
+            while self._size > self._max_bytes and len(cached) > 1:
+                self._size -= cached.popitem(last=False)[1].size()
+            # END evict oldest
+        # END with lock
+
+    def clear(self):
+        """Drop all cached entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+        # END with lock
+
+
+def _find_entry(entries, name):
+    """:return: index of the entry with the given name in TreeEntries or a list of
+        entry tuples, or -1 if there is none"""
+    if isinstance(entries, TreeEntries):
+        return entries.find(name)
+    for i, info in enumerate(entries):
+        if info[2] == name:
+            return i
+    # END for each entry
+    return -1
+
+
 class TreeModifier(object):
 
     """A utility class providing methods to alter the underlying cache in a list-like fashion.
@@ -182,9 +366,23 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
         # tree id added once Tree is defined
     }
 
+    # parsed entries of the trees read from object databases, shared by all repositories
+    entries_cache = TreeEntriesCache()
+
     def __init__(self, repo, binsha, mode=tree_id << 12, path=None):
         super(Tree, self).__init__(repo, binsha, mode, path)
 
+    @classmethod
+    def _entries(cls, repo, binsha):
+        """:return: TreeEntries of the tree with the given binary sha in the repo,
+            preferably taken from the entries_cache"""
+        entries = cls.entries_cache.get(binsha)
+        if entries is None:
+            entries = TreeEntries.from_data(repo.odb.stream(binsha).read())
+            cls.entries_cache.set(binsha, entries)
+        # END parse tree data
+        return entries
+
     @classmethod
     def _get_intermediate_items(cls, index_object):
         if index_object.type == "tree":
@@ -194,8 +392,7 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
     def _set_cache_(self, attr):
         if attr == "_cache":
             # Set the data when we need it
-            ostream = self.repo.odb.stream(self.binsha)
-            self._cache = tree_entries_from_data(ostream.read())
+            self._cache = self._entries(self.repo, self.binsha)
         else:
             super(Tree, self)._set_cache_(attr)
         # END handle attribute
@@ -203,12 +400,18 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
     def _iter_convert_to_object(self, iterable):
         """Iterable yields tuples of (binsha, mode, name), which will be converted
         to the respective object representation"""
+        # like join_path, names never start with a slash
+        prefix = self.path
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        # END prepare path prefix
+        repo = self.repo
+        map_id_to_type = self._map_id_to_type
         for binsha, mode, name in iterable:
-            path = join_path(self.path, name)
             try:
-                yield self._map_id_to_type[mode >> 12](self.repo, binsha, mode, path)
+                yield map_id_to_type[mode >> 12](repo, binsha, mode, prefix + name)
             except KeyError:
-                raise TypeError("Unknown mode %o found in tree data for path '%s'" % (mode, path))
+                raise TypeError("Unknown mode %o found in tree data for path '%s'" % (mode, prefix + name))
         # END for each item
 
     def join(self, file):
@@ -217,32 +420,20 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
 
         :raise KeyError: if given file or tree does not exist in tree"""
         msg = "Blob or Tree named %r not found"
-        if '/' in file:
-            tree = self
-            item = self
-            tokens = file.split('/')
-            for i, token in enumerate(tokens):
-                item = tree[token]
-                if item.type == 'tree':
-                    tree = item
-                else:
-                    # safety assertion - blobs are at the end of the path
-                    if i != len(tokens) - 1:
-                        raise KeyError(msg % file)
-                    return item
-                # END handle item type
-            # END for each token of split path
-            if item == self:
+        tokens = file.split('/')
+        entries = self._cache
+        # walk the entries of the sub-trees without creating objects for them
+        for token in tokens[:-1]:
+            index = _find_entry(entries, token)
+            if index < 0 or entries[index][1] >> 12 != self.tree_id:
                 raise KeyError(msg % file)
-            return item
-        else:
-            for info in self._cache:
-                if info[2] == file:     # [2] == name
-                    return self._map_id_to_type[info[1] >> 12](self.repo, info[0], info[1],
-                                                               join_path(self.path, info[2]))
-            # END for each obj
+            entries = self._entries(self.repo, entries[index][0])
+        # END for each directory
+        index = _find_entry(entries, tokens[-1])
+        if index < 0:
             raise KeyError(msg % file)
-        # END handle long paths
+        binsha, mode, _name = entries[index]
+        return self._map_id_to_type[mode >> 12](self.repo, binsha, mode, join_path(self.path, file))
 
     def __div__(self, file):
         """For PY2 only"""
@@ -269,6 +460,9 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
             to change the tree's contents. When done, make sure you call ``set_done``
             on the tree modifier, or serialization behaviour will be incorrect.
             See the ``TreeModifier`` for more information on how to alter the cache"""
+        if not isinstance(self._cache, list):
+            # parsed entries may be shared with other trees
+            self._cache = list(self._cache)
         return TreeModifier(self._cache)
 
     def traverse(self, predicate=lambda i, d: True,
@@ -301,22 +495,27 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
         raise TypeError("Invalid index type: %r" % item)
 
     def __contains__(self, item):
+        entries = self._cache
         if isinstance(item, IndexObject):
-            for info in self._cache:
+            if isinstance(entries, TreeEntries):
+                return entries.find_binsha(item.binsha) > -1
+            for info in entries:
                 if item.binsha == info[0]:
                     return True
                 # END compare sha
             # END for each entry
+            return False
         # END handle item is index object
         # compatibility
 
         # treat item as repo-relative path
-        path = self.path
-        for info in self._cache:
-            if item == join_path(path, info[2]):
-                return True
-        # END for each item
-        return False
+        if not isinstance(item, string_types):
+            return False
+        prefix = self.path
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        # END prepare path prefix
+        return item.startswith(prefix) and _find_entry(entries, item[len(prefix):]) > -1
 
     def __reversed__(self):
         return reversed(self._iter_convert_to_object(self._cache))
@@ -330,7 +529,7 @@ class Tree(IndexObject, diff.Diffable, util.Traversable, util.Serializable):
         return self
 
     def _deserialize(self, stream):
-        self._cache = tree_entries_from_data(stream.read())
+        self._cache = TreeEntries.from_data(stream.read())
         return self
 
 
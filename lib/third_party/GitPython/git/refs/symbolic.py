@@ -1,4 +1,6 @@
 import os
+from bisect import bisect_left
+import threading
 
 from git.compat import (
     string_types,
@@ -34,6 +36,114 @@ def _git_dir(repo, path):
     return repo.common_dir
 
 
+class PackedRefs(object):
+
+    """The parsed contents of a packed-refs file.
+
+    The file is parsed once into a path-sorted list of refs and a dict mapping
+    paths to their shas. Each query stats the file and only parses it again
+    if its mtime, size or inode changed, which git's lockfile-and-rename updates
+    always do."""
+    __slots__ = ('path', '_state', '_lock')
+
+    def __init__(self, path):
+        self.path = path
+        # tuple(stat key, sorted paths, shas in the same order, path -> sha)
+        self._state = (None, [], [], {})
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<git.%s "%s">' % (self.__class__.__name__, self.path)
+
+    @staticmethod
+    def _parse(fp):
+        """:return: list of (sha, path) tuples of all refs in the given packed-refs file"""
+        refs = []
+        for line in fp:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                # "# pack-refs with: peeled fully-peeled sorted"
+                # the git source code shows "peeled",
+                # "fully-peeled" and "sorted" as the keywords
+                # that can go on this line, as per comments in git file
+                # refs/packed-backend.c
+                # I looked at master on 2017-10-11,
+                # commit 111ef79afe, after tag v2.15.0-rc1
+                # from repo https://github.com/git/git.git
+                if line.startswith('# pack-refs with:') and 'peeled' not in line:
+                    raise TypeError("PackingType of packed-Refs not understood: %r" % line)
+                # END abort if we do not understand the packing scheme
+                continue
+            # END parse comment
+
+            # skip dereferenced tag object entries - previous line was actual
+            # tag reference for it
+            if line[0] == '^':
+                continue
+
+            refs.append(tuple(line.split(' ', 1)))
+        # END for each line
+        return refs
+
+    def _update(self):
+        """:return: our current state, parsing the file again if it changed"""
+        try:
+            st = os.stat(self.path)
+            key = (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+        except (OSError, IOError):
+            key = None
+        # END handle missing file
+
+        state = self._state
+        if key == state[0]:
+            return state
+
+        with self._lock:
+            state = self._state
+            if key == state[0]:
+                return state
+            # END another thread was faster
+
+            refs = []
+            if key is not None:
+                try:
+                    with open(self.path, 'rt') as fp:
+                        refs = self._parse(fp)
+                except (OSError, IOError):
+                    key = None
+                # END handle file removed in the meanwhile
+            # END read existing file
+
+            refs.sort(key=lambda ref: ref[1])
+            state = (key, [ref[1] for ref in refs], [ref[0] for ref in refs], dict((p, s) for s, p in refs))
+            self._state = state
+        # END with lock
+        return state
+
+    def invalidate(self):
+        """Force the file to be parsed again on the next query"""
+        self._state = (None, [], [], {})
+
+    def sha(self, path):
+        """:return: hexsha of the packed ref at the given path, or None if there is no such ref"""
+        return self._update()[3].get(path)
+
+    def iter_items(self, common_path=''):
+        """:return: iterator yielding (sha, path) tuples of all packed refs whose path
+            starts with common_path, sorted by path"""
+        _key, paths, shas, _refs = self._update()
+        index = bisect_left(paths, common_path)
+        while index < len(paths) and paths[index].startswith(common_path):
+            yield shas[index], paths[index]
+            index += 1
+        # END for each matching path
+
+    def __len__(self):
+        return len(self._update()[1])
+
+
 class SymbolicReference(object):
 
     """Represents a special case of a reference such that this reference is symbolic.
@@ -85,45 +195,20 @@ class SymbolicReference(object):
     def _get_packed_refs_path(cls, repo):
         return osp.join(repo.common_dir, 'packed-refs')
 
+    @classmethod
+    def _packed_refs(cls, repo):
+        """:return: the PackedRefs of the given repo, shared by all reference types"""
+        packed_refs = repo._packed_refs
+        if packed_refs is None or packed_refs.path != cls._get_packed_refs_path(repo):
+            packed_refs = repo._packed_refs = PackedRefs(cls._get_packed_refs_path(repo))
+        # END create cache
+        return packed_refs
+
     @classmethod
     def _iter_packed_refs(cls, repo):
         """Returns an iterator yielding pairs of sha1/path pairs (as bytes) for the corresponding refs.
-        :note: The packed refs file will be kept open as long as we iterate"""
-        try:
-            with open(cls._get_packed_refs_path(repo), 'rt') as fp:
-                for line in fp:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if line.startswith('#'):
-                        # "# pack-refs with: peeled fully-peeled sorted"
-                        # the git source code shows "peeled",
-                        # "fully-peeled" and "sorted" as the keywords
-                        # that can go on this line, as per comments in git file
-                        # refs/packed-backend.c
-                        # I looked at master on 2017-10-11,
-                        # commit 111ef79afe, after tag v2.15.0-rc1
-                        # from repo https://github.com/git/git.git
-                        if line.startswith('# pack-refs with:') and 'peeled' not in line:
-                            raise TypeError("PackingType of packed-Refs not understood: %r" % line)
-                        # END abort if we do not understand the packing scheme
-                        continue
-                    # END parse comment
-
-                    # skip dereferenced tag object entries - previous line was actual
-                    # tag reference for it
-                    if line[0] == '^':
-                        continue
-
-                    yield tuple(line.split(' ', 1))
-                # END for each line
-        except (OSError, IOError):
-            return
-        # END no packed-refs file handling
-        # NOTE: Had try-finally block around here to close the fp,
-        # but some python version wouldn't allow yields within that.
-        # I believe files are closing themselves on destruction, so it is
-        # alright.
+        :note: The packed-refs file is parsed only if it changed since it was last read"""
+        return cls._packed_refs(repo).iter_items()
 
     @classmethod
     def dereference_recursive(cls, repo, ref_path):
@@ -155,13 +240,10 @@ class SymbolicReference(object):
             # Probably we are just packed, find our entry in the packed refs file
             # NOTE: We are not a symbolic ref if we are in a packed file, as these
             # are excluded explicitly
-            for sha, path in cls._iter_packed_refs(repo):
-                if path != ref_path:
-                    continue
-                # sha will be used
-                tokens = sha, path
-                break
-            # END for each packed ref
+            sha = cls._packed_refs(repo).sha(ref_path)
+            if sha is not None:
+                tokens = sha, ref_path
+            # END handle packed ref
         # END handle packed refs
         if tokens is None:
             raise ValueError("Reference at %r does not exist" % ref_path)
@@ -470,6 +552,7 @@ class SymbolicReference(object):
                     # open the file in text mode and change LF to CRLF !
                     with open(pack_file_path, 'wb') as fd:
                         fd.writelines(l.encode(defenc) for l in new_lines)
+                    cls._packed_refs(repo).invalidate()
 
             except (OSError, IOError):
                 pass  # it didn't exist at all
@@ -614,10 +697,8 @@ class SymbolicReference(object):
         # END for each directory to walk
 
         # read packed refs
-        for sha, rela_path in cls._iter_packed_refs(repo):  # @UnusedVariable
-            if rela_path.startswith(common_path):
-                rela_paths.add(rela_path)
-            # END relative path matches common path
+        for sha, rela_path in cls._packed_refs(repo).iter_items(common_path):  # @UnusedVariable
+            rela_paths.add(rela_path)
         # END packed refs reading
 
         # return paths in sorted order
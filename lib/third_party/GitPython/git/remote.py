@@ -669,6 +669,7 @@ class Remote(LazyMixin, Iterable):
 
         progress_handler = progress.new_message_handler()
         handle_process_output(proc, None, progress_handler, finalizer=None, decode_streams=False)
+        progress.flush()
 
         stderr_text = progress.error_lines and '\n'.join(progress.error_lines) or ''
         proc.wait(stderr=stderr_text)
@@ -725,6 +726,7 @@ class Remote(LazyMixin, Iterable):
                 pass
 
         handle_process_output(proc, stdout_handler, progress_handler, finalizer=None, decode_streams=False)
+        progress.flush()
         stderr_text = progress.error_lines and '\n'.join(progress.error_lines) or ''
         try:
             proc.wait(stderr=stderr_text)
@@ -826,7 +828,8 @@ class Remote(LazyMixin, Iterable):
              `Click here <http://goo.gl/NPa7st>`_ for a description of all arguments
               given to the function.
             * An instance of a class derived from ``git.RemoteProgress`` that
-              overrides the ``update()`` function.
+              overrides the ``update()`` function. Its ``update_interval`` limits the rate of
+              updates, like ``CallableRemoteProgress(function, update_interval=1 / 60.0)`` does.
 
         :note: No further progress information is returned after push returns.
         :param kwargs: Additional arguments to be passed to git-push
@@ -33,8 +33,10 @@ from git.util import Actor, finalize_process, decygpath, hex_to_bin, expand_path
 import os.path as osp
 
 from .fun import rev_parse, is_git_dir, find_submodule_git_dir, touch, find_worktree_git_dir
+from .graph import CommitGraph
 import gc
 import gitdb
+from gitdb.exc import BadName, BadObject
 
 try:
     import pathlib
@@ -71,6 +73,10 @@ class Repo(object):
     _working_tree_dir = None
     git_dir = None
     _common_dir = None
+    # parsed packed-refs file, shared by all references of this repository
+    _packed_refs = None
+    # parent and generation index of all commits we were asked about
+    _commit_graph = None
 
     # precompiled regex
     re_whitespace = re.compile(r'\s+')
@@ -223,6 +229,8 @@ class Repo(object):
             pass
 
     def close(self):
+        if self._commit_graph is not None:
+            self._commit_graph.close()
         if self.git:
             self.git.clear_cache()
             # Tempfiles objects on Windows are holding references to
@@ -237,6 +245,13 @@ class Repo(object):
             if is_win:
                 gc.collect()
 
+    def __getstate__(self):
+        # caches are rebuilt on demand, and hold locks and memory maps
+        state = self.__dict__.copy()
+        state.pop('_packed_refs', None)
+        state.pop('_commit_graph', None)
+        return state
+
     def __eq__(self, rhs):
         if isinstance(rhs, Repo):
             return self.git_dir == rhs.git_dir
@@ -282,6 +297,13 @@ class Repo(object):
         """:return: True if the repository is bare"""
         return self._bare
 
+    @property
+    def async_git(self):
+        """:return: :class:`git.async_cmd.AsyncGit` running commands like ``self.git`` does, as asyncio
+            subprocesses. Requires python 3.5 or newer"""
+        from git.async_cmd import AsyncGit
+        return AsyncGit(git=self.git)
+
     @property
     def heads(self):
         """A list of ``Head`` objects representing the branch heads in
@@ -516,7 +538,8 @@ class Repo(object):
 
         :param kwargs:
             Arguments to be passed to git-rev-list - common ones are
-            max_count and skip
+            max_count and skip. Pass bulk=True to fetch the commits' data in
+            batches, see Commit.iter_items
 
         :note: to receive only commits between two named revisions, use the
             "revA...revB" revision specifier
@@ -527,11 +550,35 @@ class Repo(object):
 
         return Commit.iter_items(self, rev, paths, **kwargs)
 
+    @property
+    def commit_graph(self):
+        """:return: CommitGraph answering ancestry queries of this repository in-process, based
+            on git's commit-graph file if there is one"""
+        if self._commit_graph is None:
+            self._commit_graph = CommitGraph(self)
+        return self._commit_graph
+
+    def _commit_binshas(self, revs):
+        """:return: list of binary shas of the commits the given revs point to, or None if any
+            of them can't be resolved in-process, leaving it to git to report the error"""
+        shas = []
+        for rev in revs:
+            # rev_parse would resolve an empty rev to HEAD, git rejects it
+            if not rev:
+                return None
+            try:
+                shas.append(self.commit(rev).binsha)
+            except (BadName, BadObject, ValueError, KeyError, IndexError):
+                return None
+        # end for each rev
+        return shas
+
     def merge_base(self, *rev, **kwargs):
         """Find the closest common ancestor for the given revision (e.g. Commits, Tags, References, etc)
 
         :param rev: At least two revs to find the common ancestor for.
         :param kwargs: Additional arguments to be passed to the repo.git.merge_base() command which does all the work.
+            Without any, or with only all=True, the merge bases are computed in-process using the commit_graph.
         :return: A list of Commit objects. If --all was not specified as kwarg, the list will have at max one Commit,
             or is empty if no common merge base exists.
         :raises ValueError: If not at least two revs are provided
@@ -540,6 +587,14 @@ class Repo(object):
             raise ValueError("Please specify at least two revs, got only %i" % len(rev))
         # end handle input
 
+        if not set(kwargs) - set(('all',)):
+            shas = self._commit_binshas(rev)
+            if shas:
+                shas = self.commit_graph.merge_bases(shas[0], shas[1:], all=kwargs.get('all', False))
+                return [Commit(self, sha) for sha in shas]
+            # end handle in-process lookup
+        # end handle supported arguments
+
         res = []
         try:
             lines = self.git.merge_base(*rev, **kwargs).splitlines()
@@ -565,6 +620,11 @@ class Repo(object):
         :param rev: Rev to test against ancestor_rev
         :return: ``True``, ancestor_rev is an ancestor to rev.
         """
+        shas = self._commit_binshas((ancestor_rev, rev))
+        if shas:
+            return self.commit_graph.is_ancestor(*shas)
+        # end handle in-process lookup
+
         try:
             self.git.merge_base(ancestor_rev, rev, is_ancestor=True)
         except GitCommandError as err:
@@ -573,6 +633,22 @@ class Repo(object):
             raise
         return True
 
+    def ahead_behind(self, rev, other):
+        """Count the commits two revisions do not have in common, e.g. to show how far a branch
+        diverged from its upstream
+
+        :param rev: Rev, usually a branch
+        :param other: Rev to compare rev against, usually the upstream of the branch
+        :return: tuple(ahead, behind) with the amount of commits reachable from rev but not from
+            other, and the amount of commits reachable from other but not from rev"""
+        shas = self._commit_binshas((rev, other))
+        if shas:
+            return self.commit_graph.ahead_behind(*shas)
+        # end handle in-process lookup
+
+        ahead, behind = self.git.rev_list('%s...%s' % (rev, other), left_right=True, count=True).split()
+        return int(ahead), int(behind)
+
     def _get_daemon_export(self):
         filename = osp.join(self.git_dir, self.DAEMON_EXPORT_FILE)
         return osp.exists(filename)
@@ -650,8 +726,12 @@ class Repo(object):
                 return True
         # END index handling
         if working_tree:
-            # diff index against working tree
-            if len(self.git.diff(*default_args)):
+            # diff index against working tree, using the index's stat data if possible
+            changes = self.index._diff_working_tree(path and [path], ignore_submodules=not submodules,
+                                                    first_only=True)
+            if changes is None:
+                changes = self.git.diff(*default_args)
+            if len(changes):
                 return True
         # END working tree handling
         if untracked_files:
@@ -960,6 +1040,7 @@ class Repo(object):
                          v=True, universal_newlines=True, **add_progress(kwargs, git, progress))
         if progress:
             handle_process_output(proc, None, progress.new_message_handler(), finalize_process, decode_streams=False)
+            progress.flush()
         else:
             (stdout, stderr) = proc.communicate()
             log.debug("Cmd(%s)'s unused stdout: %s", getattr(proc, 'args', ''), stdout)
@@ -0,0 +1,571 @@
+"""Commit ancestry index, answering merge-base, ancestry and counting queries in-process"""
+from array import array
+from bisect import bisect_right
+from heapq import heappush, heappop
+import os
+import struct
+import threading
+
+from git.compat import xrange
+from git.refs import SymbolicReference
+from git.util import hex_to_bin, bin_to_hex
+from gitdb.typ import str_commit_type
+from gitdb.util import file_contents_ro_filepath
+
+import os.path as osp
+
+
+__all__ = ('CommitGraphFile', 'CommitGraph')
+
+# flags used while walking the graph
+_PARENT1 = 1
+_PARENT2 = 2
+_STALE = 4
+_RESULT = 8
+
+_GRAPH_PARENT_NONE = 0x70000000
+_GRAPH_EXTRA_EDGES = 0x80000000
+_GRAPH_LAST_EDGE = 0x80000000
+
+
+class CommitGraphFile(object):
+
+    """A single commit-graph file as written by ``git commit-graph write``, mapped into memory.
+
+    Positions are global across a chain of graph files, this file's commits start at ``base``.
+    Only the chunks needed for ancestry queries are read, i.e. the fanout, the object ids,
+    the commit data and the extra edges of octopus merges."""
+    __slots__ = ('path', 'base', 'count', '_m', '_fanout', '_oids', '_cdat', '_edge')
+
+    def __init__(self, path, base=0):
+        self.path = path
+        self.base = base
+        self._m = m = file_contents_ro_filepath(path)
+        if len(m) < 8 or m[:4] != b'CGPH':
+            raise ValueError("%s is not a commit-graph file" % path)
+        version, hash_version, nchunks = struct.unpack_from('>BBB', m, 4)
+        if version != 1 or hash_version != 1:
+            raise ValueError("Unsupported commit-graph version %i with hash version %i in %s"
+                             % (version, hash_version, path))
+        # END check version
+
+        chunks = dict()
+        for i in xrange(nchunks):
+            cid, offset = struct.unpack_from('>4sQ', m, 8 + i * 12)
+            chunks[cid] = offset
+        # END for each chunk
+        try:
+            self._fanout = struct.unpack_from('>256L', m, chunks[b'OIDF'])
+            self._oids = chunks[b'OIDL']
+            self._cdat = chunks[b'CDAT']
+        except KeyError:
+            raise ValueError("Required chunks are missing in commit-graph file %s" % path)
+        # END handle missing chunks
+        self._edge = chunks.get(b'EDGE')
+        self.count = self._fanout[255]
+
+    def __repr__(self):
+        return '<git.%s "%s">' % (self.__class__.__name__, self.path)
+
+    def close(self):
+        self._m.close()
+
+    def find(self, binsha):
+        """:return: local position of the given commit, or -1 if it is not contained"""
+        m = self._m
+        first = ord(binsha[:1])
+        lo = first and self._fanout[first - 1] or 0
+        hi = self._fanout[first]
+        base = self._oids
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ofs = base + mid * 20
+            sha = m[ofs:ofs + 20]
+            if sha < binsha:
+                lo = mid + 1
+            elif sha > binsha:
+                hi = mid
+            else:
+                return mid
+        # END binary search
+        return -1
+
+    def binsha(self, pos):
+        """:return: binary sha of the commit at the given local position"""
+        ofs = self._oids + pos * 20
+        return self._m[ofs:ofs + 20]
+
+    def parents(self, pos):
+        """:return: list of global positions of the parents of the commit at the given local position"""
+        p1, p2 = struct.unpack_from('>LL', self._m, self._cdat + pos * 36 + 20)
+        if p1 == _GRAPH_PARENT_NONE:
+            return []
+        if p2 == _GRAPH_PARENT_NONE:
+            return [p1]
+        if not p2 & _GRAPH_EXTRA_EDGES:
+            return [p1, p2]
+
+        # octopus merge, the remaining parents are listed in the extra edges chunk
+        parents = [p1]
+        ofs = self._edge + (p2 & ~_GRAPH_EXTRA_EDGES) * 4
+        while True:
+            edge, = struct.unpack_from('>L', self._m, ofs)
+            parents.append(edge & ~_GRAPH_LAST_EDGE)
+            if edge & _GRAPH_LAST_EDGE:
+                break
+            ofs += 4
+        # END for each extra edge
+        return parents
+
+    def generation(self, pos):
+        """:return: tuple(generation, commit time) of the commit at the given local position.
+            The generation is 0 if the file was written without generation numbers"""
+        high, low = struct.unpack_from('>LL', self._m, self._cdat + pos * 36 + 28)
+        return high >> 2, ((high & 3) << 32) | low
+
+
+class CommitGraph(object):
+
+    """Parent and generation index of all commits of a repository we have been asked about.
+
+    Commits are addressed by integer positions. If git wrote a commit-graph file, its commits
+    occupy the first positions and are read straight from the memory map. All other commits,
+    i.e. those created after the file was written or all of them if there is no such file,
+    are loaded on first use and appended to a compact in-memory index of parent positions,
+    generation numbers and commit times. Commits are never inflated into Commit objects.
+
+    The generation of a commit is always greater than the one of each of its parents, which
+    allows walks to be pruned and to visit all children of a commit before the commit itself."""
+
+    # amount of known branch tips we exclude from rev-list when extending our index
+    max_excluded_tips = 256
+
+    def __init__(self, repo):
+        # keep what we need only, the repository owns us
+        self.common_dir = repo.common_dir
+        self.odb = repo.odb
+        self.git = repo.git
+        self._packed_refs = SymbolicReference._packed_refs(repo)
+        self._lock = threading.RLock()
+        self._key = False
+        self._layers = list()
+        self._reset()
+
+    def __repr__(self):
+        return '<git.%s "%s">' % (self.__class__.__name__, self.common_dir)
+
+    def __len__(self):
+        with self._lock:
+            self._update()
+            return self._nfile + len(self._ext_shas)
+
+    #{ Index Maintenance
+
+    def _reset(self):
+        # commits in graph files
+        self._nfile = sum(layer.count for layer in self._layers)
+        self._bases = [layer.base for layer in self._layers]
+        self._file_levels = None
+        # commits indexed by ourselves
+        self._ext_index = dict()
+        self._ext_shas = list()
+        self._ext_parents = list()
+        self._ext_gens = array('L')
+        self._ext_times = array('d')
+        self._ext_heads = set()
+
+    def _graph_paths(self):
+        """:return: list of commit-graph files git would use, base first, or an empty list"""
+        info = osp.join(self.common_dir, 'objects', 'info')
+        path = osp.join(info, 'commit-graph')
+        if osp.isfile(path):
+            return [path]
+        chain = osp.join(info, 'commit-graphs')
+        try:
+            with open(osp.join(chain, 'commit-graph-chain'), 'rt') as fp:
+                return [osp.join(chain, 'graph-%s.graph' % line.strip()) for line in fp if line.strip()]
+        except (OSError, IOError):
+            return []
+        # END handle chain
+
+    def _rewrites_history(self):
+        """:return: True if grafts, replace refs or a shallow clone alter the parents git sees,
+            in which case git ignores commit-graph files as well"""
+        common_dir = self.common_dir
+        if osp.isfile(osp.join(common_dir, 'shallow')) or osp.isfile(osp.join(common_dir, 'info', 'grafts')):
+            return True
+        replace = osp.join(common_dir, 'refs', 'replace')
+        if osp.isdir(replace) and os.listdir(replace):
+            return True
+        for _item in self._packed_refs.iter_items('refs/replace/'):
+            return True
+        return False
+
+    def _update(self):
+        """Reload the graph files if git rewrote them since we last looked"""
+        paths = self._graph_paths()
+        key = list()
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                key = None
+                break
+            key.append((path, getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino))
+        # END for each path
+        if key == self._key:
+            return
+
+        self.close()
+        self._key = key
+        if key and not self._rewrites_history():
+            try:
+                base = 0
+                for path in paths:
+                    self._layers.append(CommitGraphFile(path, base))
+                    base += self._layers[-1].count
+                # END for each layer
+            except (OSError, IOError, ValueError, struct.error):
+                self.close()
+            # END ignore unusable files
+        # END load layers
+        self._reset()
+
+    def close(self):
+        """Release all memory maps of commit-graph files"""
+        with self._lock:
+            for layer in self._layers:
+                layer.close()
+            # END for each layer
+            self._layers = list()
+            self._key = False
+
+    def _layer(self, pos):
+        if len(self._layers) == 1:
+            return self._layers[0]
+        return self._layers[bisect_right(self._bases, pos) - 1]
+
+    def _find(self, binsha):
+        """:return: position of binsha, or -1 if it is not yet known"""
+        for layer in self._layers:
+            pos = layer.find(binsha)
+            if pos > -1:
+                return layer.base + pos
+        # END for each layer
+        return self._ext_index.get(binsha, -1)
+
+    def _add(self, binsha, parents, time):
+        """Append a commit whose parents are already known and return its position"""
+        pos = self._nfile + len(self._ext_shas)
+        gen = 0
+        for ppos in parents:
+            gen = max(gen, self.generation(ppos))
+            self._ext_heads.discard(ppos)
+        # END for each parent
+        self._ext_index[binsha] = pos
+        self._ext_shas.append(binsha)
+        self._ext_parents.append(tuple(parents))
+        self._ext_gens.append(gen + 1)
+        self._ext_times.append(time)
+        self._ext_heads.add(pos)
+        return pos
+
+    def _load_rev_list(self, binsha):
+        """Index binsha and all its ancestors we don't know yet using a single rev-list call"""
+        heads = self._ext_heads
+        exclude = list()
+        if len(heads) <= self.max_excluded_tips:
+            exclude = ['^' + bin_to_hex(self._ext_shas[pos - self._nfile]).decode('ascii') for pos in heads]
+        # END exclude known history
+        out = self.git.rev_list(bin_to_hex(binsha).decode('ascii'), '--parents', '--timestamp',
+                                '--topo-order', '--reverse', *exclude)
+        for line in out.splitlines():
+            tokens = line.split()
+            sha = hex_to_bin(tokens[1])
+            if sha in self._ext_index:
+                continue
+            self._add(sha, [self._ext_index[hex_to_bin(p)] for p in tokens[2:]], float(tokens[0]))
+        # END for each commit, parents first
+
+    def _load_headers(self, binsha):
+        """Index binsha and all its ancestors we don't know yet by reading their headers,
+        which is efficient if most of the history is contained in a commit-graph file"""
+        odb = self.odb
+        headers = dict()
+        pending = [binsha]
+        while pending:
+            if hasattr(odb, 'stream_batch'):
+                streams = odb.stream_batch(pending)
+            else:
+                streams = [odb.stream(sha) for sha in pending]
+            # END get streams
+            pending = list()
+            for ostream in streams:
+                if ostream.type != str_commit_type:
+                    raise ValueError("Object %s is a %s, not a commit" % (bin_to_hex(ostream.binsha), ostream.type))
+                parents, time = _parse_header(ostream.read())
+                headers[ostream.binsha] = (parents, time)
+                for sha in parents:
+                    if sha not in headers and sha not in pending and self._find(sha) < 0:
+                        pending.append(sha)
+                # END for each parent
+            # END for each stream
+        # END while there are unknown commits
+
+        # add parents before their children
+        stack = [binsha]
+        while stack:
+            sha = stack[-1]
+            if sha in self._ext_index:
+                stack.pop()
+                continue
+            parents, time = headers[sha]
+            missing = [p for p in parents if self._find(p) < 0]
+            if missing:
+                stack.extend(missing)
+                continue
+            self._add(sha, [self._find(p) for p in parents], time)
+            stack.pop()
+        # END for each commit to add
+
+    def _compute_file_levels(self):
+        """Compute topological levels for graph files written without generation numbers"""
+        levels = array('L', [0]) * self._nfile
+        for start in xrange(self._nfile):
+            stack = [start]
+            while stack:
+                pos = stack[-1]
+                if levels[pos]:
+                    stack.pop()
+                    continue
+                parents = self.parents(pos)
+                missing = [p for p in parents if not levels[p]]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                levels[pos] = max([levels[p] for p in parents] or [0]) + 1
+                stack.pop()
+            # END depth first
+        # END for each commit
+        self._file_levels = levels
+
+    #} END index maintenance
+
+    #{ Commit Access
+
+    def _position(self, binsha):
+        pos = self._find(binsha)
+        if pos < 0:
+            if self._layers:
+                self._load_headers(binsha)
+            else:
+                self._load_rev_list(binsha)
+            # END choose loader
+            pos = self._find(binsha)
+        # END load unknown commit
+        return pos
+
+    def position(self, binsha):
+        """:return: position of the commit with the given binary sha, indexing it and all its
+            ancestors if it is yet unknown
+        :raise ValueError: if binsha does not point to a commit
+        :raise GitCommandError: if git does not know the commit"""
+        with self._lock:
+            self._update()
+            return self._position(binsha)
+
+    def binsha(self, pos):
+        """:return: binary sha of the commit at the given position"""
+        if pos < self._nfile:
+            layer = self._layer(pos)
+            return layer.binsha(pos - layer.base)
+        return self._ext_shas[pos - self._nfile]
+
+    def parents(self, pos):
+        """:return: sequence of positions of the parents of the commit at pos"""
+        if pos < self._nfile:
+            layer = self._layer(pos)
+            return layer.parents(pos - layer.base)
+        return self._ext_parents[pos - self._nfile]
+
+    def generation(self, pos):
+        """:return: generation number of the commit at pos, being 1 for root commits and
+            larger than the generation of each parent otherwise"""
+        if pos < self._nfile:
+            layer = self._layer(pos)
+            gen = layer.generation(pos - layer.base)[0]
+            if not gen:
+                if self._file_levels is None:
+                    self._compute_file_levels()
+                return self._file_levels[pos]
+            return gen
+        return self._ext_gens[pos - self._nfile]
+
+    def time(self, pos):
+        """:return: committer time of the commit at pos in seconds since epoch"""
+        if pos < self._nfile:
+            layer = self._layer(pos)
+            return layer.generation(pos - layer.base)[1]
+        return int(self._ext_times[pos - self._nfile])
+
+    #} END commit access
+
+    #{ Queries
+    # All queries take and return binary shas
+
+    def _is_ancestor(self, apos, pos):
+        agen = self.generation(apos)
+        seen = set((pos,))
+        stack = [pos]
+        while stack:
+            pos = stack.pop()
+            if pos == apos:
+                return True
+            for ppos in self.parents(pos):
+                # commits of the same or a lower generation cannot reach the ancestor
+                if ppos not in seen and (ppos == apos or self.generation(ppos) > agen):
+                    seen.add(ppos)
+                    stack.append(ppos)
+            # END for each parent
+        # END while there are commits to walk
+        return False
+
+    def is_ancestor(self, ancestor, rev):
+        """:return: True if ancestor is reachable from rev, or equal to it"""
+        with self._lock:
+            self._update()
+            return self._is_ancestor(self._position(ancestor), self._position(rev))
+
+    def _paint_down_to_common(self, one, others):
+        """:return: list of positions of common ancestors of one and any of the others,
+            containing at least all best common ancestors"""
+        flags = dict()
+        heap = list()
+        flags[one] = _PARENT1
+        heappush(heap, (-self.generation(one), one))
+        for pos in others:
+            flags[pos] = flags.get(pos, 0) | _PARENT2
+            heappush(heap, (-self.generation(pos), pos))
+        # END for each other commit
+
+        result = list()
+        while heap:
+            _gen, pos = heappop(heap)
+            pflags = flags[pos] & (_PARENT1 | _PARENT2 | _STALE)
+            if pflags == _PARENT1 | _PARENT2:
+                if not flags[pos] & _RESULT:
+                    flags[pos] |= _RESULT
+                    result.append(pos)
+                # END add new result
+                pflags |= _STALE
+            elif pflags & _STALE and not any(not flags[p] & _STALE for _g, p in heap):
+                # only stale commits are left, which can't yield any other merge base
+                break
+            # END handle commit
+            for ppos in self.parents(pos):
+                if flags.get(ppos, 0) & pflags == pflags:
+                    continue
+                flags[ppos] = flags.get(ppos, 0) | pflags
+                heappush(heap, (-self.generation(ppos), ppos))
+            # END for each parent
+        # END while there are commits to walk
+        # merge bases reachable from another merge base were marked stale afterwards
+        return [pos for pos in result if not flags[pos] & _STALE]
+
+    def merge_bases(self, one, others, all=False):
+        """:return: list of binary shas of the best common ancestors of one and any of the
+            others, most recent first, as ``git merge-base`` would print them
+        :param all: if False, return only the first merge base
+        :note: if several best common ancestors share the same commit time, git's choice among
+            them depends on its traversal order, which we don't replicate"""
+        with self._lock:
+            self._update()
+            one = self._position(one)
+            others = [self._position(sha) for sha in others]
+            candidates = self._paint_down_to_common(one, others)
+
+            # a candidate reachable from another one is no best common ancestor
+            if len(candidates) > 1:
+                candidates = [pos for pos in candidates
+                              if not any(opos != pos and self._is_ancestor(pos, opos) for opos in candidates)]
+            # END remove redundant
+            candidates.sort(key=self.time, reverse=True)
+            if not all:
+                candidates = candidates[:1]
+            return [self.binsha(pos) for pos in candidates]
+
+    def count(self, rev):
+        """:return: amount of commits reachable from rev, including rev itself"""
+        with self._lock:
+            self._update()
+            pos = self._position(rev)
+            seen = bytearray(self._nfile + len(self._ext_shas))
+            seen[pos] = 1
+            stack = [pos]
+            count = 0
+            while stack:
+                pos = stack.pop()
+                count += 1
+                for ppos in self.parents(pos):
+                    if not seen[ppos]:
+                        seen[ppos] = 1
+                        stack.append(ppos)
+                # END for each parent
+            # END while there are commits to walk
+            return count
+
+    def ahead_behind(self, rev, other):
+        """:return: tuple(ahead, behind) of the amount of commits reachable from rev but not
+            from other, and the amount of commits reachable from other but not from rev"""
+        with self._lock:
+            self._update()
+            pos = self._position(rev)
+            opos = self._position(other)
+            both = _PARENT1 | _PARENT2
+            flags = dict()
+            flags[pos] = _PARENT1
+            flags[opos] = flags.get(opos, 0) | _PARENT2
+            heap = list()
+            for start in set((pos, opos)):
+                heappush(heap, (-self.generation(start), start))
+            # END for each start
+
+            counts = [0, 0, 0, 0]
+            while heap:
+                _gen, pos = heappop(heap)
+                pflags = flags[pos]
+                if pflags & _STALE:
+                    continue
+                # all children were visited before, hence the flags are final
+                flags[pos] |= _STALE
+                counts[pflags] += 1
+                if pflags == both and all(flags[p] & both == both for _g, p in heap):
+                    # all remaining commits are reachable from both sides
+                    break
+                # END stop at common history
+                for ppos in self.parents(pos):
+                    if flags.get(ppos, 0) | pflags != flags.get(ppos, 0):
+                        flags[ppos] = flags.get(ppos, 0) | pflags
+                        heappush(heap, (-self.generation(ppos), ppos))
+                    # END propagate flags
+                # END for each parent
+            # END while there are commits to walk
+            return counts[_PARENT1], counts[_PARENT2]
+
+    #} END queries
+
+
+def _parse_header(data):
+    """:return: tuple(list of parent binshas, committer time) parsed from raw commit data"""
+    parents = list()
+    time = 0
+    for line in data.split(b'\n'):
+        if not line:
+            break
+        if line.startswith(b'parent '):
+            parents.append(hex_to_bin(line[7:47]))
+        elif line.startswith(b'committer '):
+            time = int(line.rsplit(b' ', 2)[1])
+        # END handle line
+    # END for each header line
+    return parents, time
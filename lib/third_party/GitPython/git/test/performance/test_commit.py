@@ -67,6 +67,20 @@ class TestPerformance(TestBigRepoRW):
         print("Traversed %i Commits in %s [s] ( %f commits/s )"
               % (nc, elapsed_time, nc / elapsed_time), file=sys.stderr)
 
+    def test_commit_iteration_bulk(self):
+        # bound to the latency of cat-file requests
+        for bulk in (False, True):
+            nc = 0
+            st = time()
+            for c in Commit.iter_items(self.gitrorepo, self.gitrorepo.head, bulk=bulk):
+                nc += 1
+                self._query_commit_info(c)
+            # END for each commit
+            elapsed_time = time() - st
+            print("Iterated %i Commits %s in %s [s] ( %f commits/s )"
+                  % (nc, bulk and "in bulk" or "lazily", elapsed_time, nc / elapsed_time), file=sys.stderr)
+        # END for each mode
+
     def test_commit_iteration(self):
         # bound to stream parsing performance
         nc = 0
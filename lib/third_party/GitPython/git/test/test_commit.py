@@ -212,6 +212,20 @@ class TestCommit(TestBase):
         # pretty not allowed
         self.failUnlessRaises(ValueError, Commit.iter_items, self.rorepo, 'master', pretty="raw")
 
+    def test_iter_items_bulk(self):
+        def commit_data(c):
+            return (c.hexsha, c.tree, c.author, c.authored_date, c.author_tz_offset, c.committer,
+                    c.committed_date, c.committer_tz_offset, c.message, c.parents, c.encoding, c.size)
+
+        lazy = [commit_data(c) for c in Commit.iter_items(self.rorepo, '0.1.6')]
+        bulk = list(Commit.iter_items(self.rorepo, '0.1.6', bulk=True))
+        self.assertEqual(lazy, [commit_data(c) for c in bulk])
+
+        # aborting a batch keeps the persistent command usable
+        for c in self.rorepo.iter_commits('0.1.6', bulk=True):
+            break
+        assert self.rorepo.commit('0.1.6').message
+
     def test_rev_list_bisect_all(self):
         """
         'git rev-list --bisect-all' returns additional information
@@ -6,12 +6,14 @@
 
 import glob
 import io
+import os
+import time
 
 from git import (
     GitConfigParser
 )
 from git.compat import string_types
-from git.config import _OMD, cp
+from git.config import _OMD, cp, ConfigFileCache
 from git.test.lib import (
     TestCase,
     fixture_path,
@@ -239,6 +241,68 @@ class TestBase(TestCase):
         with GitConfigParser(fpa, read_only=True) as cr:
             check_test_value(cr, tv)
 
+    @with_rw_directory
+    def test_config_file_cache(self, rw_dir):
+        class CachingParser(GitConfigParser):
+            file_cache = ConfigFileCache()
+        cache = CachingParser.file_cache
+
+        def multi_values(path, parser_type=CachingParser):
+            cr = parser_type(path)
+            cr.read()
+            return cr.get_values('multi', 'v')
+        # end
+
+        def backdate(*paths):
+            then = time.time() - 3600
+            for path in paths:
+                os.utime(path, (then, then))
+        # end
+
+        fpa = osp.join(rw_dir, 'a')
+        fpb = osp.join(rw_dir, 'b')
+        with open(fpa, 'w') as fp:
+            fp.write("[include]\n\tpath = b\n[core]\n\tbare = false\n[multi]\n\tv = 1\n")
+        with open(fpb, 'w') as fp:
+            fp.write("[multi]\n\tv = 2\n\tv = 3\n[user]\n\tname = b\n")
+
+        # recently modified files are parsed each time
+        for _ in range(2):
+            assert multi_values(fpa) == [1, 2, 3]
+        assert len(cache) == 0
+
+        backdate(fpa, fpb)
+        cache.clear()
+        for _ in range(3):
+            self.assertEqual(multi_values([fpa]), multi_values(fpa, GitConfigParser))
+            cr = CachingParser(fpa)
+            self.assertEqual(cr.get_value('user', 'name'), 'b')
+            self.assertEqual(cr.items_all('multi'), [('v', ['1', '2', '3'])])
+        # end for each read
+        self.assertEqual((len(cache), cache.misses, cache.hits), (2, 2, 10))
+
+        # files are parsed again once they change
+        with open(fpb, 'w') as fp:
+            fp.write("[user]\n\tname = bb\n")
+        backdate(fpb)
+        self.assertEqual(CachingParser(fpa).get_value('user', 'name'), 'bb')
+        self.assertEqual(multi_values(fpa), [1])
+
+        # writers drop the entry of the file they write
+        with CachingParser(fpb, read_only=False) as cw:
+            cw.set_value('user', 'name', 'c')
+        backdate(fpb)
+        assert CachingParser(fpa).get_value('user', 'name') == 'c'
+
+        # files which fail to parse are not cached, and keep failing
+        with open(fpb, 'w') as fp:
+            fp.write("not a section\n")
+        backdate(fpb)
+        for _ in range(2):
+            self.assertRaises(cp.MissingSectionHeaderError, CachingParser(fpa).read)
+        # end
+        assert osp.abspath(fpb) not in cache._entries
+
     def test_rename(self):
         file_obj = self._to_memcache(fixture_path('git_config'))
         with GitConfigParser(file_obj, read_only=False, merge_includes=False) as cw:
@@ -23,6 +23,7 @@ from git.test.lib import (
 )
 from git.test.lib import with_rw_directory
 
+import os
 import os.path as osp
 
 
@@ -175,6 +176,90 @@ class TestDiff(TestBase):
         dr = res[3]
         assert dr.diff.endswith(b"+Binary files a/rps and b/rps differ\n")
 
+    def test_diff_patch_streaming(self):
+        data = fixture('diff_index_patch')
+        res = Diff._index_from_patch_format(None, StringProcessAdapter(data))
+
+        # reading lines in parts yields the same diffs
+        for chunk_size in (16, 100, 64 * 1024):
+            diffs = Diff._iter_from_patch_format(None, StringProcessAdapter(data), chunk_size=chunk_size)
+            self.assertEqual(list(diffs), res)
+        # end for each chunk size
+
+        # patches are capped, but all files are still listed
+        diffs = list(Diff._iter_from_patch_format(None, StringProcessAdapter(data), max_patch_size=20))
+        self.assertEqual(len(diffs), len(res))
+        for capped, dr in zip(diffs, res):
+            self.assertEqual(capped.diff, dr.diff[:20])
+            self.assertEqual(capped.b_path, dr.b_path)
+        # end for each diff
+
+        # diffs are available before the output was read entirely
+        output = StringProcessAdapter(data)
+        diffs = Diff._iter_from_patch_format(None, output)
+        self.assertEqual(next(diffs), res[0])
+        assert output.stdout.tell() < len(data)
+        diffs.close()
+        assert output.stdout.closed
+
+    @with_rw_directory
+    def test_diff_in_process(self, rw_dir):
+        r = Repo.init(rw_dir)
+        lines = ''.join('line %i\n' % i for i in range(40))
+
+        def commit(write=(), remove=(), rename=()):
+            for path in remove:
+                os.remove(osp.join(rw_dir, path))
+            for src, dst in rename:
+                os.rename(osp.join(rw_dir, src), osp.join(rw_dir, dst))
+            for path, data in write:
+                fp = osp.join(rw_dir, path)
+                if not osp.isdir(osp.dirname(fp)):
+                    os.makedirs(osp.dirname(fp))
+                with open(fp, 'w') as fs:
+                    fs.write(data)
+            r.git.add(A=True)
+            r.git.commit(message="commit")
+            return r.head.commit
+
+        def attrs(diffs):
+            return [(d.a_rawpath, d.b_rawpath, d.a_blob, d.b_blob, d.a_mode, d.b_mode, d.new_file, d.deleted_file,
+                     d.raw_rename_from, d.raw_rename_to, d.change_type, d.score) for d in diffs]
+
+        c1 = commit(write=[(p, p + '\n' + lines) for p in ('a.txt', 'b/c.txt', 'b/d/e.txt', 'f', 'h/i.txt')])
+        c2 = commit(write=[('a.txt', 'changed\n' + lines), ('b/d/new.txt', 'new\n')])
+        c3 = commit(write=[('h/i.txt', lines)], remove=['b/d/e.txt'])
+        # an identical and a similar rename, and a file replaced by a directory
+        c4 = commit(write=[('f/x.txt', 'x\n'), ('c.txt', 'b/c.txt\n' + lines + 'line 40\n')], remove=['f'],
+                    rename=[('h/i.txt', 'h/j.txt'), ('b/c.txt', 'c.txt')])
+
+        # without renames, the result is the one of git
+        for a, b in ((c1, c2), (c2, c1), (c1, c2.tree), (c2, c3), (c3, 'HEAD~2')):
+            self.assertIsNotNone(a._diff_in_process(b))
+            self.assertEqual(attrs(a.diff(b)), attrs(a.diff(b, in_process=False)))
+        # end for each pair of trees
+        self.assertEqual([d.change_type for d in c1.diff(c2)], ['M', 'A'])
+        self.assertEqual(attrs(c2.diff(c3, R=True)), attrs(c3.diff(c2)))
+
+        # git could find renames, unless they are found in-process
+        for a, b in ((c1, c3), (c3, c4), (c4, c1)):
+            self.assertIsNone(a._diff_in_process(b))
+            self.assertEqual(attrs(a.diff(b, in_process=True)), attrs(a.diff(b, in_process=False)))
+        # end for each pair of trees
+        renames = [(d.rename_from, d.rename_to, d.score) for d in c3.diff(c4, in_process=True).iter_change_type('R')]
+        self.assertEqual(renames, [('b/c.txt', 'c.txt', 97), ('h/i.txt', 'h/j.txt', 100)])
+        self.assertRaises(ValueError, c3.diff, c4, in_process=True, create_patch=True)
+
+        # the index is compared with its cached trees
+        r.git.read_tree(c2.hexsha)
+        r.git.add('c.txt')
+        self.assertIsNotNone(c1._diff_in_process(c1.Index))
+        for a in (c1, c3, c4):
+            self.assertEqual(attrs(a.diff()), attrs(a.diff(in_process=False)))
+            self.assertEqual(attrs(a.diff(in_process=True)), attrs(a.diff(in_process=False)))
+            self.assertEqual(attrs(r.index.diff(a, in_process=True)), attrs(r.index.diff(a, in_process=False)))
+        # end for each tree
+
     def test_diff_index_raw_format(self):
         output = StringProcessAdapter(fixture('diff_index_raw'))
         res = Diff._index_from_raw_format(None, output)
@@ -8,7 +8,14 @@ from git import Git
 from git.compat import PY3
 from git.index import IndexFile
 from git.index.fun import (
-    aggressive_tree_merge
+    aggressive_tree_merge,
+    read_cache_tree,
+    write_cache_tree,
+    write_tree_from_cache,
+)
+from git.index.typ import (
+    BaseIndexEntry,
+    CacheTree,
 )
 from git.objects.fun import (
     traverse_tree_recursive,
@@ -27,6 +34,7 @@ from git.test.lib import (
 )
 from git.util import bin_to_hex, cygpath, join_path_native
 from gitdb.base import IStream
+from gitdb.db import MemoryDB
 from gitdb.typ import str_tree_type
 
 
@@ -259,6 +267,34 @@ class TestFun(TestBase):
             assert entries
         # END for each commit
 
+    def test_write_tree_from_cache_tree(self):
+        paths = ['a/b/c', 'a/b/d', 'a/e', 'f/g', 'h']
+        entries = [BaseIndexEntry((0o100644, ("%020i" % i).encode('ascii'), 0, p)) for i, p in enumerate(paths)]
+        cache_tree = CacheTree()
+        odb = MemoryDB()
+        binsha = write_tree_from_cache(entries, odb, slice(0, len(entries)), cache_tree=cache_tree)[0]
+        assert binsha == write_tree_from_cache(entries, MemoryDB(), slice(0, len(entries)))[0]
+        assert cache_tree.binsha == binsha and cache_tree.entry_count == len(entries)
+        assert cache_tree.children['a'].entry_count == 3 and cache_tree.children['a'].children['b'].entry_count == 2
+
+        # serialization round-trip
+        data = write_cache_tree(cache_tree)
+        assert write_cache_tree(read_cache_tree(data)) == data
+
+        # only the trees containing the changed entry are written again
+        entries[3] = BaseIndexEntry((0o100644, b"x" * 20, 0, 'f/g'))
+        cache_tree.invalidate('f/g')
+        assert not cache_tree.valid and not cache_tree.children['f'].valid and cache_tree.children['a'].valid
+        odb = MemoryDB()
+        binsha = write_tree_from_cache(entries, odb, slice(0, len(entries)), cache_tree=cache_tree)[0]
+        assert binsha == write_tree_from_cache(entries, MemoryDB(), slice(0, len(entries)))[0]
+        assert odb.size() == 2
+        assert cache_tree.valid and cache_tree.children['f'].valid
+
+        # a file replacing a directory drops the directory's node
+        cache_tree.invalidate('a')
+        assert 'a' not in cache_tree.children
+
     @with_rw_directory
     def test_linked_worktree_traversal(self, rw_dir):
         """Check that we can identify a linked worktree based on a .git file"""
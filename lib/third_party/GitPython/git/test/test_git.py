@@ -8,6 +8,7 @@ import os
 import subprocess
 import sys
 from tempfile import TemporaryFile
+from unittest import skipIf
 
 from git import (
     Git,
@@ -269,6 +270,50 @@ class TestGit(TestBase):
                 else:
                     self.assertIn('FOO', str(err))
 
+    @skipIf(sys.version_info < (3, 5), "asyncio subprocesses need python 3.5")
+    def test_async_git(self):
+        import asyncio
+        from git.async_cmd import AsyncGit
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            agit = self.rorepo.async_git
+            self.assertIsInstance(agit, AsyncGit)
+            assert agit.git is self.rorepo.git
+
+            # output and arguments are the same as with the synchronous Git
+            coros = [agit.rev_parse('HEAD'), agit.version(), agit.log('-n', '2', format='%H'),
+                     agit.hash_object('--stdin', istream=b'foo\n')]
+            results = loop.run_until_complete(asyncio.gather(*coros))
+            self.assertEqual(results, [self.git.rev_parse('HEAD'), self.git.version(),
+                                       self.git.log('-n', '2', format='%H'),
+                                       '257cc5642cb1a054f08cc83f2d943e56fd3ebe99'])
+            status, out, err = loop.run_until_complete(agit.cat_file('-t', 'HEAD', with_extended_output=True))
+            self.assertEqual((status, out, err), (0, 'commit', ''))
+
+            # the concurrency limit is shared by all instances on one loop
+            limit = asyncio.Semaphore(2)
+            agits = [AsyncGit(self.rorepo.working_dir, semaphore=limit) for _ in range(6)]
+            results = loop.run_until_complete(asyncio.gather(*(g.rev_parse('HEAD') for g in agits)))
+            self.assertEqual(set(results), {self.git.rev_parse('HEAD')})
+
+            self.assertRaises(GitCommandError, loop.run_until_complete, agit.rev_parse('does-not-exist'))
+            self.assertRaises(ValueError, loop.run_until_complete, agit.log(as_process=True))
+            self.assertRaises(GitCommandNotFound, loop.run_until_complete,
+                              AsyncGit(self.rorepo.working_dir, git=Git()).execute(['git-does-not-exist']))
+
+            # timeouts and cancellation kill the command
+            slow = AsyncGit(git=Git(self.rorepo.working_dir), timeout=0.2)
+            with self.assertRaises(GitCommandError) as ctx:
+                loop.run_until_complete(slow(c='alias.slow=!exec sleep 5').slow())
+            self.assertIn('Timeout', str(ctx.exception))
+            self.assertRaises(asyncio.TimeoutError, loop.run_until_complete,
+                              asyncio.wait_for(agit(c='alias.slow=!exec sleep 5').slow(), 0.2))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
     def test_handle_process_output(self):
         from git.cmd import handle_process_output
 
@@ -33,6 +33,7 @@ from git.exc import (
 from git.index.fun import hook_path
 from git.index.typ import (
     BaseIndexEntry,
+    IndexEntries,
     IndexEntry
 )
 from git.objects import Blob
@@ -124,6 +125,19 @@ class TestIndex(TestBase):
         assert isinstance(index.update(), IndexFile)
         assert entries is not index.entries
 
+        # entries are unpacked lazily, and written back byte for byte
+        index = IndexFile(self.rorepo, fixture_path("index"))
+        assert isinstance(index.entries, IndexEntries)
+        stream = BytesIO()
+        index._serialize(stream)
+        with open(fixture_path("index"), "rb") as fp:
+            self.assertEqual(stream.getvalue(), fp.read())
+
+        entries = index.entries.copy()
+        stream = BytesIO()
+        index._serialize(stream)
+        self.assertEqual(IndexFile(self.rorepo)._deserialize(BytesIO(stream.getvalue())).entries, entries)
+
         # test stage
         index_merge = IndexFile(self.rorepo, fixture_path("index_merge"))
         self.assertEqual(len(index_merge.entries), 106)
@@ -340,6 +354,12 @@ class TestIndex(TestBase):
         # there must be differences towards the working tree which is in the 'future'
         assert index.diff(None)
 
+        # the stat based diff agrees with git, which is used whenever kwargs are given
+        sdiff = index._diff_working_tree(ignore_submodules=True)
+        gdiff = index.diff(None, ignore_submodules=True)
+        self.assertEqual([(d.a_path, d.change_type, d.a_blob) for d in sdiff],
+                         [(d.a_path, d.change_type, d.a_blob) for d in gdiff])
+
         # reset the working copy as well to current head,to pull 'back' as well
         new_data = b"will be reverted"
         file_path = osp.join(rw_repo.working_tree_dir, "CHANGES")
@@ -838,6 +858,35 @@ class TestIndex(TestBase):
         r.index.add([fp])
         r.index.commit('Added [.exe')
 
+    @with_rw_directory
+    def test_add_with_threads(self, rw_dir):
+        r = Repo.init(rw_dir)
+        paths = []
+        for i in range(12):
+            path = osp.join('dir%i' % (i % 3), 'file%02i' % i)
+            if not osp.isdir(osp.join(rw_dir, osp.dirname(path))):
+                os.mkdir(osp.join(rw_dir, osp.dirname(path)))
+            with open(osp.join(rw_dir, path), 'wb') as fp:
+                fp.write(os.urandom(1000 * i) + b'content %i' % i)
+            paths.append(path.replace(os.sep, '/'))
+        # end for each file
+
+        progress = []
+        serial_entries = r.index.add(['dir0', 'dir1', 'dir2'], max_workers=1, write=False)
+        entries = r.index.add(['dir0', 'dir1', 'dir2'], max_workers=4,
+                              fprogress=lambda path, done, item: progress.append((path, done)))
+        self.assertEqual(entries, serial_entries)
+        self.assertEqual(sorted(e.path for e in entries), sorted(paths))
+        for entry in entries:
+            self.assertEqual(entry.hexsha, r.git.hash_object(entry.path))
+        self.assertEqual(progress, [(e.path, False) for e in entries] + [(e.path, True) for e in entries])
+        r.git.fsck()
+
+        # null entries are stored by the pool as well
+        blobs = [Blob(r, Blob.NULL_BIN_SHA, 0o100644, path) for path in paths]
+        self.assertEqual(sorted(e.binsha for e in r.index.add(blobs, max_workers=3)),
+                         sorted(e.binsha for e in entries))
+
     def test__to_relative_path_at_root(self):
         root = osp.abspath(os.sep)
 
@@ -19,11 +19,14 @@ from git import (
 from git.objects.tag import TagObject
 from git.test.lib import (
     TestBase,
-    with_rw_repo
+    with_rw_repo,
+    with_rw_directory
 )
 from git.util import Actor
 
+from git.refs.symbolic import PackedRefs
 import git.refs as refs
+import os
 import os.path as osp
 
 
@@ -566,3 +569,31 @@ class TestRefs(TestBase):
 
     def test_reflog(self):
         assert isinstance(self.rorepo.heads.master.log(), RefLog)
+
+    @with_rw_directory
+    def test_packed_refs(self, rw_dir):
+        sha = '1' * 40
+        path = osp.join(rw_dir, 'packed-refs')
+        packed_refs = PackedRefs(path)
+        assert packed_refs.sha('refs/heads/master') is None and len(packed_refs) == 0
+
+        with open(path, 'w') as fp:
+            fp.write("# pack-refs with: peeled fully-peeled sorted \n")
+            fp.write("%s refs/tags/v2\n^%s\n" % (sha, '2' * 40))
+            fp.write("%s refs/heads/master\n%s refs/tags/v1\n" % (sha, sha))
+        # END write packed refs
+        assert packed_refs.sha('refs/tags/v2') == sha
+        assert [p for s, p in packed_refs.iter_items('refs/tags/')] == ['refs/tags/v1', 'refs/tags/v2']
+        assert len(packed_refs) == 3
+
+        # unchanged files are not parsed again, changed ones are
+        state = packed_refs._state
+        assert packed_refs.sha('refs/tags/v1') == sha and packed_refs._state is state
+        with open(path, 'a') as fp:
+            fp.write("%s refs/remotes/origin/master\n" % sha)
+        # END append ref
+        assert packed_refs.sha('refs/remotes/origin/master') == sha
+        assert packed_refs._state is not state
+
+        os.remove(path)
+        assert len(packed_refs) == 0
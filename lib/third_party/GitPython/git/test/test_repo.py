@@ -56,7 +56,7 @@ from git.test.lib import (
     assert_true,
     raises
 )
-from git.util import HIDE_WINDOWS_KNOWN_ERRORS, cygpath
+from git.util import HIDE_WINDOWS_KNOWN_ERRORS, cygpath, CallableRemoteProgress, RemoteProgress
 from git.test.lib import with_rw_directory
 from git.util import join_path_native, rmtree, rmfile, bin_to_hex
 
@@ -220,6 +220,22 @@ class TestRepo(TestBase):
 
         assert_equal(environment, cloned.git.environment())
 
+    @with_rw_directory
+    def test_clone_from_flushes_progress(self, rw_dir):
+        original_repo = Repo.init(osp.join(rw_dir, "repo"))
+        touch(osp.join(original_repo.working_tree_dir, "file"))
+        original_repo.index.add(["file"])
+        original_repo.index.commit("initial")
+
+        updates = []
+        progress = CallableRemoteProgress(lambda *args: updates.append(args), update_interval=3600)
+        Repo.clone_from("file://" + original_repo.git_dir, osp.join(rw_dir, "clone"), progress=progress)
+
+        # whatever the interval held back was passed on once the clone completed
+        assert updates
+        assert updates[-1][0] & RemoteProgress.END
+        assert_equal(tuple(progress.snapshot()), updates[-1])
+
     @with_rw_directory
     def test_clone_from_pathlib(self, rw_dir):
         if pathlib is None:  # pythons bellow 3.4 don't have pathlib
@@ -966,6 +982,71 @@ class TestRepo(TestBase):
         for i, j in itertools.permutations([c1, 'ffffff', ''], r=2):
             self.assertRaises(GitCommandError, repo.is_ancestor, i, j)
 
+    @with_rw_directory
+    def test_commit_graph(self, rw_dir):
+        git = Git(rw_dir)
+        if git.version_info[:3] < (2, 19, 0):
+            raise SkipTest("git commit-graph feature unsupported")
+
+        repo = Repo.init(rw_dir)
+        with repo.config_writer() as cw:
+            cw.set_value('user', 'name', 'tester')
+            cw.set_value('user', 'email', 'tester@example.com')
+
+        def commit(name):
+            repo.git.commit(allow_empty=True, m=name)
+
+        # history with criss-cross and octopus merges
+        commit('root')
+        for name in ('a', 'b', 'c'):
+            repo.git.checkout('master', b=name)
+            commit(name)
+        repo.git.checkout('a')
+        repo.git.merge('b', no_edit=True)
+        repo.git.checkout('b')
+        repo.git.merge('a~1', no_edit=True)
+        repo.git.checkout('c')
+        repo.git.merge('a~1', 'b~1', no_edit=True)
+        commit('c2')
+
+        revs = ('master', 'a', 'b', 'c', 'a~1', 'b~1', 'c~1')
+
+        def assert_matches_git():
+            for rev, other in itertools.combinations(revs, 2):
+                bases = sorted(repo.git.merge_base(rev, other, all=True).split())
+                self.assertEqual(sorted(c.hexsha for c in repo.merge_base(rev, other, all=True)), bases)
+                # all commits share the same time, so git may pick another of the best merge bases
+                res = repo.merge_base(rev, other)
+                self.assertEqual(len(res), 1)
+                self.assertIn(res[0].hexsha, bases)
+                for i, j in ((rev, other), (other, rev)):
+                    status = repo.git.merge_base(i, j, is_ancestor=True, with_extended_output=True,
+                                                 with_exceptions=False)[0]
+                    self.assertEqual(repo.is_ancestor(i, j), status == 0)
+                # end for each direction
+                counts = repo.git.rev_list('%s...%s' % (rev, other), left_right=True, count=True)
+                self.assertEqual(repo.ahead_behind(rev, other), tuple(int(c) for c in counts.split()))
+            # end for each pair
+            for rev in revs:
+                self.assertEqual(repo.commit(rev).count(), int(repo.git.rev_list(rev, count=True)))
+            # end for each rev
+
+        # without commit-graph file, the index is built by ourselves
+        assert_matches_git()
+        self.assertEqual(len(repo.commit_graph), 8)
+
+        # commits missing in git's file are added to our index
+        repo.git.commit_graph('write', '--reachable')
+        repo.git.checkout('b')
+        commit('b2')
+        revs += ('b',)
+        assert_matches_git()
+        self.assertEqual(repo.commit_graph._nfile, 8)
+        self.assertEqual(len(repo.commit_graph), 9)
+
+        self.assertRaises(GitCommandError, repo.ahead_behind, 'master', 'ffffff')
+        repo.close()
+
     @with_rw_directory
     def test_git_work_tree_dotgit(self, rw_dir):
         """Check that we find .git as a worktree file and find the worktree
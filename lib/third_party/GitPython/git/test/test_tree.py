@@ -5,14 +5,17 @@
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php
 
 from io import BytesIO
+import os
 import sys
 from unittest import skipIf
 
 from git import (
+    Repo,
     Tree,
     Blob
 )
-from git.test.lib import TestBase
+from git.objects.tree import TreeEntries, TreeEntriesCache
+from git.test.lib import TestBase, with_rw_directory
 from git.util import HIDE_WINDOWS_KNOWN_ERRORS
 
 import os.path as osp
@@ -106,3 +109,48 @@ class TestTree(TestBase):
             assert root[item.path] == item == root / item.path
         # END for each item
         assert found_slash
+
+    @with_rw_directory
+    def test_tree_entries_cache(self, rw_dir):
+        rw_repo = Repo.init(rw_dir)
+        for path in ('a', 'b/c', 'b/d/e', 'b/d/f'):
+            fp = osp.join(rw_dir, path)
+            if not osp.isdir(osp.dirname(fp)):
+                os.makedirs(osp.dirname(fp))
+            with open(fp, 'w') as fs:
+                fs.write(path)
+        # END for each file
+        rw_repo.git.add(A=True)
+        rw_repo.git.commit(message="init")
+
+        Tree.entries_cache.clear()
+        tree = rw_repo.head.commit.tree
+        blob = tree / 'b/d/e'
+        assert blob.path == 'b/d/e' and blob.data_stream.read() == b'b/d/e'
+        assert tree['b/d'].type == 'tree'
+        assert 'b/d/f' in tree['b/d'] and 'b/d/x' not in tree['b/d'] and blob in tree['b/d']
+        for path in ('x', 'a/b', 'b/', 'b//d', 'b/x/e'):
+            self.failUnlessRaises(KeyError, tree.join, path)
+        # END for each missing path
+        # the root and both directories of the path were parsed once
+        assert len(Tree.entries_cache) == 3
+
+        # parsed entries are shared with other repositories, but not modifications
+        other_tree = Repo(rw_dir).head.commit.tree
+        assert other_tree._cache is tree._cache
+        tree.cache.add(blob.binsha, blob.mode, 'g').set_done()
+        assert len(tree) == 3 and len(other_tree) == 2
+        assert 'g' in tree and 'g' not in other_tree
+
+        entries = TreeEntries.from_data(other_tree.data_stream.read())
+        assert entries == other_tree._cache and entries.find('b') == 1 and entries.find('g') == -1
+        assert entries[1] == (tree['b'].binsha, tree['b'].mode, 'b') and entries.binsha(1) == tree['b'].binsha
+        assert entries.find_binsha(tree['b'].binsha) == 1 and entries.find_binsha(b'\0' * 20) == -1
+
+        # the least recently used entries are dropped once the budget is exceeded
+        cache = TreeEntriesCache(max_bytes=entries.size() * 2)
+        for i in range(3):
+            cache.set(str(i).encode('ascii') * 20, entries)
+        assert len(cache) == 2 and b'0' * 20 not in cache
+        assert cache.get(b'1' * 20) is entries and cache.get(b'0' * 20) is None
+        assert cache.hits == 1 and cache.misses == 1 and cache.size() == entries.size() * 2
@@ -4,8 +4,10 @@
 # This module is part of GitPython and is released under
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php
 
+import os
 import tempfile
 import time
+from io import BytesIO
 from unittest import skipIf
 from datetime import datetime
 
@@ -31,7 +33,11 @@ from git.util import (
     Actor,
     IterableList,
     cygpath,
-    decygpath
+    decygpath,
+    stream_copy,
+    CallableRemoteProgress,
+    RemoteProgress,
+    ProgressSnapshot
 )
 
 
@@ -128,6 +134,22 @@ class TestUtils(TestBase):
         assert_equal('this-is-my-argument', dashify('this_is_my_argument'))
         assert_equal('foo', dashify('foo'))
 
+    def test_stream_copy(self):
+        class ReadOnlyStream(object):
+            def __init__(self, data):
+                self._stream = BytesIO(data)
+
+            def read(self, size=-1):
+                return self._stream.read(size)
+        # END read-only stream
+
+        data = os.urandom(10000)
+        for source in (BytesIO(data), ReadOnlyStream(data)):
+            destination = BytesIO()
+            assert stream_copy(source, destination, chunk_size=4096) == len(data)
+            assert destination.getvalue() == data
+        # END for each source type
+
     def test_lock_file(self):
         my_file = tempfile.mktemp()
         lock_file = LockFile(my_file)
@@ -280,3 +302,46 @@ class TestUtils(TestBase):
         # Wrong offset: UTC-9000, should return datetime + tzoffset(UTC)
         altz = utctz_to_altz('-9000')
         self.assertEqual(datetime.fromtimestamp(1522827734, tzoffset(0)), from_timestamp(1522827734, altz))
+
+    def test_remote_progress(self):
+        lines = [b'Counting objects: 4, done.',
+                 b'Receiving objects:  25% (1/4)   \rReceiving objects:  50% (2/4)   \r'
+                 b'Receiving objects:  75% (3/4)   \x1b[K\rreMote: foo',
+                 b'remote: Compressing objects: 100% (4/4)\rReceiving objects: 100% (4/4), 1.20 KiB | 0 bytes/s, done.',
+                 b' * [new branch]      master     -> origin/master']
+
+        def parse(progress):
+            handler = progress.new_message_handler()
+            for line in lines:
+                handler(line)
+            return progress
+
+        R = RemoteProgress
+        updates = []
+        progress = parse(CallableRemoteProgress(lambda *args: updates.append(args)))
+        self.assertEqual(updates, [(R.COUNTING | R.BEGIN | R.END, 4.0, '', ''),
+                                   (R.RECEIVING | R.BEGIN, 1.0, 4.0, ''),
+                                   (R.RECEIVING, 2.0, 4.0, ''),
+                                   (R.RECEIVING, 3.0, 4.0, ''),
+                                   (R.COMPRESSING | R.BEGIN, 4.0, 4.0, ''),
+                                   (R.RECEIVING | R.END, 4.0, 4.0, '1.20 KiB | 0 bytes/s')])
+        self.assertEqual(progress.other_lines, ['reMote: foo', ' * [new branch]      master     -> origin/master'])
+        self.assertEqual(progress.snapshot(), ProgressSnapshot(*updates[-1]))
+        assert RemoteProgress().snapshot() is None
+
+        # updates within an operation are held back, stages are not
+        throttled = []
+        progress = CallableRemoteProgress(lambda *args: throttled.append(args), update_interval=3600)
+        progress.flush()
+        parse(progress)
+        self.assertEqual(throttled, [updates[0], updates[1], updates[4], updates[5]])
+        progress.flush()
+        self.assertEqual(len(throttled), 4)
+
+        del throttled[:]
+        progress = CallableRemoteProgress(lambda *args: throttled.append(args), update_interval=3600)
+        progress._parse_progress_line(lines[1])
+        self.assertEqual(throttled, [updates[1]])
+        self.assertEqual(progress.snapshot(), ProgressSnapshot(*updates[3]))
+        progress.flush()
+        self.assertEqual(throttled, [updates[1], updates[3]])
@@ -3,6 +3,7 @@
 #
 # This module is part of GitPython and is released under
 # the BSD License: http://www.opensource.org/licenses/bsd-license.php
+from collections import namedtuple
 import contextlib
 from functools import wraps
 import getpass
@@ -46,7 +47,7 @@ from .exc import InvalidGitRepositoryError
 __all__ = ("stream_copy", "join_path", "to_native_path_windows", "to_native_path_linux",
            "join_path_native", "Stats", "IndexFileSHA1Writer", "Iterable", "IterableList",
            "BlockingLockFile", "LockFile", 'Actor', 'get_user_id', 'assure_directory_exists',
-           'RemoteProgress', 'CallableRemoteProgress', 'rmtree', 'unbare_repo',
+           'RemoteProgress', 'CallableRemoteProgress', 'ProgressSnapshot', 'rmtree', 'unbare_repo',
            'HIDE_WINDOWS_KNOWN_ERRORS')
 
 log = logging.getLogger(__name__)
@@ -117,8 +118,25 @@ def stream_copy(source, destination, chunk_size=512 * 1024):
     """Copy all data from the source stream into the destination stream in chunks
     of size chunk_size
 
+    If the source supports readinto, all chunks are read into the same buffer and
+    handed to the destination as memoryviews, which it must not keep around.
+
     :return: amount of bytes written"""
     br = 0
+    readinto = getattr(source, 'readinto', None)
+    if readinto is not None:
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            nbytes = readinto(view)
+            if not nbytes:
+                break
+            destination.write(view[:nbytes])
+            br += nbytes
+        # END reading output stream
+        return br
+    # END handle readinto
+
     while True:
         chunk = source.read(chunk_size)
         destination.write(chunk)
@@ -347,10 +365,21 @@ def expand_path(p, expand_vars=True):
 #{ Classes
 
 
+#: The latest progress parsed by a RemoteProgress, with the arguments of its update() method
+ProgressSnapshot = namedtuple('ProgressSnapshot', ('op_code', 'cur_count', 'max_count', 'message'))
+
+# clock used to throttle progress updates
+_progress_clock = getattr(time, 'monotonic', time.time)
+
+
 class RemoteProgress(object):
     """
     Handler providing an interface to parse progress information emitted by git-push
     and git-fetch and to dispatch callbacks allowing subclasses to react to the progress.
+
+    If update_interval is set, update() is called at most once per that many seconds while
+    an operation progresses, with the latest progress. Calls beginning or ending an operation
+    are never held back. The latest progress is available from snapshot() at any time.
     """
     _num_op_codes = 9
     BEGIN, END, COUNTING, COMPRESSING, WRITING, RECEIVING, RESOLVING, FINDING_SOURCES, CHECKING_OUT = \
@@ -363,14 +392,37 @@ class RemoteProgress(object):
 
     __slots__ = ('_cur_line',
                  '_seen_ops',
+                 '_state',       # ProgressSnapshot arguments of the latest progress
+                 '_pending',     # True if the latest progress was not passed to update() yet
+                 '_last_update',
+                 'update_interval',
                  'error_lines',  # Lines that started with 'error:' or 'fatal:'.
                  'other_lines')  # Lines not denoting progress (i.e.g. push-infos).
     re_op_absolute = re.compile(r"(remote: )?([\w\s]+):\s+()(\d+)()(.*)")
     re_op_relative = re.compile(r"(remote: )?([\w\s]+):\s+(\d+)% \((\d+)/(\d+)\)(.*)")
 
-    def __init__(self):
+    # matches what re_op_relative or else re_op_absolute match, at once
+    _re_op = re.compile(r"(?:remote: )?([\w\s]+):\s+(?:\d+% \((\d+)/(\d+)\)|(\d+))(.*)")
+    # git might expect a tty and send escape sequences, which we cut away
+    _re_control = re.compile(r"[\x00-\x1f]")
+
+    _op_codes = {
+        "Counting objects": COUNTING,
+        "Compressing objects": COMPRESSING,
+        "Writing objects": WRITING,
+        "Receiving objects": RECEIVING,
+        "Resolving deltas": RESOLVING,
+        "Finding sources": FINDING_SOURCES,
+        "Checking out files": CHECKING_OUT,
+    }
+
+    def __init__(self, update_interval=None):
         self._seen_ops = []
         self._cur_line = None
+        self._state = None
+        self._pending = False
+        self._last_update = None
+        self.update_interval = update_interval
         self.error_lines = []
         self.other_lines = []
 
@@ -387,57 +439,28 @@ class RemoteProgress(object):
         # Counting objects: 4, done.
         # Compressing objects:  50% (1/2)   \rCompressing objects: 100% (2/2)   \rCompressing objects: 100% (2/2), done.
         self._cur_line = line = line.decode('utf-8') if isinstance(line, bytes) else line
-        if len(self.error_lines) > 0 or self._cur_line.startswith(('error:', 'fatal:')):
-            self.error_lines.append(self._cur_line)
+        if self.error_lines or line.startswith(('error:', 'fatal:')):
+            self.error_lines.append(line)
             return []
 
-        sub_lines = line.split('\r')
         failed_lines = []
-        for sline in sub_lines:
-            # find escape characters and cut them away - regex will not work with
-            # them as they are non-ascii. As git might expect a tty, it will send them
-            last_valid_index = None
-            for i, c in enumerate(reversed(sline)):
-                if ord(c) < 32:
-                    # its a slice index
-                    last_valid_index = -i - 1
-                # END character was non-ascii
-            # END for each character in sline
-            if last_valid_index is not None:
-                sline = sline[:last_valid_index]
-            # END cut away invalid part
+        match_op = self._re_op.match
+        for sline in line.split('\r'):
+            control = self._re_control.search(sline)
+            if control is not None:
+                sline = sline[:control.start()]
             sline = sline.rstrip()
 
-            cur_count, max_count = None, None
-            match = self.re_op_relative.match(sline)
-            if match is None:
-                match = self.re_op_absolute.match(sline)
-
+            match = match_op(sline)
             if not match:
                 self.line_dropped(sline)
                 failed_lines.append(sline)
                 continue
             # END could not get match
 
-            op_code = 0
-            remote, op_name, percent, cur_count, max_count, message = match.groups()  # @UnusedVariable
-
-            # get operation id
-            if op_name == "Counting objects":
-                op_code |= self.COUNTING
-            elif op_name == "Compressing objects":
-                op_code |= self.COMPRESSING
-            elif op_name == "Writing objects":
-                op_code |= self.WRITING
-            elif op_name == 'Receiving objects':
-                op_code |= self.RECEIVING
-            elif op_name == 'Resolving deltas':
-                op_code |= self.RESOLVING
-            elif op_name == 'Finding sources':
-                op_code |= self.FINDING_SOURCES
-            elif op_name == 'Checking out files':
-                op_code |= self.CHECKING_OUT
-            else:
+            op_name, cur_count, max_count, abs_count, message = match.groups()
+            op_code = self._op_codes.get(op_name)
+            if op_code is None:
                 # Note: On windows it can happen that partial lines are sent
                 # Hence we get something like "CompreReceiving objects", which is
                 # a blend of "Compressing objects" and "Receiving objects".
@@ -451,16 +474,21 @@ class RemoteProgress(object):
                 return failed_lines
             # END handle op code
 
+            if abs_count is None:
+                cur_count = float(cur_count)
+                max_count = float(max_count)
+            else:
+                # absolute progress has no maximum count, which is passed as empty string
+                cur_count = float(abs_count)
+                max_count = ''
+            # END handle relative or absolute progress
+
             # figure out stage
             if op_code not in self._seen_ops:
                 self._seen_ops.append(op_code)
                 op_code |= self.BEGIN
             # END begin opcode
 
-            if message is None:
-                message = ''
-            # END message handling
-
             message = message.strip()
             if message.endswith(self.DONE_TOKEN):
                 op_code |= self.END
@@ -468,14 +496,35 @@ class RemoteProgress(object):
             # END end message handling
             message = message.strip(self.TOKEN_SEPARATOR)
 
-            self.update(op_code,
-                        cur_count and float(cur_count),
-                        max_count and float(max_count),
-                        message)
+            self._state = (op_code, cur_count, max_count, message)
+            if self.update_interval:
+                now = _progress_clock()
+                too_soon = self._last_update is not None and now - self._last_update < self.update_interval
+                if too_soon and not op_code & self.STAGE_MASK:
+                    self._pending = True
+                    continue
+                # END hold back update
+                self._last_update = now
+            # END throttle updates
+            self._pending = False
+            self.update(op_code, cur_count, max_count, message)
         # END for each sub line
         self.other_lines.extend(failed_lines)
         return failed_lines
 
+    def snapshot(self):
+        """:return: ProgressSnapshot of the latest progress, or None if there was none yet.
+            It may be called from any thread while progress is being parsed"""
+        state = self._state
+        return state and ProgressSnapshot._make(state)
+
+    def flush(self):
+        """Pass the latest progress to update() if it was held back due to the update_interval"""
+        if self._pending:
+            self._pending = False
+            self.update(*self._state)
+        # END handle pending update
+
     def new_message_handler(self):
         """
         :return:
@@ -521,9 +570,9 @@ class CallableRemoteProgress(RemoteProgress):
     """An implementation forwarding updates to any callable"""
     __slots__ = ('_callable')
 
-    def __init__(self, fn):
+    def __init__(self, fn, update_interval=None):
         self._callable = fn
-        super(CallableRemoteProgress, self).__init__()
+        super(CallableRemoteProgress, self).__init__(update_interval)
 
     def update(self, *args, **kwargs):
         self._callable(*args, **kwargs)
@@ -7,7 +7,8 @@ from gitdb.util import bin_to_hex
 
 from gitdb.fun import (
     type_id_to_type_map,
-    type_to_type_id_map
+    type_to_type_id_map,
+    stream_readinto
 )
 
 __all__ = ('OInfo', 'OPackInfo', 'ODeltaPackInfo',
@@ -137,6 +138,9 @@ class OStream(OInfo):
     def read(self, size=-1):
         return self[3].read(size)
 
+    def readinto(self, buf):
+        return stream_readinto(self[3], buf)
+
     @property
     def stream(self):
         return self[3]
@@ -175,6 +179,9 @@ class OPackStream(OPackInfo):
     def read(self, size=-1):
         return self[3].read(size)
 
+    def readinto(self, buf):
+        return stream_readinto(self[3], buf)
+
     @property
     def stream(self):
         return self[3]
@@ -193,6 +200,9 @@ class ODeltaPackStream(ODeltaPackInfo):
     def read(self, size=-1):
         return self[4].read(size)
 
+    def readinto(self, buf):
+        return stream_readinto(self[4], buf)
+
     @property
     def stream(self):
         return self[4]
@@ -241,6 +251,11 @@ class IStream(list):
             to our internal stream"""
         return self[3].read(size)
 
+    def readinto(self, buf):
+        """As read, but reads into the given writable buffer
+        :return: number of bytes read"""
+        return stream_readinto(self[3], buf)
+
     #} END stream reader interface
 
     #{  interface
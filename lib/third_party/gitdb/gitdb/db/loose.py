@@ -55,6 +55,7 @@ from gitdb.utils.encoding import force_bytes
 
 import tempfile
 import os
+import zlib
 
 
 __all__ = ('LooseObjectDB', )
@@ -68,6 +69,11 @@ class LooseObjectDB(FileDBBase, ObjectDBR, ObjectDBW):
     # chunks in which data will be copied between streams
     stream_chunk_size = chunk_size
 
+    # zlib level new objects are compressed with, git's default for loose objects.
+    # Objects are stored by several threads at once if they like, as compressing
+    # and hashing their data releases the GIL
+    compression_level = zlib.Z_BEST_SPEED
+
     # On windows we need to keep it writable, otherwise it cannot be removed
     # either
     new_objects_mode = int("444", 8)
@@ -185,7 +191,7 @@ class LooseObjectDB(FileDBBase, ObjectDBR, ObjectDBW):
             fd, tmp_path = tempfile.mkstemp(prefix='obj', dir=self._root_path)
 
             if istream.binsha is None:
-                writer = FDCompressedSha1Writer(fd)
+                writer = FDCompressedSha1Writer(fd, self.compression_level)
             else:
                 writer = FDStream(fd)
             # END handle direct stream copies
@@ -200,7 +206,8 @@ class LooseObjectDB(FileDBBase, ObjectDBR, ObjectDBW):
                 else:
                     # write object with header, we have to make a new one
                     write_object(istream.type, istream.size, istream.read, writer.write,
-                                 chunk_size=self.stream_chunk_size)
+                                 chunk_size=self.stream_chunk_size,
+                                 readinto=getattr(istream.stream, 'readinto', None))
                 # END handle direct stream copies
             finally:
                 if tmp_path:
@@ -223,14 +230,27 @@ class LooseObjectDB(FileDBBase, ObjectDBR, ObjectDBW):
             obj_path = self.db_path(self.object_path(hexsha))
             obj_dir = dirname(obj_path)
             if not isdir(obj_dir):
-                mkdir(obj_dir)
+                try:
+                    mkdir(obj_dir)
+                except OSError:
+                    # another thread or process may have created it in the meanwhile
+                    if not isdir(obj_dir):
+                        raise
+                # END handle concurrent creation
             # END handle destination directory
             # rename onto existing doesn't work on windows
             if os.name == 'nt':
                 if isfile(obj_path):
                     remove(tmp_path)
                 else:
-                    rename(tmp_path, obj_path)
+                    try:
+                        rename(tmp_path, obj_path)
+                    except OSError:
+                        # another thread or process may have stored the same object in the meanwhile
+                        remove(tmp_path)
+                        if not isfile(obj_path):
+                            raise
+                    # END handle concurrent store
                 # end rename only if needed
             else:
                 rename(tmp_path, obj_path)
@@ -14,16 +14,25 @@ from gitdb.util import LazyMixin
 from gitdb.exc import (
     BadObject,
     UnsupportedOperation,
-    AmbiguousObjectName
+    AmbiguousObjectName,
+    ParseError
 )
 
-from gitdb.pack import PackEntity
+from gitdb.pack import (
+    DeltaBaseCache,
+    PackEntity,
+    MultiPackIndexFile,
+    MultiPackIndexWriter
+)
 from gitdb.utils.compat import xrange
 
 from functools import reduce
+from operator import itemgetter
+from io import BytesIO
 
 import os
 import glob
+import threading
 
 __all__ = ('PackedDB', )
 
@@ -48,24 +57,56 @@ class PackedDB(FileDBBase, ObjectDBR, CachingDB, LazyMixin):
         # self._entities = list()       # lazy loaded list
         self._hit_count = 0             # amount of hits
         self._st_mtime = 0              # last modification data of our root path
+        # MultiPackIndexFile covering all our packs, or None if we have less than two
+        # self._midx = None             # lazy loaded along with the entities
+        # self._midx_entities = list()  # entity of each pack id of the multi-pack-index
+        self._base_cache = DeltaBaseCache()     # resolved delta bases, shared by all our entities
+        # guards changes to our entities. Readers don't take it, as our lists of entities
+        # are replaced, never changed in place
+        self._lock = threading.RLock()
 
     def _set_cache_(self, attr):
-        if attr == '_entities':
-            self._entities = list()
-            self.update_cache(force=True)
+        if attr in ('_entities', '_midx', '_midx_entities'):
+            with self._lock:
+                # another thread may have loaded our packs while we were waiting
+                if '_midx' not in self.__dict__:
+                    self._st_mtime = os.stat(self.root_path()).st_mtime
+                    self._update_entities(list())
+                # END handle first load
         # END handle entities initialization
 
     def _sort_entities(self):
-        self._entities.sort(key=lambda l: l[0], reverse=True)
+        # don't wait for a thread updating or sorting the entities already
+        if not self._lock.acquire(False):
+            return
+        try:
+            self._entities = sorted(self._entities, key=itemgetter(0), reverse=True)
+        finally:
+            self._lock.release()
+        # END sort under lock
 
     def _pack_info(self, sha):
-        """:return: tuple(entity, index) for an item at the given sha
-        :param sha: 20 or 40 byte sha
+        """:return: tuple(entity, offset) for an item at the given sha
+        :param sha: 20 byte sha
         :raise BadObject:
-        **Note:** This method is not thread-safe, but may be hit in multi-threaded
+        **Note:** This method doesn't lock, but may be hit in multi-threaded
             operation. The worst thing that can happen though is a counter that
-            was not incremented, or the list being in wrong order. So we safe
-            the time for locking here, lets see how that goes"""
+            was not incremented, or the list being in wrong order"""
+        midx = self._midx
+        if midx is not None:
+            # a single lookup covers all packs
+            index = midx.sha_to_index(sha)
+            if index is None:
+                raise BadObject(sha)
+            pack_id, offset = midx.pack_offset(index)
+            entities = self._midx_entities
+            # the index is reset before its entities change, if it is unchanged
+            # the entities belong to it
+            if self._midx is midx:
+                return (entities[pack_id], offset)
+            # END handle concurrent update
+        # END handle multi-pack-index
+
         # presort ?
         if self._hit_count % self._sort_interval == 0:
             self._sort_entities()
@@ -76,7 +117,7 @@ class PackedDB(FileDBBase, ObjectDBR, CachingDB, LazyMixin):
             if index is not None:
                 item[0] += 1            # one hit for you
                 self._hit_count += 1    # general hit count
-                return (item[1], index)
+                return (item[1], item[1].index().offset(index))
             # END index found in pack
         # END for each item
 
@@ -96,12 +137,72 @@ class PackedDB(FileDBBase, ObjectDBR, CachingDB, LazyMixin):
         # END exception handling
 
     def info(self, sha):
-        entity, index = self._pack_info(sha)
-        return entity.info_at_index(index)
+        entity, offset = self._pack_info(sha)
+        return entity.info_at_offset(sha, offset)
 
     def stream(self, sha):
-        entity, index = self._pack_info(sha)
-        return entity.stream_at_index(index)
+        entity, offset = self._pack_info(sha)
+        return entity.stream_at_offset(sha, offset)
+
+    def pack_offsets(self, shas):
+        """Locate many objects at once, resolving them in one sweep over the
+        multi-pack-index, or over each pack index in turn
+        :param shas: iterable of 20 byte shas
+        :return: dict mapping each sha found in our packs to tuple(entity, offset).
+            Missing shas are omitted"""
+        midx = self._midx
+        entities = self._midx_entities
+        if midx is not None and self._midx is midx:
+            pack_offset = midx.pack_offset
+            located = dict()
+            for sha, index in midx.shas_to_indices(shas).items():
+                pack_id, offset = pack_offset(index)
+                located[sha] = (entities[pack_id], offset)
+            # END for each found sha
+            return located
+        # END handle multi-pack-index
+
+        remaining = set(shas)
+        located = dict()
+        for item in self._entities:
+            if not remaining:
+                break
+            for sha, offset in item[1].shas_to_offsets(remaining).items():
+                located[sha] = (item[1], offset)
+            # END for each found sha
+            remaining.difference_update(located)
+        # END for each entity
+        return located
+
+    def _objects(self, shas, as_stream):
+        """:return: list of OInfo or OStream objects of the given shas, in order
+        :raise BadObject: if one of the shas is not in our packs"""
+        shas = list(shas)
+        located = self.pack_offsets(shas)
+        for sha in shas:
+            if sha not in located:
+                raise BadObject(sha)
+        # END verify all shas were found
+
+        # read objects pack by pack, in the order they are stored
+        objects = dict()
+        for sha, (entity, offset) in sorted(located.items(), key=lambda item: (id(item[1][0]), item[1][1])):
+            if as_stream:
+                objects[sha] = entity.stream_at_offset(sha, offset)
+            else:
+                objects[sha] = entity.info_at_offset(sha, offset)
+        # END for each object
+        return [objects[sha] for sha in shas]
+
+    def info_batch(self, shas):
+        """As ``info``, for many shas at once
+        :return: list of OInfo instances, in the order of the given shas"""
+        return self._objects(shas, False)
+
+    def stream_batch(self, shas):
+        """As ``stream``, for many shas at once
+        :return: list of OStream instances, in the order of the given shas"""
+        return self._objects(shas, True)
 
     def sha_iter(self):
         for entity in self.entities():
@@ -139,46 +240,86 @@ class PackedDB(FileDBBase, ObjectDBR, CachingDB, LazyMixin):
             does not appear to have changed according to its modification timestamp.
         :return: True if the packs have been updated so there is new information,
             False if there was no change to the pack database"""
-        stat = os.stat(self.root_path())
-        if not force and stat.st_mtime <= self._st_mtime:
-            return False
-        # END abort early on no change
-        self._st_mtime = stat.st_mtime
+        with self._lock:
+            stat = os.stat(self.root_path())
+            if not force and stat.st_mtime <= self._st_mtime:
+                return False
+            # END abort early on no change
+            self._st_mtime = stat.st_mtime
+            self._update_entities(self._entities)
+        # END with lock
+        return True
 
+    def _update_entities(self, entities):
+        """Replace our entities with the ones of the packs on disk, reusing the given
+        entities of unchanged packs. Must be called with our lock held.
+        Other threads keep reading from the previous entities until the new ones are
+        complete"""
         # packs are supposed to be prefixed with pack- by git-convention
         # get all pack files, figure out what changed
         pack_files = set(glob.glob(os.path.join(self.root_path(), "pack-*.pack")))
-        our_pack_files = {item[1].pack().path() for item in self._entities}
+        our_pack_files = {item[1].pack().path() for item in entities}
+
+        # removed packs
+        entities = [item for item in entities if item[1].pack().path() in pack_files]
 
         # new packs
         for pack_file in (pack_files - our_pack_files):
             # init the hit-counter/priority with the size, a good measure for hit-
             # probability. Its implemented so that only 12 bytes will be read
-            entity = PackEntity(pack_file)
-            self._entities.append([entity.pack().size(), entity, entity.index().sha_to_index])
+            entity = PackEntity(pack_file, self._base_cache)
+            entities.append([entity.pack().size(), entity, entity.index().sha_to_index])
         # END for each new packfile
 
-        # removed packs
-        for pack_file in (our_pack_files - pack_files):
-            del_index = -1
-            for i, item in enumerate(self._entities):
-                if item[1].pack().path() == pack_file:
-                    del_index = i
-                    break
-                # END found index
+        # reinitialize prioritiess
+        self._entities = sorted(entities, key=itemgetter(0), reverse=True)
+        self._update_multi_pack_index()
+
+    def _update_multi_pack_index(self):
+        """Use the multi-pack-index written by git if it covers all our packs, or build
+        one in memory. With a single pack, its own index is used directly"""
+        # reset the index before its entities, readers in other threads rely on that
+        self._midx = None
+        self._midx_entities = list()
+        if len(self._entities) < 2:
+            return
+        # END handle single pack
+
+        entities_by_name = dict((os.path.basename(item[1].index().path()), item[1]) for item in self._entities)
+        midx_path = os.path.join(self.root_path(), "multi-pack-index")
+        midx = None
+        if os.path.isfile(midx_path):
+            midx = MultiPackIndexFile(midx_path)
+            try:
+                if sorted(midx.pack_names()) != sorted(entities_by_name):
+                    midx = None
+            except (ParseError, UnsupportedOperation):
+                midx = None
+            # END ignore stale or unsupported indices
+        # END handle git's index
+
+        if midx is None:
+            writer = MultiPackIndexWriter()
+            for entity in entities_by_name.values():
+                writer.append(entity.index())
             # END for each entity
-            assert del_index != -1
-            del(self._entities[del_index])
-        # END for each removed pack
+            stream = BytesIO()
+            writer.write(stream.write)
+            midx = MultiPackIndexFile(None, stream.getvalue())
+        # END build index in memory
 
-        # reinitialize prioritiess
-        self._sort_entities()
-        return True
+        self._midx_entities = [entities_by_name[name] for name in midx.pack_names()]
+        self._midx = midx
 
     def entities(self):
         """:return: list of pack entities operated upon by this database"""
         return [item[1] for item in self._entities]
 
+    def base_cache(self):
+        """:return: DeltaBaseCache shared by all our pack entities. Its ``hits`` and
+            ``misses`` counters tell how effective it is for the current workload"""
+        return self._base_cache
+
     def partial_to_complete_sha(self, partial_binsha, canonical_length):
         """:return: 20 byte sha as inferred by the given partial binary sha
         :param partial_binsha: binary sha with less than 20 bytes
@@ -187,6 +328,14 @@ class PackedDB(FileDBBase, ObjectDBR, CachingDB, LazyMixin):
             had an odd or even number of characters
         :raise AmbiguousObjectName:
         :raise BadObject: """
+        midx = self._midx
+        if midx is not None:
+            index = midx.partial_sha_to_index(partial_binsha, canonical_length)
+            if index is None:
+                raise BadObject(partial_binsha)
+            return midx.sha(index)
+        # END handle multi-pack-index
+
         candidate = None
         for item in self._entities:
             item_index = item[1].index().partial_sha_to_index(partial_binsha, canonical_length)
@@ -8,15 +8,16 @@ it into c later, if required"""
 
 import zlib
 from gitdb.util import byte_ord
-decompressobj = zlib.decompressobj
 
 import mmap
+from array import array
+from bisect import bisect_left, bisect_right
 from itertools import islice
 from functools import reduce
 
 from gitdb.const import NULL_BYTE, BYTE_SPACE
 from gitdb.utils.encoding import force_text
-from gitdb.utils.compat import izip, buffer, xrange, PY3
+from gitdb.utils.compat import izip, buffer, memoryview, xrange, accumulate, PY3
 from gitdb.typ import (
     str_blob_type,
     str_commit_type,
@@ -26,6 +27,8 @@ from gitdb.typ import (
 
 from io import StringIO
 
+decompressobj = zlib.decompressobj
+
 # INVARIANTS
 OFS_DELTA = 6
 REF_DELTA = 7
@@ -54,9 +57,14 @@ type_to_type_id_map = {
 # used when dealing with larger streams
 chunk_size = 1000 * mmap.PAGESIZE
 
+# array typecode of offsets and sizes in delta programs, 'q' is py3 only
+delta_pos_typecode = PY3 and 'q' or 'l'
+
 __all__ = ('is_loose_object', 'loose_object_header_info', 'msb_size', 'pack_object_header_info',
-           'write_object', 'loose_object_header', 'stream_copy', 'apply_delta_data',
-           'is_equal_canonical_sha', 'connect_deltas', 'DeltaChunkList', 'create_pack_object_header')
+           'write_object', 'loose_object_header', 'stream_copy', 'stream_copy_into', 'stream_readinto',
+           'apply_delta_data',
+           'is_equal_canonical_sha', 'connect_deltas', 'DeltaChunkList', 'create_pack_object_header',
+           'DeltaProgram')
 
 
 #{ Structures
@@ -388,6 +396,217 @@ class TopdownDeltaChunkList(DeltaChunkList):
         return True
 
 
+class DeltaProgram(object):
+
+    """A delta parsed into flat arrays of copy and insert operations.
+
+    Operations write their bytes back to back into the target. Operation i
+    writes sizes[i] bytes, copied from the base at offset srcs[i] if bufs[i] is -1,
+    or from literals[bufs[i]] at offset srcs[i] otherwise. Literals are never
+    copied, they point into the delta buffers the program was parsed from.
+
+    Programs of a delta chain can be composed into a single program, which is
+    applied to the chain's base with one slice assignment per operation"""
+    __slots__ = (
+        'sizes',        # number of bytes written by each operation
+        'srcs',         # offset into the base or into the operation's literal buffer
+        'bufs',         # -1 to copy from the base, or index into literals
+        'literals',     # list of buffers holding inserted data
+        'base_size',    # size of the base the program applies to
+        'size'          # size of the target produced by the program
+    )
+
+    def __init__(self, base_size=0, size=0):
+        self.sizes = array(delta_pos_typecode)
+        self.srcs = array(delta_pos_typecode)
+        self.bufs = array('i')
+        self.literals = list()
+        self.base_size = base_size
+        self.size = size
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __repr__(self):
+        return "DeltaProgram(%i ops, %i -> %i bytes)" % (len(self), self.base_size, self.size)
+
+    @classmethod
+    def from_delta(cls, delta_buf):
+        """Parse the opcodes of the given delta, including its size header
+
+        :param delta_buf: random access delta data
+        :return: DeltaProgram
+        :raise ValueError: if the delta is corrupt"""
+        db = delta_buf
+        if not PY3:
+            db = bytearray(db)
+        # END assure indexing yields integers
+        i, base_size = msb_size(db)
+        i, target_size = msb_size(db, i)
+
+        self = cls(base_size, target_size)
+        self.literals.append(delta_buf)
+        sizes = self.sizes
+        srcs = self.srcs.append
+        bufs = self.bufs.append
+
+        tbw = 0                     # amount of target bytes written
+        prev_end = -1               # base offset past the previous copy operation
+        delta_buf_size = len(db)
+        try:
+            while i < delta_buf_size:
+                c = db[i]
+                i += 1
+                if c & 0x80:
+                    cp_off, cp_size = 0, 0
+                    if (c & 0x01):
+                        cp_off = db[i]
+                        i += 1
+                    if (c & 0x02):
+                        cp_off |= (db[i] << 8)
+                        i += 1
+                    if (c & 0x04):
+                        cp_off |= (db[i] << 16)
+                        i += 1
+                    if (c & 0x08):
+                        cp_off |= (db[i] << 24)
+                        i += 1
+                    if (c & 0x10):
+                        cp_size = db[i]
+                        i += 1
+                    if (c & 0x20):
+                        cp_size |= (db[i] << 8)
+                        i += 1
+                    if (c & 0x40):
+                        cp_size |= (db[i] << 16)
+                        i += 1
+
+                    if not cp_size:
+                        cp_size = 0x10000
+
+                    if cp_off + cp_size > base_size:
+                        raise ValueError("delta copies beyond the end of its base")
+
+                    if cp_off == prev_end:
+                        # consecutive copies, as produced for chunks larger than 64k
+                        sizes[-1] += cp_size
+                    else:
+                        sizes.append(cp_size)
+                        srcs(cp_off)
+                        bufs(-1)
+                    # END merge with previous copy
+                    prev_end = cp_off + cp_size
+                    tbw += cp_size
+                elif c:
+                    sizes.append(c)
+                    srcs(i)
+                    bufs(0)
+                    prev_end = -1
+                    i += c
+                    tbw += c
+                else:
+                    raise ValueError("unexpected delta opcode 0")
+                # END handle command byte
+            # END while processing delta data
+        except IndexError:
+            raise ValueError("delta is truncated")
+        # END handle truncated delta
+
+        if i != delta_buf_size or tbw != target_size:
+            raise ValueError("delta replay has gone wild")
+        return self
+
+    def compose(self, base_program):
+        """
+        :return: new DeltaProgram producing our target from the base of base_program,
+            which is the program producing the base this program applies to
+        :raise ValueError: if our base doesn't match the target of base_program
+        :note: only our own operations are iterated in python, runs of base_program's
+            operations covered by a copy are transferred with array slices. Compose
+            a chain starting at its base to keep it cheap."""
+        if base_program.size != self.base_size:
+            raise ValueError("delta base size %i doesn't match the size of the preceding target %i"
+                             % (self.base_size, base_program.size))
+        # END sanity check
+
+        prog = DeltaProgram(base_program.base_size, self.size)
+        prog.literals = base_program.literals + self.literals
+        sizes = prog.sizes
+        srcs = prog.srcs
+        bufs = prog.bufs
+
+        bsizes = base_program.sizes
+        bsrcs = base_program.srcs
+        bbufs = base_program.bufs
+        bends = None                            # target offset past each base operation
+        lofs = len(base_program.literals)       # index of our first literal in prog
+        lbuf = lend = -2                        # buffer and source end of the last operation
+
+        for size, src, buf in izip(self.sizes, self.srcs, self.bufs):
+            if buf >= 0:
+                buf += lofs
+                k = m = 0
+            else:
+                if bends is None:
+                    bends = array(delta_pos_typecode, accumulate(bsizes))
+                # END lazy init
+
+                # base operations k to m (inclusive) produce the copied range
+                end = src + size
+                k = bisect_right(bends, src)
+                m = bisect_left(bends, end, k)
+                n = bends[k] - src              # bytes of operation k we copy
+                src = bsrcs[k] + bsizes[k] - n
+                buf = bbufs[k]
+                if k != m:
+                    size = n
+                # END handle range spanning multiple operations
+            # END handle operation type
+
+            if buf == lbuf and src == lend:
+                sizes[-1] += size
+            else:
+                sizes.append(size)
+                srcs.append(src)
+                bufs.append(buf)
+            # END merge with previous operation
+            lbuf = buf
+            lend = src + size
+
+            if m > k:
+                sizes.extend(bsizes[k + 1:m])
+                srcs.extend(bsrcs[k + 1:m])
+                bufs.extend(bbufs[k + 1:m])
+                sizes.append(end - bends[m - 1])
+                srcs.append(bsrcs[m])
+                bufs.append(bbufs[m])
+                lbuf = bbufs[m]
+                lend = bsrcs[m] + sizes[-1]
+            # END transfer remaining operations
+        # END for each operation
+        return prog
+
+    def apply(self, base_buf, target=None):
+        """Apply this program to the given base
+
+        :param base_buf: random access base data, at least base_size bytes
+        :param target: writable buffer of at least size bytes, supporting slice
+            assignment. If None, a bytearray is allocated
+        :return: the target buffer"""
+        if target is None:
+            target = bytearray(self.size)
+        # END allocate target
+
+        views = [memoryview(lbuf) for lbuf in self.literals]
+        views.append(memoryview(base_buf))      # index -1
+        to = 0
+        for size, src, buf in izip(self.sizes, self.srcs, self.bufs):
+            target[to:to + size] = views[buf][src:src + size]
+            to += size
+        # END for each operation
+        return target
+
+
 #} END structures
 
 #{ Routines
@@ -517,7 +736,7 @@ def loose_object_header(type, size):
     return ('%s %i\0' % (force_text(type), size)).encode('ascii')
 
 
-def write_object(type, size, read, write, chunk_size=chunk_size):
+def write_object(type, size, read, write, chunk_size=chunk_size, readinto=None):
     """
     Write the object as identified by type, size and source_stream into the
     target_stream
@@ -526,6 +745,9 @@ def write_object(type, size, read, write, chunk_size=chunk_size):
     :param size: amount of bytes to write from source_stream
     :param read: read method of a stream providing the content data
     :param write: write method of the output stream
+    :param readinto: if not None, readinto method of the stream providing the content
+        data, used instead of read to copy it through a single reused buffer.
+        See ``stream_copy_into``
     :param close_target_stream: if True, the target stream will be closed when
         the routine exits, even if an error is thrown
     :return: The actual amount of bytes written to stream, which includes the header and a trailing newline"""
@@ -533,7 +755,11 @@ def write_object(type, size, read, write, chunk_size=chunk_size):
 
     # WRITE HEADER: type SP size NULL
     tbw += write(loose_object_header(type, size))
-    tbw += stream_copy(read, write, size, chunk_size)
+    if readinto is not None:
+        tbw += stream_copy_into(readinto, write, size, chunk_size)
+    else:
+        tbw += stream_copy(read, write, size, chunk_size)
+    # END handle copy method
 
     return tbw
 
@@ -565,6 +791,46 @@ def stream_copy(read, write, size, chunk_size):
     return dbw
 
 
+def stream_copy_into(readinto, write, size, chunk_size):
+    """
+    Copy a stream up to size bytes using the provided readinto and write methods.
+    All data passes through one buffer of up to chunk_size bytes, which is reused
+    for every chunk, so no intermediate strings are created.
+
+    **Note:** write receives memoryviews into the reused buffer. It must consume
+    the data before returning, as file, socket and hash objects do"""
+    buf = bytearray(max(min(chunk_size, size), 1))
+    view = memoryview(buf)
+    dbw = 0                                             # num data bytes written
+
+    while dbw < size:
+        cs = min(len(buf), size - dbw)
+        data_len = readinto(view[:cs])
+        if not data_len:
+            break
+        # END check for stream end
+        write(buffer(buf, 0, data_len))
+        dbw += data_len
+    # END duplicate data
+    return dbw
+
+
+def stream_readinto(stream, buf):
+    """
+    Read from the stream into the writable buffer buf, like io.RawIOBase.readinto.
+    Streams without a readinto method of their own are read from, and the data is
+    copied into buf
+
+    :return: number of bytes read into buf, 0 if the stream is depleted"""
+    readinto = getattr(stream, 'readinto', None)
+    if readinto is not None:
+        return readinto(buf)
+    # END use the stream's own implementation
+    data = stream.read(len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
 def connect_deltas(dstreams):
     """
     Read the condensed delta chunk information from dstream and merge its information
@@ -698,7 +964,7 @@ def apply_delta_data(src_buf, src_buf_size, delta_buf, delta_buf_size, write):
                 if (rbound < cp_size or
                         rbound > src_buf_size):
                     break
-                write(buffer(src_buf, cp_off, cp_size))
+                write(src_buf[cp_off:rbound])
             elif c:
                 write(db[i:i + c])
                 i += c
@@ -21,6 +21,7 @@ from gitdb.util import (
 )
 
 from gitdb.fun import (
+    apply_delta_data,
     create_pack_object_header,
     pack_object_header_info,
     is_equal_canonical_sha,
@@ -60,21 +61,28 @@ from gitdb.stream import (
 
 from struct import pack
 from binascii import crc32
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 
 from gitdb.const import NULL_BYTE
 from gitdb.utils.compat import (
     izip, 
     buffer, 
+    memoryview,
     xrange,
     to_bytes
 )
 
+from io import BytesIO
+
 import tempfile
+import threading
 import array
 import os
 import sys
 
-__all__ = ('PackIndexFile', 'PackFile', 'PackEntity')
+__all__ = ('PackIndexFile', 'PackFile', 'PackEntity', 'MultiPackIndexFile', 'MultiPackIndexWriter',
+           'DeltaBaseCache')
 
 
 #{ Utilities
@@ -173,6 +181,56 @@ def write_stream_to_pack(read, write, zstream, base_crc=None):
     return (br, bw, crc)
 
 
+class _ShaTable(object):
+
+    """Read-only sequence of the 20 byte shas stored at a fixed stride in a buffer,
+    to bisect them without copying"""
+    __slots__ = ('_data', '_offset', '_stride')
+
+    def __init__(self, data, offset, stride=20):
+        self._data = data
+        self._offset = offset
+        self._stride = stride
+
+    def __getitem__(self, i):
+        base = self._offset + i * self._stride
+        return self._data[base:base + 20]
+
+
+def _shas_to_indices(sha_table, fanout_table, shas):
+    """Resolve many shas in one sweep over a sorted sha table
+    :param sha_table: _ShaTable to search
+    :param fanout_table: list of 256 fanout entries of the table
+    :param shas: iterable of 20 byte shas
+    :return: dict mapping each sha found in the table to its index"""
+    found = dict()
+    lo = 0
+    shas = sorted(set(shas))
+    # only gallop if matches are expected to be a few entries apart
+    gallop = len(shas) * 16 >= fanout_table[255]
+    # sorted input only ever moves forward through the table
+    for sha in shas:
+        first_byte = byte_ord(sha[0])
+        hi = fanout_table[first_byte]
+        if first_byte:
+            lo = max(lo, fanout_table[first_byte - 1])
+        # END skip to the sha's fanout bucket
+        # gallop from the previous match, dense queries only advance a few entries
+        probe = lo if gallop else hi
+        step = 1
+        while probe < hi and sha_table[probe] < sha:
+            lo = probe + 1
+            probe = lo + step
+            step <<= 1
+        # END gallop
+        lo = bisect_left(sha_table, sha, lo, min(probe, hi))
+        if lo < hi and sha_table[lo] == sha:
+            found[sha] = lo
+            lo += 1
+        # END handle match
+    # END for each sha
+    return found
+
 #} END utilities
 
 
@@ -497,6 +555,25 @@ class PackIndexFile(LazyMixin):
         # END if we found something
         return None
 
+    def shas_to_indices(self, shas):
+        """Resolve many shas at once, in a single sweep over our sorted shas
+        :param shas: iterable of 20 byte shas, in any order
+        :return: dict mapping each sha found in this index to its index usable
+            with the ``offset`` or ``entry`` method. Missing shas are omitted"""
+        if self._version == 2:
+            sha_table = _ShaTable(self._cursor.map(), self._sha_list_offset)
+        else:
+            sha_table = _ShaTable(self._cursor.map(), 1024 + 4, 24)
+        # END handle version
+        return _shas_to_indices(sha_table, self._fanout_table, shas)
+
+    def shas_to_entries(self, shas):
+        """As ``shas_to_indices``, but resolves the pack data of each sha as well
+        :return: dict mapping each sha found in this index to tuple(offset, crc)"""
+        offset = self.offset
+        crc = self.crc
+        return dict((sha, (offset(i), crc(i))) for sha, i in self.shas_to_indices(shas).items())
+
     if 'PackIndexFile_sha_to_index' in globals():
         # NOTE: Its just about 25% faster, the major bottleneck might be the attr
         # accesses
@@ -507,6 +584,245 @@ class PackIndexFile(LazyMixin):
     #} END properties
 
 
+class MultiPackIndexWriter(object):
+
+    """Utility to gather the objects of several pack indices and write them as a
+    single multi-pack-index, in the format git uses for objects/pack/multi-pack-index
+    **Note:** only writes version 1 with sha1 object ids"""
+    __slots__ = '_indices'
+
+    def __init__(self):
+        self._indices = list()
+
+    def append(self, index_file):
+        """Add all objects of the given PackIndexFile"""
+        self._indices.append(index_file)
+
+    def write(self, write):
+        """Write the multi-pack-index using the given write method. Objects contained in
+        several packs are written once, pointing to the first pack by pack name
+        :return: sha1 binary sha over all multi-pack-index contents"""
+        indices = sorted(self._indices, key=lambda index: os.path.basename(index.path()))
+
+        # gather shas, pack ids and offsets of all objects
+        shas = list()
+        pack_ids = list()
+        offsets = list()
+        for pack_id, index in enumerate(indices):
+            size = index.size()
+            if index.version() == 2:
+                data = index._cursor.map()
+                shas.extend(data[i:i + 20] for i in xrange(index._sha_list_offset, index._crc_list_offset, 20))
+                index_offsets = unpack_from(">%iL" % size, data, index._pack_offset)
+                if any(ofs & 0x80000000 for ofs in index_offsets):
+                    index_offsets = [index.offset(i) for i in xrange(size)]
+                offsets.extend(index_offsets)
+            else:
+                shas.extend(index.sha(i) for i in xrange(size))
+                offsets.extend(index.offset(i) for i in xrange(size))
+            # END handle index version
+            pack_ids.extend((pack_id,) * size)
+        # END for each index
+
+        # sort by sha, the first pack wins for duplicates
+        order = sorted(xrange(len(shas)), key=shas.__getitem__)
+        sorted_shas = list()
+        object_offsets = list()
+        large_offsets = list()
+        last_sha = None
+        for i in order:
+            sha = shas[i]
+            if sha == last_sha:
+                continue
+            last_sha = sha
+            sorted_shas.append(sha)
+            ofs = offsets[i]
+            if ofs > 0x7fffffff:
+                large_offsets.append(ofs)
+                ofs = 0x80000000 + len(large_offsets) - 1
+            # END handle 64 bit offsets
+            object_offsets.append(pack_ids[i])
+            object_offsets.append(ofs)
+        # END for each object
+        oid_lookup = b''.join(sorted_shas)
+        first_bytes = bytearray(oid_lookup[::20])
+
+        pack_names = b''.join(os.path.basename(index.path()).encode('utf-8') + NULL_BYTE for index in indices)
+        pack_names += NULL_BYTE * (-len(pack_names) % 4)
+        chunks = [
+            (b'PNAM', pack_names),
+            (b'OIDF', pack(">256L", *[bisect_right(first_bytes, b) for b in xrange(256)])),
+            (b'OIDL', oid_lookup),
+            (b'OOFF', pack(">%iL" % len(object_offsets), *object_offsets)),
+        ]
+        if large_offsets:
+            chunks.append((b'LOFF', pack(">%iQ" % len(large_offsets), *large_offsets)))
+        # END handle large offsets
+
+        sha_writer = FlexibleSha1Writer(write)
+        sha_write = sha_writer.write
+        sha_write(MultiPackIndexFile.signature)
+        sha_write(pack(">BBBBL", MultiPackIndexFile.version_default, 1, len(chunks), 0, len(indices)))
+
+        # chunk lookup table, terminated by a zero id pointing to the end of the last chunk
+        chunk_offset = 12 + (len(chunks) + 1) * 12
+        for chunk_id, chunk_data in chunks:
+            sha_write(chunk_id + pack(">Q", chunk_offset))
+            chunk_offset += len(chunk_data)
+        # END for each chunk
+        sha_write(pack(">LQ", 0, chunk_offset))
+
+        for chunk_id, chunk_data in chunks:
+            sha_write(chunk_data)
+        # END for each chunk
+
+        sha = sha_writer.sha(as_hex=False)
+        write(sha)
+        return sha
+
+
+class MultiPackIndexFile(LazyMixin):
+
+    """A multi-pack-index maps the objects of several packs to the pack containing them
+    and their offset within it, allowing to find an object with a single lookup
+    instead of one per pack."""
+
+    __slots__ = ('_indexpath', '_cursor', '_data', '_pack_names', '_fanout_table',
+                 '_sha_table', '_sha_list_offset', '_pack_offset', '_pack_64_offset')
+
+    signature = b'MIDX'
+    version_default = 1
+
+    def __init__(self, indexpath, data=None):
+        """Initialize the index from the file at indexpath, or from the data
+        of a multi-pack-index held in memory"""
+        super(MultiPackIndexFile, self).__init__()
+        self._indexpath = indexpath
+        if data is not None:
+            self._data = data
+        # END handle in-memory data
+
+    def close(self):
+        if self._indexpath is not None:
+            mman.force_map_handle_removal_win(self._indexpath)
+        self._cursor = None
+
+    def _set_cache_(self, attr):
+        if attr == '_cursor':
+            self._cursor = mman.make_cursor(self._indexpath).use_region()
+        elif attr == '_data':
+            self._data = self._cursor.map()
+        else:
+            self._initialize()
+        # END handle attributes
+
+    def _initialize(self):
+        """read the header and chunk table"""
+        d = self._data
+        if d[:4] != self.signature:
+            raise ParseError("Not a multi-pack-index: %r" % self._indexpath)
+        version, oid_version, num_chunks, num_base, num_packs = unpack_from(">BBBBL", d, 4)
+        if version != self.version_default or oid_version != 1 or num_base != 0:
+            raise UnsupportedOperation("Unsupported multi-pack-index version %i with object id version %i"
+                                       % (version, oid_version))
+        # END verify header
+
+        chunks = dict()
+        chunk_offsets = list()
+        # the last row of the table only marks the end of the last chunk
+        for i in xrange(num_chunks + 1):
+            chunk_id, offset = unpack_from(">4sQ", d, 12 + i * 12)
+            chunks[chunk_id] = offset
+            chunk_offsets.append(offset)
+        # END for each chunk
+        for chunk_id in (b'PNAM', b'OIDF', b'OIDL', b'OOFF'):
+            if chunk_id not in chunks:
+                raise ParseError("multi-pack-index misses required chunk %r" % chunk_id)
+        # END verify chunks
+
+        pack_names_offset = chunks[b'PNAM']
+        pack_names_end = min(offset for offset in chunk_offsets if offset > pack_names_offset)
+        names = bytes(d[pack_names_offset:pack_names_end]).split(NULL_BYTE)
+        self._pack_names = [name.decode('utf-8') for name in names if name][:num_packs]
+        self._fanout_table = list(unpack_from(">256L", d, chunks[b'OIDF']))
+        self._sha_list_offset = chunks[b'OIDL']
+        self._sha_table = _ShaTable(d, self._sha_list_offset)
+        self._pack_offset = chunks[b'OOFF']
+        self._pack_64_offset = chunks.get(b'LOFF', 0)
+
+    #{ Properties
+
+    def size(self):
+        """:return: amount of objects referred to by this index"""
+        return self._fanout_table[255]
+
+    def path(self):
+        """:return: path to the multi-pack-index file, or None if it is held in memory"""
+        return self._indexpath
+
+    def pack_names(self):
+        """:return: list of the names of the pack index files, their position being
+            the pack id returned by ``pack_offset``"""
+        return self._pack_names
+
+    def sha(self, i):
+        """:return: sha at the given index"""
+        return self._sha_table[i]
+
+    def pack_offset(self, i):
+        """:return: tuple(pack_id, offset) of the object at the given index"""
+        pack_id, offset = unpack_from(">LL", self._data, self._pack_offset + i * 8)
+        if offset & 0x80000000:
+            offset = unpack_from(">Q", self._data, self._pack_64_offset + (offset & ~0x80000000) * 8)[0]
+        # END handle 64 bit offset
+        return pack_id, offset
+
+    def sha_to_index(self, sha):
+        """
+        :return: index usable with the ``pack_offset`` method, or None
+            if the sha was not found in this index
+        :param sha: 20 byte sha to lookup"""
+        first_byte = byte_ord(sha[0])
+        lo = first_byte and self._fanout_table[first_byte - 1]
+        hi = self._fanout_table[first_byte]
+        i = bisect_left(self._sha_table, sha, lo, hi)
+        if i < hi and self._sha_table[i] == sha:
+            return i
+        return None
+
+    def partial_sha_to_index(self, partial_bin_sha, canonical_length):
+        """
+        :return: index as in `sha_to_index` or None if the sha was not found in this
+            index file
+        :param partial_bin_sha: an at least two bytes of a partial binary sha as bytes
+        :param canonical_length: length of the original hexadecimal representation of the
+            given partial binary sha
+        :raise AmbiguousObjectName:"""
+        if len(partial_bin_sha) < 2:
+            raise ValueError("Require at least 2 bytes of partial sha")
+
+        first_byte = byte_ord(partial_bin_sha[0])
+        lo = first_byte and self._fanout_table[first_byte - 1]
+        hi = self._fanout_table[first_byte]
+        filled_sha = partial_bin_sha + NULL_BYTE * (20 - len(partial_bin_sha))
+        i = bisect_left(self._sha_table, filled_sha, lo, hi)
+        if i < hi and is_equal_canonical_sha(canonical_length, partial_bin_sha, self._sha_table[i]):
+            if i + 1 < hi and is_equal_canonical_sha(canonical_length, partial_bin_sha, self._sha_table[i + 1]):
+                raise AmbiguousObjectName(partial_bin_sha)
+            return i
+        # END if we have a match
+        return None
+
+    def shas_to_indices(self, shas):
+        """Resolve many shas at once, in a single sweep over our sorted shas
+        :param shas: iterable of 20 byte shas, in any order
+        :return: dict mapping each sha found in this index to its index usable with
+            the ``pack_offset`` method. Missing shas are omitted"""
+        return _shas_to_indices(self._sha_table, self._fanout_table, shas)
+
+    #} END properties
+
+
 class PackFile(LazyMixin):
 
     """A pack is a file written according to the Version 2 for git packs
@@ -520,7 +836,7 @@ class PackFile(LazyMixin):
     for some reason - one clearly doesn't want to read 10GB at once in that
     case"""
 
-    __slots__ = ('_packpath', '_cursor', '_size', '_version')
+    __slots__ = ('_packpath', '_cursors', '_size', '_version')
     pack_signature = 0x5041434b     # 'PACK'
     pack_version_default = 2
 
@@ -530,15 +846,25 @@ class PackFile(LazyMixin):
 
     def __init__(self, packpath):
         self._packpath = packpath
+        self._cursors = threading.local()   # cursor of each thread reading from us
 
     def close(self):
         mman.force_map_handle_removal_win(self._packpath)
-        self._cursor = None
-        
+        self._cursors = threading.local()
+
+    @property
+    def _cursor(self):
+        """:return: cursor into our pack which is private to the calling thread, as
+            cursors move around when reading"""
+        try:
+            return self._cursors.cursor
+        except AttributeError:
+            cursor = self._cursors.cursor = mman.make_cursor(self._packpath).use_region()
+            return cursor
+        # END handle new thread
+
     def _set_cache_(self, attr):
         # we fill the whole cache, whichever attribute gets queried first
-        self._cursor = mman.make_cursor(self._packpath).use_region()
-
         # read the header information
         type_id, self._version, self._size = unpack_from(">LLL", self._cursor.map(), 0)
 
@@ -657,6 +983,88 @@ class PackFile(LazyMixin):
     #} END Read-Database like Interface
 
 
+class DeltaBaseCache(object):
+
+    """Least recently used cache of fully resolved pack objects, keyed by
+    (pack path, offset) and bounded by the total amount of bytes it holds.
+
+    Delta chains sharing a base only need to inflate and apply the shared part once.
+    A single instance may be shared by all entities of a database."""
+    __slots__ = ('_max_bytes',       # byte budget of all cached objects
+                 '_objects',         # OrderedDict (pack path, offset) -> (type, data), oldest first
+                 '_size',            # number of bytes currently cached
+                 '_lock',            # guards the objects and counters, we may be shared by threads
+                 'hits',             # number of successful lookups
+                 'misses'            # number of failed lookups
+                 )
+
+    def __init__(self, max_bytes=96 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._objects = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, key):
+        return key in self._objects
+
+    def max_bytes(self):
+        """:return: byte budget of this cache"""
+        return self._max_bytes
+
+    def size(self):
+        """:return: number of bytes held by cached objects"""
+        return self._size
+
+    def get(self, key):
+        """:return: tuple(type, data) cached for the given (pack path, offset) key,
+            or None. A hit makes the object the most recently used one"""
+        with self._lock:
+            item = self._objects.pop(key, None)
+            if item is None:
+                self.misses += 1
+                return None
+            # END handle miss
+            self._objects[key] = item
+            self.hits += 1
+        return item
+
+    def set(self, key, type, data):
+        """Cache the resolved object at the given (pack path, offset) key, evicting
+        the least recently used objects to stay within our byte budget.
+        Objects larger than a quarter of the budget are not cached.
+
+        :return: True if the object was cached"""
+        if len(data) > self._max_bytes // 4:
+            return False
+        # END ignore huge objects
+        objects = self._objects
+        with self._lock:
+            item = objects.pop(key, None)
+            if item is not None:
+                self._size -= len(item[1])
+            # END handle replacement
+            objects[key] = (type, data)
+            self._size += len(data)
+
+            while self._size > self._max_bytes:
+                self._size -= len(objects.popitem(last=False)[1][1])
+            # END evict oldest
+        return True
+
+    def clear(self):
+        """Drop all cached objects and reset the counters"""
+        with self._lock:
+            self._objects.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+
 class PackEntity(LazyMixin):
 
     """Combines the PackIndexFile and the PackFile into one, allowing the
@@ -664,17 +1072,22 @@ class PackEntity(LazyMixin):
 
     __slots__ = ('_index',           # our index file
                  '_pack',            # our pack file
-                 '_offset_map'       # on demand dict mapping one offset to the next consecutive one
+                 '_offset_map',      # on demand dict mapping one offset to the next consecutive one
+                 '_base_cache'       # DeltaBaseCache of resolved objects, or None
                  )
 
     IndexFileCls = PackIndexFile
     PackFileCls = PackFile
 
-    def __init__(self, pack_or_index_path):
-        """Initialize ourselves with the path to the respective pack or index file"""
+    def __init__(self, pack_or_index_path, base_cache=None):
+        """Initialize ourselves with the path to the respective pack or index file
+
+        :param base_cache: if not None, a DeltaBaseCache keeping resolved delta bases
+            to speed up reading objects whose delta chains share them"""
         basename, ext = os.path.splitext(pack_or_index_path)
         self._index = self.IndexFileCls("%s.idx" % basename)            # PackIndexFile instance
         self._pack = self.PackFileCls("%s.pack" % basename)         # corresponding PackFile instance
+        self._base_cache = base_cache
 
     def close(self):
         self._index.close()
@@ -729,8 +1142,61 @@ class PackEntity(LazyMixin):
         if sha is None:
             sha = self._index.sha(index)
         # END assure sha is present ( in output )
-        offset = self._index.offset(index)
+        return self._object_at_offset(sha, self._index.offset(index), as_stream)
+
+    def _resolve_at_offset(self, offset):
+        """Resolve the object at offset by applying its delta chain on top of the
+        nearest base found in our base cache, caching every object resolved on the way.
+
+        :return: tuple(type, data) of the object, or None if its chain ends in a
+            REF delta whose base is not in this pack"""
+        cache = self._base_cache
+        path = self._pack.path()
+        cursor = self._pack._cursor
+        chain = list()
+        while True:
+            base = cache.get((path, offset))
+            if base is not None:
+                break
+            # END handle cached object
+            ostream = pack_object_at(cursor, offset, True)[1]
+            if ostream.type_id not in delta_types:
+                base = (ostream.type, ostream.read())
+                cache.set((path, offset), base[0], base[1])
+                break
+            # END handle base object
+            chain.append((offset, ostream))
+            if ostream.type_id == OFS_DELTA:
+                offset = ostream.pack_offset - ostream.delta_info
+            else:
+                sindex = self._index.sha_to_index(to_bytes(ostream.delta_info))
+                if sindex is None:
+                    return None
+                offset = self._index.offset(sindex)
+            # END handle delta type
+        # END while walking the chain
+
+        type, data = base
+        for offset, dstream in reversed(chain):
+            ddata = dstream.read()
+            i, src_size = msb_size(ddata)
+            i, target_size = msb_size(ddata, i)
+            target = BytesIO()
+            apply_delta_data(memoryview(data), src_size, ddata[i:], len(ddata) - i, target.write)
+            data = target.getvalue()
+            cache.set((path, offset), type, data)
+        # END for each delta to apply
+        return type, data
+
+    def _object_at_offset(self, sha, offset, as_stream):
+        """:return: OInfo or OStream object of the given sha, located at offset in the pack"""
         type_id, uncomp_size, data_rela_offset = pack_object_header_info(self._pack._cursor.use_region(offset).buffer())
+        if as_stream and type_id in delta_types and self._base_cache is not None:
+            resolved = self._resolve_at_offset(offset)
+            if resolved is not None:
+                return OStream(sha, resolved[0], len(resolved[1]), BytesIO(resolved[1]))
+            # END handle resolved object
+        # END handle cached deltas
         if as_stream:
             if type_id not in delta_types:
                 packstream = self._pack.stream(offset)
@@ -789,6 +1255,21 @@ class PackEntity(LazyMixin):
         object"""
         return self._object(None, True, index)
 
+    def shas_to_offsets(self, shas):
+        """Resolve many shas at once, see ``PackIndexFile.shas_to_indices``
+        :return: dict mapping each sha found in this pack to its offset in the pack"""
+        offset = self._index.offset
+        return dict((sha, offset(i)) for sha, i in self._index.shas_to_indices(shas).items())
+
+    def info_at_offset(self, sha, offset):
+        """As ``info``, but uses the offset of the object in the pack, as obtained from
+        a MultiPackIndexFile for instance, to refer to it"""
+        return self._object_at_offset(sha, offset, False)
+
+    def stream_at_offset(self, sha, offset):
+        """As ``stream``, but uses the offset of the object in the pack to refer to it"""
+        return self._object_at_offset(sha, offset, True)
+
     #} END Read-Database like Interface
 
     #{ Interface
@@ -849,7 +1330,7 @@ class PackEntity(LazyMixin):
             shawriter = Sha1Writer()
             stream = self._object(sha, as_stream=True)
             # write a loose object, which is the basis for the sha
-            write_object(stream.type, stream.size, stream.read, shawriter.write)
+            write_object(stream.type, stream.size, stream.read, shawriter.write, readinto=stream.readinto)
 
             assert shawriter.sha(as_hex=False) == sha
             return shawriter.sha(as_hex=False) == sha
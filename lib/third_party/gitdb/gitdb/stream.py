@@ -4,6 +4,7 @@
 # the New BSD License: http://www.opensource.org/licenses/bsd-license.php
 
 from io import BytesIO
+from functools import partial, reduce
 
 import mmap
 import os
@@ -13,9 +14,12 @@ import zlib
 from gitdb.fun import (
     msb_size,
     stream_copy,
+    stream_copy_into,
+    stream_readinto,
     apply_delta_data,
     connect_deltas,
-    delta_types
+    delta_types,
+    DeltaProgram
 )
 
 from gitdb.util import (
@@ -27,7 +31,7 @@ from gitdb.util import (
 )
 
 from gitdb.const import NULL_BYTE, BYTE_SPACE
-from gitdb.utils.compat import buffer
+from gitdb.utils.compat import buffer, memoryview
 from gitdb.utils.encoding import force_bytes
 
 has_perf_mod = False
@@ -66,7 +70,7 @@ class DecompressMemMapReader(LazyMixin):
     __slots__ = ('_m', '_zip', '_buf', '_buflen', '_br', '_cws', '_cwe', '_s', '_close',
                  '_cbr', '_phi')
 
-    max_read_size = 512 * 1024        # currently unused
+    max_read_size = 512 * 1024        # size of the chunks decompressed by readinto
 
     def __init__(self, m, close_on_deletion, size=None):
         """Initialize with mmap for stream reading
@@ -214,6 +218,11 @@ class DecompressMemMapReader(LazyMixin):
         # END skip header
 
     def read(self, size=-1):
+        return self._read(size, True)
+
+    def _read(self, size, fill):
+        """Implements read. If fill is False, at most one chunk is decompressed, which may
+        yield less than size bytes even though the stream is not depleted"""
         if size < 1:
             size = self._s - self._br
         else:
@@ -315,11 +324,31 @@ class DecompressMemMapReader(LazyMixin):
         # Note: dcompdat can be empty even though we still appear to have bytes
         # to read, if we are called by compressed_bytes_read - it manipulates
         # us to empty the stream
-        if dcompdat and (len(dcompdat) - len(dat)) < size and self._br < self._s:
-            dcompdat += self.read(size - len(dcompdat))
+        if fill and dcompdat and (len(dcompdat) - len(dat)) < size and self._br < self._s:
+            dcompdat += self.read(size - (len(dcompdat) - len(dat)))
         # END handle special case
         return dcompdat
 
+    def readinto(self, b):
+        """Decompress into the given writable buffer, like io.RawIOBase.readinto.
+        Input is taken from our map through memoryviews, and each decompressed chunk is
+        copied exactly once, into b, instead of being joined with its successors first.
+        Chunks are at most max_read_size bytes large, which bounds the memory used when
+        filling large buffers.
+
+        :return: number of bytes read, 0 if the stream is depleted"""
+        size = min(len(b), self._s - self._br)
+        nbr = 0
+        while nbr < size:
+            chunk = self._read(min(size - nbr, self.max_read_size), False)
+            if not chunk:
+                break
+            # END handle depleted stream
+            b[nbr:nbr + len(chunk)] = chunk
+            nbr += len(chunk)
+        # END for each chunk
+        return nbr
+
 
 class DeltaApplyReader(LazyMixin):
 
@@ -357,6 +386,9 @@ class DeltaApplyReader(LazyMixin):
 
     #{ Configuration
     k_max_memory_move = 250 * 1000 * 1000
+    # composing a chain only pays off if applying it delta by delta would copy
+    # many bytes of object data for each byte of delta data
+    k_min_compose_ratio = 2500
     #} END configuration
 
     def __init__(self, stream_list):
@@ -395,7 +427,7 @@ class DeltaApplyReader(LazyMixin):
         self._mm_target = allocate_memory(self._size)
 
         bbuf = allocate_memory(self._bstream.size)
-        stream_copy(self._bstream.read, bbuf.write, self._bstream.size, 256 * mmap.PAGESIZE)
+        stream_copy_into(partial(stream_readinto, self._bstream), bbuf.write, self._bstream.size, 256 * mmap.PAGESIZE)
 
         # APPLY CHUNKS
         write = self._mm_target.write
@@ -432,7 +464,7 @@ class DeltaApplyReader(LazyMixin):
         # Allocate private memory map big enough to hold the first base buffer
         # We need random access to it
         bbuf = allocate_memory(base_size)
-        stream_copy(self._bstream.read, bbuf.write, base_size, 256 * mmap.PAGESIZE)
+        stream_copy_into(partial(stream_readinto, self._bstream), bbuf.write, base_size, 256 * mmap.PAGESIZE)
 
         # allocate memory map large enough for the largest (intermediate) target
         # We will use it as scratch space for all delta ops. If the final
@@ -477,9 +509,49 @@ class DeltaApplyReader(LazyMixin):
         self._mm_target = bbuf
         self._size = final_target_size
 
+    def _set_cache_pure_(self, attr):
+        """Apply the deltas without the c extension. Chains moving many bytes per
+        byte of delta data are composed into a single copy/insert program, which is
+        applied to the base in one pass. Others are applied one by one, copying
+        every byte once"""
+        # earliest delta first
+        ddatas = [dstream.read() for dstream in reversed(self._dstreams)]
+        target_sizes = [msb_size(ddata, msb_size(ddata)[0])[1] for ddata in ddatas]
+        self._size = target_sizes[-1]
+        self._mm_target = allocate_memory(self._size)
+
+        if len(ddatas) > 1 and \
+                sum(target_sizes) > self.k_min_compose_ratio * sum(len(ddata) for ddata in ddatas):
+            prog = reduce(lambda base, prog: prog.compose(base), map(DeltaProgram.from_delta, ddatas))
+            if prog.size:
+                prog.apply(self._bstream.read(), self._mm_target)
+            return
+        # END handle composition
+
+        # intermediate targets alternate between two maps large enough for all of them
+        data = memoryview(self._bstream.read())
+        if len(ddatas) > 1:
+            scratch_size = max(max(target_sizes[:-1]), 1)
+            scratch = [mmap.mmap(-1, scratch_size), mmap.mmap(-1, scratch_size)]
+            for dindex, ddata in enumerate(ddatas[:-1]):
+                target = scratch[dindex % 2]
+                target.seek(0)
+                i, src_size = msb_size(ddata)
+                i = msb_size(ddata, i)[0]
+                apply_delta_data(data, src_size, memoryview(ddata)[i:], len(ddata) - i, target.write)
+                data = memoryview(target)
+            # END for each intermediate target
+        # END handle intermediate targets
+
+        ddata = ddatas[-1]
+        i, src_size = msb_size(ddata)
+        i = msb_size(ddata, i)[0]
+        apply_delta_data(data, src_size, memoryview(ddata)[i:], len(ddata) - i, self._mm_target.write)
+        self._mm_target.seek(0)
+
     #{ Configuration
     if not has_perf_mod:
-        _set_cache_ = _set_cache_brute_
+        _set_cache_ = _set_cache_pure_
     else:
         _set_cache_ = _set_cache_too_slow_without_c
 
@@ -495,6 +567,13 @@ class DeltaApplyReader(LazyMixin):
         self._br += len(data)
         return data
 
+    def readinto(self, b):
+        """As read, but reads into the given writable buffer
+        :return: number of bytes read"""
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
     def seek(self, offset, whence=getattr(os, 'SEEK_SET', 0)):
         """Allows to reset the stream to restart reading
 
@@ -651,10 +730,10 @@ class FDCompressedSha1Writer(Sha1Writer):
     # default exception
     exc = IOError("Failed to write all bytes to filedescriptor")
 
-    def __init__(self, fd):
+    def __init__(self, fd, level=zlib.Z_BEST_SPEED):
         super(FDCompressedSha1Writer, self).__init__()
         self.fd = fd
-        self.zip = zlib.compressobj(zlib.Z_BEST_SPEED)
+        self.zip = zlib.compressobj(level)
 
     #{ Stream Interface
 
@@ -7,9 +7,14 @@ from gitdb.test.db.lib import (
     with_rw_directory
 )
 from gitdb.db import LooseObjectDB
+from gitdb.db import loose
+from gitdb.base import IStream
 from gitdb.exc import BadObject
 from gitdb.util import bin_to_hex
 
+from io import BytesIO
+import os
+
 
 class TestLooseDB(TestDBBase):
 
@@ -34,3 +39,37 @@ class TestLooseDB(TestDBBase):
 
         self.failUnlessRaises(BadObject, ldb.partial_to_complete_sha_hex, '0000')
         # raises if no object could be found
+
+    @with_rw_directory
+    def test_store_race_on_windows(self, path):
+        ldb = LooseObjectDB(path)
+        first = ldb.store(IStream(b'blob', 4, BytesIO(b'data')))
+        obj_path = ldb.db_path(ldb.object_path(bin_to_hex(first.binsha).decode('ascii')))
+
+        # another writer stores the same object between our isfile() check and the rename,
+        # which doesn't overwrite existing files on windows
+        checks = []
+
+        def isfile(filepath):
+            checks.append(filepath)
+            return len(checks) > 1 and os.path.isfile(filepath)
+
+        def rename(src, dst):
+            if os.path.exists(dst):
+                raise OSError("destination exists: %s" % dst)
+            os.rename(src, dst)
+        # end rename
+
+        os_name, loose_isfile, loose_rename = os.name, loose.isfile, loose.rename
+        os.name, loose.isfile, loose.rename = 'nt', isfile, rename
+        try:
+            second = ldb.store(IStream(b'blob', 4, BytesIO(b'data')))
+        finally:
+            os.name, loose.isfile, loose.rename = os_name, loose_isfile, loose_rename
+        # END restore
+
+        assert second.binsha == first.binsha
+        assert checks == [obj_path, obj_path]
+        # the temporary file was removed
+        assert os.listdir(path) == [os.path.basename(os.path.dirname(obj_path))]
+        assert os.listdir(os.path.dirname(obj_path)) == [os.path.basename(obj_path)]
@@ -15,6 +15,7 @@ from gitdb.util import mman
 import os
 import random
 import sys
+import threading
 
 from nose.plugins.skip import SkipTest
 
@@ -57,6 +58,11 @@ class TestPackDB(TestDBBase):
         sha_list = list(pdb.sha_iter())
         assert len(sha_list) == pdb.size()
 
+        # all packs are covered by one multi-pack-index
+        assert pdb._midx is not None
+        assert pdb._midx.size() == len(set(sha_list))
+        assert sorted(pdb._midx_entities, key=id) == sorted(pdb.entities(), key=id)
+
         # hit all packs in random order
         random.shuffle(sha_list)
 
@@ -65,6 +71,32 @@ class TestPackDB(TestDBBase):
             pdb.stream(sha)
         # END for each sha to query
 
+        # resolved delta bases are shared by all entities, and agree with uncached reads
+        cache = pdb.base_cache()
+        assert all(entity._base_cache is cache for entity in pdb.entities())
+        assert cache.hits and cache.size() <= cache.max_bytes()
+        for sha in sha_list[:50]:
+            entity, offset = pdb._pack_info(sha)
+            cached = entity.stream_at_offset(sha, offset)
+            entity._base_cache = None
+            ostream = entity.stream_at_offset(sha, offset)
+            entity._base_cache = cache
+            assert (cached.type, cached.size, cached.read()) == (ostream.type, ostream.size, ostream.read())
+        # END for each sha
+
+        # bulk resolution agrees with single lookups
+        located = pdb.pack_offsets(sha_list + [b'\0' * 20])
+        assert len(located) == len(set(sha_list))
+        for sha in sha_list[:100]:
+            assert located[sha] == pdb._pack_info(sha)
+        # END for each sha
+        assert [info.binsha for info in pdb.info_batch(sha_list[:100])] == sha_list[:100]
+        self.failUnlessRaises(BadObject, pdb.info_batch, [b'\0' * 20])
+        for entity in pdb.entities():
+            index = entity.index()
+            assert index.shas_to_indices(sha_list) == dict((index.sha(i), i) for i in range(index.size()))
+        # END for each entity
+
         # test short finding - be a bit more brutal here
         max_bytes = 19
         min_bytes = 2
@@ -85,3 +117,63 @@ class TestPackDB(TestDBBase):
 
         # non-existing
         self.failUnlessRaises(BadObject, pdb.partial_to_complete_sha, b'\0\0', 4)
+
+        # the same lookups without multi-pack-index
+        pdb._midx = None
+        for sha in sha_list[:100]:
+            assert pdb.info(sha).binsha == sha
+        # END for each sha
+
+    @with_rw_directory
+    @with_packs_rw
+    def test_parallel_reads(self, path):
+        pdb = PackedDB(path)
+        sha_list = list(pdb.sha_iter())
+        expected = dict((sha, pdb.stream(sha).read()) for sha in sha_list)
+        errors = list()
+
+        def read_streams():
+            try:
+                # a fresh database lets the threads race on loading the packs as well
+                shas = list(sha_list)
+                random.shuffle(shas)
+                for sha in shas:
+                    ostream = tpdb.stream(sha)
+                    assert ostream.read() == expected[sha]
+                    assert tpdb.info(sha).size == len(expected[sha])
+                # END for each sha
+            except Exception as err:
+                errors.append(err)
+            # END store errors for the main thread
+        # END reader
+
+        # switch threads as often as possible to provoke races
+        switch_interval = getattr(sys, 'getswitchinterval', lambda: None)()
+        if switch_interval is not None:
+            sys.setswitchinterval(1e-6)
+        # END handle python 2
+        try:
+            for round in range(3):
+                tpdb = PackedDB(path)
+                threads = [threading.Thread(target=read_streams) for _ in range(8)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                assert not errors, errors
+            # END for each round
+
+            # updating the packs while others read doesn't disturb them
+            tpdb = PackedDB(path)
+            threads = [threading.Thread(target=read_streams) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for _ in range(20):
+                tpdb.update_cache(force=True)
+            for t in threads:
+                t.join()
+            assert not errors, errors
+        finally:
+            if switch_interval is not None:
+                sys.setswitchinterval(switch_interval)
+        # END restore switch interval
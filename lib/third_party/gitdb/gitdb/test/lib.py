@@ -4,6 +4,9 @@
 # the New BSD License: http://www.opensource.org/licenses/bsd-license.php
 """Utilities used in ODB testing"""
 from gitdb import OStream
+from gitdb.base import OPackStream, ODeltaPackStream
+from gitdb.fun import OFS_DELTA, type_to_type_id_map
+from gitdb.typ import str_blob_type
 from gitdb.utils.compat import xrange
 
 import sys
@@ -172,6 +175,92 @@ def make_memory_file(size_in_bytes, randomize=False):
     d = make_bytes(size_in_bytes, randomize)
     return len(d), BytesIO(d)
 
+
+def _delta_size(size):
+    """:return: size encoded as in a delta header"""
+    out = bytearray()
+    while size > 0x7f:
+        out.append(0x80 | (size & 0x7f))
+        size >>= 7
+    # END for each full byte
+    out.append(size)
+    return out
+
+
+def _delta_copy(offset, size):
+    """:return: copy commands for the given range of the source"""
+    out = bytearray()
+    while size:
+        chunk = min(size, 0x10000)
+        cmd = 0x80
+        args = bytearray()
+        for i, value in enumerate((offset, offset >> 8, offset >> 16, offset >> 24)):
+            if value & 0xff:
+                cmd |= 1 << i
+                args.append(value & 0xff)
+        # END for each offset byte
+        csize = chunk & 0xffff    # 0x10000 is encoded as 0
+        for i, value in enumerate((csize, csize >> 8)):
+            if value & 0xff:
+                cmd |= 0x10 << i
+                args.append(value & 0xff)
+        # END for each size byte
+        out.append(cmd)
+        out.extend(args)
+        offset += chunk
+        size -= chunk
+    # END for each chunk
+    return out
+
+
+def make_delta(src, changes, rnd=random):
+    """:return: tuple(delta, target) of a delta replacing small random ranges of src
+        with random data, and the target it produces
+    :param changes: number of ranges to replace"""
+    delta = bytearray()
+    target = bytearray()
+    last = 0
+    for pos in sorted(rnd.sample(xrange(len(src)), changes)):
+        if pos > last:
+            delta.extend(_delta_copy(last, pos - last))
+            target.extend(src[last:pos])
+        # END copy unchanged range
+        data = os.urandom(rnd.randint(1, 60))
+        delta.append(len(data))
+        delta.extend(data)
+        target.extend(data)
+        last = max(last, min(len(src), pos + rnd.randint(0, 60)))
+    # END for each change
+    if last < len(src):
+        delta.extend(_delta_copy(last, len(src) - last))
+        target.extend(src[last:])
+    # END copy tail
+
+    header = _delta_size(len(src)) + _delta_size(len(target))
+    return bytes(header + delta), bytes(target)
+
+
+def make_delta_chain(size, depth, changes, seed=0):
+    """:return: tuple(base, deltas, target), deltas being depth deltas applying on top
+        of each other, starting at the random base, and producing target
+    :param changes: number of ranges each delta replaces"""
+    rnd = random.Random(seed)
+    base = target = os.urandom(size)
+    deltas = list()
+    for _ in xrange(depth):
+        delta, target = make_delta(target, changes, rnd)
+        deltas.append(delta)
+    # END for each delta
+    return base, deltas, target
+
+
+def make_delta_streams(base, deltas):
+    """:return: list of streams as expected by DeltaApplyReader, last delta first and
+        the base object last"""
+    streams = [ODeltaPackStream(0, OFS_DELTA, len(delta), 0, BytesIO(delta)) for delta in reversed(deltas)]
+    streams.append(OPackStream(0, type_to_type_id_map[str_blob_type], len(base), BytesIO(base)))
+    return streams
+
 #} END routines
 
 #{ Stream Utilities
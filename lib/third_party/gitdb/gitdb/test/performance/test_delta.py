@@ -0,0 +1,67 @@
+# Copyright (C) 2010, 2011 Sebastian Thiel (byronimo@gmail.com) and contributors
+#
+# This module is part of GitDB and is released under
+# the New BSD License: http://www.opensource.org/licenses/bsd-license.php
+"""Performance of delta application on deep chains"""
+from __future__ import print_function
+
+from gitdb.test.performance.lib import TestBigRepoR
+from gitdb.test.lib import (
+    make_delta_chain,
+    make_delta_streams,
+    skip_on_travis_ci
+)
+
+from gitdb.stream import (
+    DeltaApplyReader,
+    has_perf_mod
+)
+
+import sys
+from time import time
+
+
+class TestDeltaApplyPerformance(TestBigRepoR):
+
+    # object size, chain depth, changed ranges per delta
+    chains = (
+        (20 * 1000, 50, 10),
+        (200 * 1000, 50, 20),
+        (200 * 1000, 50, 500),
+        (1000 * 1000, 50, 20),
+        (4000 * 1000, 50, 20),
+        (4000 * 1000, 50, 500),
+    )
+
+    def _apply(self, set_cache, base, deltas, repeat=3):
+        """:return: tuple(best time, data) of applying the chain with the given
+            _set_cache_ implementation"""
+        best = None
+        for _ in range(repeat):
+            reader = DeltaApplyReader.new(make_delta_streams(base, deltas))
+            st = time()
+            set_cache(reader, '_mm_target')
+            elapsed = time() - st
+            best = elapsed if best is None else min(best, elapsed)
+        # END for each repetition
+        return best, reader.read()
+
+    @skip_on_travis_ci
+    def test_deep_delta_chains(self):
+        modes = [('one by one', DeltaApplyReader._set_cache_brute_),
+                 ('pure python', DeltaApplyReader._set_cache_pure_)]
+        if has_perf_mod:
+            modes.append(('c extension', DeltaApplyReader._set_cache_too_slow_without_c))
+        # END handle c extension
+
+        for size, depth, changes in self.chains:
+            base, deltas, target = make_delta_chain(size, depth, changes)
+            timings = list()
+            for name, set_cache in modes:
+                elapsed, data = self._apply(set_cache, base, deltas)
+                assert data == target, name
+                timings.append("%s %f s" % (name, elapsed))
+            # END for each mode
+            print("Applied %i deltas with %i changes to %i KiB: %s"
+                  % (depth, changes, size // 1000, ", ".join(timings)), file=sys.stderr)
+        # END for each chain
@@ -12,6 +12,7 @@ from gitdb.test.lib import (
 from gitdb.stream import DeltaApplyReader
 
 from gitdb.pack import (
+    DeltaBaseCache,
     PackEntity,
     PackIndexFile,
     PackFile
@@ -249,6 +250,28 @@ class TestPack(TestBase):
         assert count == len(pack_objs)
         entity.close()
         
+    def test_delta_base_cache(self):
+        cache = DeltaBaseCache(400)
+        assert cache.get(('pack', 0)) is None and cache.misses == 1
+        assert cache.set(('pack', 0), b'blob', b'a' * 100)
+        assert cache.set(('pack', 1), b'blob', b'b' * 100)
+        assert not cache.set(('pack', 2), b'blob', b'c' * 101), "too large for the budget"
+        assert cache.get(('pack', 0)) == (b'blob', b'a' * 100) and cache.hits == 1
+
+        # least recently used objects go first
+        cache.set(('pack', 2), b'blob', b'c' * 100)
+        cache.set(('pack', 3), b'blob', b'd' * 100)
+        cache.set(('pack', 4), b'blob', b'e' * 100)
+        assert ('pack', 1) not in cache and ('pack', 0) in cache
+        assert len(cache) == 4 and cache.size() == 400
+
+        # replacing an object doesn't count it twice
+        cache.set(('pack', 4), b'blob', b'e' * 50)
+        assert cache.size() == 350
+
+        cache.clear()
+        assert len(cache) == 0 and cache.size() == cache.hits == cache.misses == 0
+
     def test_pack_64(self):
         # TODO: hex-edit a pack helping us to verify that we can handle 64 byte offsets
         # of course without really needing such a huge pack
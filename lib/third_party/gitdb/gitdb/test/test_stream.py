@@ -9,11 +9,14 @@ from gitdb.test.lib import (
     DummyStream,
     make_bytes,
     make_object,
+    make_delta_chain,
+    make_delta_streams,
     fixture_path
 )
 
 from gitdb import (
     DecompressMemMapReader,
+    DeltaApplyReader,
     FDCompressedSha1Writer,
     LooseObjectDB,
     Sha1Writer,
@@ -21,6 +24,7 @@ from gitdb import (
     IStream,
 )
 from gitdb.util import hex_to_bin
+from gitdb.fun import stream_copy_into, DeltaProgram
 
 import zlib
 from gitdb.typ import (
@@ -113,6 +117,76 @@ class TestStream(TestBase):
             # END whether size should be used
         # END whether stream should be closed when deleted
 
+    def test_decompress_reader_readinto(self):
+        for ds in self.data_sizes:
+            # incompressible, like most media files
+            cdata = os.urandom(ds)
+            zdata = zlib.compress(make_object(str_blob_type, cdata))
+            typ, size, reader = DecompressMemMapReader.new(zdata)
+
+            # small buffers are filled completely until the stream is depleted
+            buf = bytearray(ds // 3 + 1)
+            data = bytes()
+            while True:
+                nbytes = reader.readinto(buf)
+                if not nbytes:
+                    break
+                data += bytes(buf[:nbytes])
+            # END for each chunk
+            assert data == cdata
+            assert len(reader.data()) == reader.compressed_bytes_read()
+
+            # a large buffer takes everything at once, even though we decompress in chunks
+            reader.seek(0)
+            buf = bytearray(ds + 10)
+            assert reader.readinto(memoryview(buf)) == ds
+            assert bytes(buf[:ds]) == cdata
+
+            # copy through a single reused buffer
+            reader.seek(0)
+            out = BytesIO()
+            assert stream_copy_into(reader.readinto, out.write, size, 4096) == ds
+            assert out.getvalue() == cdata
+        # END for each datasize
+
+    def test_delta_program(self):
+        base, deltas, target = make_delta_chain(100 * 1000, 8, 30)
+        progs = [DeltaProgram.from_delta(delta) for delta in deltas]
+
+        # each program reproduces its delta's target
+        data = base
+        for prog in progs:
+            assert prog.base_size == len(data)
+            data = bytes(prog.apply(data))
+            assert len(data) == prog.size
+        # END for each program
+        assert data == target
+
+        # composing the chain yields the same target in one pass
+        prog = progs[0]
+        for dprog in progs[1:]:
+            prog = dprog.compose(prog)
+        # END for each program
+        assert prog.base_size == len(base) and prog.size == len(target)
+        assert bytes(prog.apply(base)) == target
+        assert len(prog) <= sum(len(p) for p in progs)
+        self.assertRaises(ValueError, progs[0].compose, progs[1])
+
+        # the reader yields the same result whether it composes the chain or not
+        ratio = DeltaApplyReader.k_min_compose_ratio
+        try:
+            for compose_ratio in (0, 10 ** 9):
+                DeltaApplyReader.k_min_compose_ratio = compose_ratio
+                reader = DeltaApplyReader.new(make_delta_streams(base, deltas))
+                assert reader.size == len(target)
+                assert reader.read() == target
+            # END for each mode
+        finally:
+            DeltaApplyReader.k_min_compose_ratio = ratio
+        # END restore configuration
+
+        self.assertRaises(ValueError, DeltaProgram.from_delta, deltas[0][:-1])
+
     def test_sha_writer(self):
         writer = Sha1Writer()
         assert 2 == writer.write("hi".encode("ascii"))
@@ -13,13 +13,14 @@ from io import BytesIO
 
 from smmap import (
     StaticWindowMapManager,
-    SlidingWindowMapManager,
+    ThreadSafeSlidingWindowMapManager,
     SlidingWindowMapBuffer
 )
 
 # initialize our global memory manager instance
 # Use it to free cached (and unused) resources.
-mman = SlidingWindowMapManager()
+# It is shared by all threads, each of which uses cursors of its own.
+mman = ThreadSafeSlidingWindowMapManager()
 # END handle mman
 
 import hashlib
@@ -11,6 +11,18 @@ except ImportError:
     xrange = range
 # end handle python version
 
+try:
+    from itertools import accumulate
+except ImportError:
+    # py2
+    def accumulate(iterable):
+        total = 0
+        for item in iterable:
+            total += item
+            yield total
+        # end for each item
+# end handle python version
+
 try:
     # Python 2
     buffer = buffer
@@ -9,9 +9,12 @@ from .util import (
 )
 
 import sys
+import threading
+from collections import OrderedDict
 from functools import reduce
 
-__all__ = ["StaticWindowMapManager", "SlidingWindowMapManager", "WindowCursor"]
+__all__ = ["StaticWindowMapManager", "SlidingWindowMapManager", "ThreadSafeSlidingWindowMapManager",
+           "WindowCursor"]
 #{ Utilities
 
 #}END utilities
@@ -62,9 +65,9 @@ class WindowCursor(object):
             try:
                 if len(self._rlist) == 0:
                     # Free all resources associated with the mapped file
-                    self._manager._fdict.pop(self._rlist.path_or_fd())
+                    self._manager._forget_regions(self._rlist)
                 # END remove regions list from manager
-            except (TypeError, KeyError):
+            except (TypeError, KeyError, AttributeError):
                 # sometimes, during shutdown, getrefcount is None. Its possible
                 # to re-import it, however, its probably better to just ignore
                 # this python problem (for now).
@@ -82,10 +85,10 @@ class WindowCursor(object):
         self._size = rhs._size
 
         for region in self._rlist:
-            region.increment_client_count()
+            self._manager._use_region(region)
 
         if self._region is not None:
-            self._region.increment_client_count()
+            self._manager._use_region(self._region)
         # END handle regions
 
     def __copy__(self):
@@ -132,8 +135,7 @@ class WindowCursor(object):
         # END handle offset
 
         if need_region:
-            self._region = man._obtain_region(self._rlist, offset, size, flags, False)
-            self._region.increment_client_count()
+            self._region = man._acquire_region(self._rlist, offset, size, flags)
         # END need region handling
 
         self._ofs = offset - self._region._b
@@ -148,7 +150,7 @@ class WindowCursor(object):
         to un-use the region once you are done reading from it in persistent cursors as it
         helps to free up resource more quickly"""
         if self._region is not None:
-            self._region.increment_client_count(-1)
+            self._manager._unuse_region(self._rlist, self._region)
         self._region = None
         # note: should reset ofs and size, but we spare that for performance. Its not
         # allowed to query information if we are not valid !
@@ -255,6 +257,10 @@ class StaticWindowMapManager(object):
         '_max_handle_count',        # maximum amount of handles to keep open
         '_memory_size',     # currently allocated memory size
         '_handle_count',        # amount of currently allocated file handles
+        '_lru',             # OrderedDict of region -> regions list of regions only we use, oldest first
+        '_num_hits',        # amount of region requests served by an existing region
+        '_num_misses',      # amount of region requests which had to map a new region
+        '_num_evictions',   # amount of regions unmapped to free resources
     ]
 
     #{ Configuration
@@ -283,6 +289,10 @@ class StaticWindowMapManager(object):
         self._max_handle_count = max_open_handles
         self._memory_size = 0
         self._handle_count = 0
+        self._lru = OrderedDict()
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
 
         if window_size < 0:
             coeff = 64
@@ -302,6 +312,35 @@ class StaticWindowMapManager(object):
 
     #{ Internal Methods
 
+    def _acquire_region(self, a, offset, size, flags):
+        """Obtain the region of the regions (a)rray which includes offset, and add a client to it.
+        For more information on the parameters, see WindowCursor.use_region
+        :return: the region, which can't be collected until it is unused"""
+        r = self._obtain_region(a, offset, size, flags, False)
+        self._use_region(r)
+        return r
+
+    def _forget_regions(self, a):
+        """Remove the given regions (a)rray from our file map if it holds no region anymore"""
+        if len(a) == 0 and self._fdict.get(a.path_or_fd()) is a:
+            del(self._fdict[a.path_or_fd()])
+        # END handle empty list
+
+    def _use_region(self, region):
+        """Add a client to the given region, which can't be collected while it is used"""
+        if region._uc == 1:
+            self._lru.pop(region, None)
+        # END handle collectable region
+        region.increment_client_count()
+
+    def _unuse_region(self, regions, region):
+        """Remove a client from the given region of the regions list. Once we are its
+        only client, it becomes the most recently used collectable region"""
+        region.increment_client_count(-1)
+        if region._uc == 1:
+            self._lru[region] = regions
+        # END handle collectable region
+
     def _collect_lru_region(self, size):
         """Unmap the region which was least-recently used and has no client
         :param size: size of the region we want to map next (assuming its not already mapped partially or full
@@ -312,35 +351,25 @@ class StaticWindowMapManager(object):
             We don't raise exceptions anymore, in order to keep the system working, allowing temporary overallocation.
             If the system runs out of memory, it will tell.
 
-        .. TODO::
-            implement a case where all unusued regions are discarded efficiently.
-            Currently its only brute force
+        .. Note::
+            Regions only we use are kept in least-recently-used order, the oldest one is
+            found in constant time.
         """
         num_found = 0
+        lru = self._lru
         while (size == 0) or (self._memory_size + size > self._max_memory_size):
-            lru_region = None
-            lru_list = None
-            for regions in self._fdict.values():
-                for region in regions:
-                    # check client count - if it's 1, it's just us
-                    if (region.client_count() == 1 and
-                            (lru_region is None or region._uc < lru_region._uc)):
-                        lru_region = region
-                        lru_list = regions
-                    # END update lru_region
-                # END for each region
-            # END for each regions list
-
-            if lru_region is None:
+            if not lru:
                 break
             # END handle region not found
 
+            lru_region, lru_list = lru.popitem(last=False)
             num_found += 1
             del(lru_list[lru_list.index(lru_region)])
             lru_region.increment_client_count(-1)
             self._memory_size -= lru_region.size()
             self._handle_count -= 1
         # END while there is more memory to free
+        self._num_evictions += num_found
         return num_found
 
     def _obtain_region(self, a, offset, size, flags, is_recursive):
@@ -356,6 +385,7 @@ class StaticWindowMapManager(object):
         if a:
             assert len(a) == 1
             r = a[0]
+            self._num_hits += 1
         else:
             try:
                 r = self.MapRegionCls(a.path_or_fd(), 0, sys.maxsize, flags)
@@ -375,6 +405,7 @@ class StaticWindowMapManager(object):
 
             self._handle_count += 1
             self._memory_size += r.size()
+            self._num_misses += 1
             a.append(r)
         # END handle array
 
@@ -436,6 +467,30 @@ class StaticWindowMapManager(object):
         """:return: maximum amount of memory we may allocate"""
         return self._max_memory_size
 
+    def num_collectable_regions(self):
+        """:return: amount of mapped regions which are not used by any cursor"""
+        return len(self._lru)
+
+    def num_evictions(self):
+        """:return: amount of regions unmapped so far to free memory or handles"""
+        return self._num_evictions
+
+    def num_hits(self):
+        """:return: amount of region requests served by an already mapped region"""
+        return self._num_hits
+
+    def num_misses(self):
+        """:return: amount of region requests which required mapping a new region"""
+        return self._num_misses
+
+    def hit_ratio(self):
+        """:return: fraction of region requests served by an already mapped region,
+            0.0 if there was no request yet"""
+        num_requests = self._num_hits + self._num_misses
+        if not num_requests:
+            return 0.0
+        return self._num_hits / float(num_requests)
+
     #} END interface
 
     #{ Special Purpose Interface
@@ -477,7 +532,7 @@ class SlidingWindowMapManager(StaticWindowMapManager):
     which result from each mmap call, the least recently used, and currently unused mapped regions
     are unloaded automatically.
 
-    **Note:** currently not thread-safe !
+    **Note:** not thread-safe, use the ThreadSafeSlidingWindowMapManager to share it between threads !
 
     **Note:** in the current implementation, we will automatically unload windows if we either cannot
         create more memory maps (as the open file handles limit is hit) or if we have allocated more than
@@ -585,6 +640,70 @@ class SlidingWindowMapManager(StaticWindowMapManager):
 
             self._handle_count += 1
             self._memory_size += r.size()
+            self._num_misses += 1
             a.insert(insert_pos, r)
+        else:
+            self._num_hits += 1
         # END create new region
         return r
+
+
+class ThreadSafeSlidingWindowMapManager(SlidingWindowMapManager):
+
+    """A SlidingWindowMapManager which may be shared by cursors living in different threads.
+
+    All bookkeeping of mapped regions and their clients happens while holding a lock.
+    Reading from a region does not, as mapped memory is never changed once mapped and
+    a region can't be unmapped while a cursor uses it.
+
+    **Note:** a cursor itself must still only be used by one thread at a time. Threads
+    should obtain their own cursors using ``make_cursor``."""
+
+    __slots__ = (
+        '_lock',            # reentrant lock guarding our region bookkeeping
+    )
+
+    def __init__(self, window_size=-1, max_memory_size=0, max_open_handles=sys.maxsize):
+        super(ThreadSafeSlidingWindowMapManager, self).__init__(window_size, max_memory_size, max_open_handles)
+        # reentrant, as cursors may be destroyed by the garbage collector while we hold it
+        self._lock = threading.RLock()
+
+    #{ Internal Methods
+
+    def _acquire_region(self, a, offset, size, flags):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self)._acquire_region(a, offset, size, flags)
+
+    def _forget_regions(self, a):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self)._forget_regions(a)
+
+    def _use_region(self, region):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self)._use_region(region)
+
+    def _unuse_region(self, regions, region):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self)._unuse_region(regions, region)
+
+    def _collect_lru_region(self, size):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self)._collect_lru_region(size)
+
+    #} END internal methods
+
+    #{ Interface
+
+    def make_cursor(self, path_or_fd):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self).make_cursor(path_or_fd)
+
+    def num_open_files(self):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self).num_open_files()
+
+    def force_map_handle_removal_win(self, base_path):
+        with self._lock:
+            return super(ThreadSafeSlidingWindowMapManager, self).force_map_handle_removal_win(base_path)
+
+    #} END interface
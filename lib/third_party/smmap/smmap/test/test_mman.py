@@ -5,7 +5,8 @@ from .lib import TestBase, FileCreator
 from smmap.mman import (
     WindowCursor,
     SlidingWindowMapManager,
-    StaticWindowMapManager
+    StaticWindowMapManager,
+    ThreadSafeSlidingWindowMapManager
 )
 from smmap.util import align_to_mmap
 
@@ -13,6 +14,7 @@ from random import randint
 from time import time
 import os
 import sys
+import threading
 from copy import copy
 
 
@@ -224,3 +226,82 @@ class TestMMan(TestBase):
                 # END for each manager type
             finally:
                 os.close(fd)
+
+    def test_lru_collection(self):
+        with FileCreator(self.k_window_test_size, "lru_collection_test") as fc:
+            window_size = align_to_mmap(fc.size // 10, False)
+            man = SlidingWindowMapManager(window_size=window_size)
+            c = man.make_cursor(fc.path)
+
+            # map the first three windows, none of them remains in use
+            regions = list()
+            for i in range(3):
+                assert c.use_region(i * window_size, 1).is_valid()
+                regions.append(c.region())
+            # END for each window
+            c.unuse_region()
+            assert man.num_collectable_regions() == 3
+            assert man.num_misses() == 3 and man.num_hits() == 0
+
+            # reusing the first window makes it the most recently used one
+            assert c.use_region(1, 1).region() is regions[0]
+            assert man.num_hits() == 1 and man.hit_ratio() == 0.25
+            assert man.num_collectable_regions() == 2, "regions in use can't be collected"
+            c.unuse_region()
+
+            # just enough memory to map one more window without unmapping anything else
+            man._max_memory_size = man.mapped_memory_size() + window_size
+            assert man._collect_lru_region(window_size * 2) == 1
+            assert regions[1] not in man._fdict[fc.path]
+            assert man._collect_lru_region(window_size * 2) == 0
+            assert man.num_evictions() == 1
+
+            assert man.collect() == 2
+            assert man.num_evictions() == 3 and man.mapped_memory_size() == 0
+            assert man.num_collectable_regions() == 0
+
+    def test_thread_safe_manager(self):
+        with FileCreator(self.k_window_test_size, "thread_safe_test") as fc:
+            with open(fc.path, 'rb') as fp:
+                data = fp.read()
+            # small windows and little memory cause lots of mapping and unmapping
+            window_size = fc.size // 50
+            man = ThreadSafeSlidingWindowMapManager(window_size=window_size, max_memory_size=window_size * 8)
+            errors = list()
+
+            def read_randomly():
+                try:
+                    c = man.make_cursor(fc.path)
+                    for _ in range(2000):
+                        ofs = randint(0, fc.size - 1)
+                        assert c.use_region(ofs, 100).is_valid()
+                        assert c.buffer()[:] == data[ofs:ofs + c.size()]
+                    # END for each access
+                    c.unuse_region()
+                except Exception as err:
+                    errors.append(err)
+                # END store errors for the main thread
+            # END reader
+
+            # switch threads as often as possible to provoke races
+            switch_interval = getattr(sys, 'getswitchinterval', lambda: None)()
+            if switch_interval is not None:
+                sys.setswitchinterval(1e-6)
+            # END handle python 2
+            try:
+                threads = [threading.Thread(target=read_randomly) for _ in range(8)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            finally:
+                if switch_interval is not None:
+                    sys.setswitchinterval(switch_interval)
+            # END restore switch interval
+            assert not errors, errors
+
+            # the bookkeeping is consistent once all cursors are gone
+            assert man.num_evictions()
+            assert man.num_collectable_regions() == man.num_file_handles()
+            man.collect()
+            assert man.num_file_handles() == 0 and man.mapped_memory_size() == 0
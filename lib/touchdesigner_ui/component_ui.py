@@ -7,7 +7,18 @@ import git
 import td
 
 from ..maglapath import Path
+from ..mirror import TDGamMirrorCache
+from ..mirror import remote_repo_name
+from ..package import PACKAGE_EXT
+from ..package import TDGamPackage
+from ..package import write_package
 from ..plugins import TouchDesigner
+from ..spatial import NODE_HEIGHT
+from ..spatial import NODE_WIDTH
+from ..spatial import SpatialIndex
+from ..stash import selection_from_table_text
+from ..stash import selection_to_table_text
+from ..utilities import rscandir
 
 
 class TDGamComponentUI(object):
@@ -64,7 +75,7 @@ class TDGamComponentUI(object):
             # ops
             {
                 "table": self.controllers["ops"],
-                "rows": [o["name"] for o in self.c.selection]
+                "rows": [self.c.ops.names[i] for i in self.c.ops.top_level()]
             },
             # git_branches
             {
@@ -113,67 +124,166 @@ class TDGamComponentUI(object):
                 print(jf.read())
             return False
 
-        rebuilt = self.td_utils.recreate(
-            target_op,
-            self.c.selection,
-            recurse=True)
-
-        for i, recreated_op in enumerate(rebuilt):
-
-            op_data = self.c.selection[i]
-            self._set_pars_from_data_recursive(recreated_op, op_data)
-
-        return rebuilt
+        return self._recreate_selection(target_op)
 
     def stash(self):
         """Save all contained ops' pars, then destroy all ops."""
-        for op_data in self.c.selection:
+        for index in self.c.ops.top_level():
 
-            self._destroy_op(op_data)
+            self._destroy_op(self.c.ops.paths[index])
 
     def dock(self):
         """Dock ops to the placeholder."""
-        for op_data in self.c.selection:
-            self._dock_op(op_data)
+        for index in self.c.ops.top_level():
+            self._dock_op(self.c.ops.paths[index])
         # x, y = self.calculate_placeholder_position()
         # self.select_placeholder.nodeCenterX = x
         # self.select_placeholder.nodeCenterY = y + 50
 
-    def export_json(self):
-        """TODO: Export selection-data as json."""
-        print("export_json")
+    def export_json(self, json_file_path=None):
+        """Export selection-data as json.
+
+        :param json_file_path: path of the json to write, defaults to the
+            component's name in the project folder.
+        :type  json_file_path: str
+        :return: the path to the json just written.
+        :rtype:  str
+        """
+        if not json_file_path:
+            json_file_path = osp.join(td.project.folder, self.c.name + ".json")
+
+        with open(json_file_path, "w") as json_file:
+            json_file.write(json.dumps(self.c.selection, indent=4))
+
+        return json_file_path
+
+    def export_package(self, package_path=None):
+        """Export selection-data and the component's files as a .tdgampkg.
+
+        :param package_path: path of the package to write, defaults to the
+            component's name in the project folder.
+        :type  package_path: str
+        :return: the path to the package just written.
+        :rtype:  str
+        """
+        if not package_path:
+            package_path = osp.join(
+                td.project.folder, self.c.name + PACKAGE_EXT)
+
+        folder = self.c.folder()
+        # the stash json is carried by the package's own stash entry.
+        json_stash = osp.join(folder, self.c.name + ".json")
+        assets = [(osp.relpath(filepath, folder), filepath)
+                  for filepath in rscandir(folder, ignore_dirs=[".git"])
+                  if filepath != json_stash]
+
+        return write_package(
+            package_path, self.c.name, self.c.selection, assets)
 
     def export_table_dat(self):
         """TODO: Export Table-dat containing selection-data."""
         print("export_table_dat")
 
-    def import_from_json(self, json_file_path):
-        """TODO: Create component from a json.
+    def import_from_json(self, json_file_path, target_op=None):
+        """Create component from a json.
 
         :param json_file_path: the path to the json file.
         :type  json_file_path: str
+        :param target_op: Target op to create inside.
+        :type  target_op: td.OP
+        :return: list of recreated td.OP instances.
+        :rtype:  list
+        """
+        with open(json_file_path) as json_file:
+            self.c.selection = json.loads(json_file.read())
+
+        return self._recreate_selection(target_op or self.c.parent_op)
+
+    def import_from_package(self, package_path, target_op=None):
+        """Create component from a .tdgampkg.
+
+        Asset files are streamed out of the package into the component's
+        folder, every entry is checked against its manifest hash.
+
+        :param package_path: the path to the package file.
+        :type  package_path: str
+        :param target_op: Target op to create inside.
+        :type  target_op: td.OP
+        :return: list of recreated td.OP instances.
+        :rtype:  list
         """
-        print("import_from_json")
+        with TDGamPackage(package_path) as package:
+            self.c.selection = package.stash()
+            package.extract_assets(self.c.folder())
+
+        return self._recreate_selection(target_op or self.c.parent_op)
+
+    def import_from_table_dat(self, table_dat_path, target_op=None):
+        """Create component from a stash tableDAT.
 
-    def import_from_table_dat(self, table_dat_path):
-        """TODO: Create component from a tableDAT.
+        The table's text is parsed in one pass, nested children are
+        re-attached to their parents through the 'parent' column.
 
-        :param table_dat_path: the td pat to the tableDAT.
+        :param table_dat_path: the td path to the tableDAT.
         :type  table_dat_path: str
+        :param target_op: Target op to create inside.
+        :type  target_op: td.OP
+        :return: list of recreated td.OP instances.
+        :rtype:  list
         """
-        print("import_from_table_dat")
+        table_dat = td.op(table_dat_path)
+        if not table_dat:
+            logging.error("No tableDAT found at: {}".format(table_dat_path))
+            return []
+
+        self.c.selection = selection_from_table_text(table_dat.text)
+
+        return self._recreate_selection(target_op or self.c.parent_op)
 
-    def import_from_remote_repo(self, remote_repo_url):
-        """TODO: Create component from a remote repo.
+    def import_from_remote_repo(self, remote_repo_url, target_op=None,
+                                depth=None):
+        """Create component from a remote repo.
+
+        The working copy is cloned from the machine-wide mirror cache, next
+        to this component's folder and named after the remote repo. An
+        existing working copy is updated from the mirror instead.
 
         :param remote_repo_url: the remote repo url to pull from.
         :type  remote_repo_url: str
+        :param target_op: Target op to create inside.
+        :type  target_op: td.OP
+        :param depth: create a shallow working copy with this many commits.
+        :type  depth: int
+        :return: list of recreated td.OP instances.
+        :rtype:  list
         """
-        print("import_from_remote_repo")
+        repo_name = remote_repo_name(remote_repo_url)
+        repo_dir = osp.join(osp.dirname(self.c.folder()), repo_name)
+
+        mirror_cache = TDGamMirrorCache()
+        if osp.isdir(repo_dir):
+            repo = mirror_cache.pull(git.Repo(repo_dir), remote_repo_url)
+        else:
+            repo = mirror_cache.clone(remote_repo_url, repo_dir, depth=depth)
+
+        json_file_path = osp.join(repo.working_dir, repo_name + ".json")
+
+        return self.import_from_json(json_file_path, target_op)
 
     def expand(self):
-        """Rebuild the original selection, then delete the placeholder object."""
-        print("expand")
+        """Rebuild the original selection, then delete the placeholder object.
+
+        :return: list of recreated td.OP instances.
+        :rtype:  list
+        """
+        # the ops go back where they were taken from, no need to move them.
+        rebuilt = self._recreate_selection(
+            self.c.parent_op, avoid_overlap=False)
+
+        self._destroy_op(self.select_placeholder.path)
+        self._destroy_op(self.placeholder.path)
+
+        return rebuilt
 
     # -- GIT methods -- #
 
@@ -285,13 +395,13 @@ class TDGamComponentUI(object):
 
         return remote_url
 
-    def _dock_op(self, op_data):
+    def _dock_op(self, op_tdpath):
         """Dock an op to it's placeholder.
 
-        :param op_data: the op data dict for the op to dock.
-        :type  op_data: ParDict
+        :param op_tdpath: path to the op to dock.
+        :type  op_tdpath: str
         """
-        op_ = td.op(op_data["path"])
+        op_ = td.op(op_tdpath)
         op_.dock = self.select_placeholder
 
     def create_stash_dat(self, target_op):
@@ -302,42 +412,108 @@ class TDGamComponentUI(object):
         :return: the stash tableDAT just created.
         :rtype: td.tableDAT
         """
-        titles = list(self.c.selection[0].keys())
         stash_dat = target_op.create(
             td.tableDAT, "stash_{}".format(self.c.name))
 
-        stash_dat.deleteRow(0)
-        stash_dat.appendRow(titles)
-
-        for data_dict in self.c.selection:
-            stash_dat.appendRow(list(data_dict.values()))
+        # assign the whole table at once, one DAT cook instead of one per row.
+        stash_dat.text = selection_to_table_text(self.c.selection)
 
         return stash_dat
 
+    def _recreate_selection(self, target_op, avoid_overlap=True):
+        """Recreate the ops in the component's selection-data.
+
+        :param target_op: Target op to create inside.
+        :type  target_op: td.OP
+        :param avoid_overlap: flag to move the selection clear of ops
+            already in the target network.
+        :type  avoid_overlap: bool
+        :return: list of recreated td.OP instances.
+        :rtype:  list
+        """
+        # materialize the nested selection-data once for the whole rebuild.
+        selection = self.c.selection
+
+        # move the whole selection clear of ops already in the network.
+        offset_x, offset_y = self._placement_offset(target_op) \
+            if avoid_overlap else (0, 0)
+        if offset_x or offset_y:
+            for op_data in selection:
+                op_data["nodeCenter"] = [op_data["nodeCenter"][0] + offset_x,
+                                         op_data["nodeCenter"][1] + offset_y]
+
+        rebuilt = self.td_utils.recreate(
+            target_op,
+            selection,
+            recurse=True)
+
+        for i, recreated_op in enumerate(rebuilt):
+
+            op_data = selection[i]
+            self._set_pars_from_data_recursive(recreated_op, op_data)
+
+        return rebuilt
+
     def calculate_placeholder_position(self):
         """Calculate a position for the placeholder by averaging selected ops.
 
+        Node centers are read from the component's op table, not live ops.
+        The position is moved to the nearest slot not overlapping any op
+        outside the selection.
+
         :return: x, y positions
         :rtype:  tuple
         """
-        x_sum = 0
-        y_sum = 0
-        leftmost = 0
-        topmost = 0
+        x, y = self.c.ops.centroid()
+        selected = set(self.c.ops.paths[i] for i in self.c.ops.top_level())
+
+        return self.network_index(self.parent_op, selected).free_slot(x, y)
 
-        for op_data in self.c.selection:
+    @staticmethod
+    def network_index(parent_op, exclude=()):
+        """Build a spatial index of the ops inside a network.
 
-            op_ = td.op(op_data["path"])
-            x_sum += op_.nodeCenterX
-            y_sum += op_.nodeCenterY
+        :param parent_op: the op whose network to index.
+        :type  parent_op: td.Op
+        :param exclude: td paths of ops to leave out of the index.
+        :type  exclude: set
+        :return: the index of the network.
+        :rtype:  TDGam.SpatialIndex
+        """
+        index = SpatialIndex()
+        for child in parent_op.children:
 
-            leftmost = leftmost if leftmost > op_.nodeX else op_.nodeX
-            topmost = topmost if topmost > op_.nodeY else op_.nodeY
+            if child.path not in exclude:
+                index.insert(child.path, child.nodeCenterX,
+                             child.nodeCenterY, child.nodeWidth,
+                             child.nodeHeight)
 
-        mean_x = x_sum / len(self.c.selection)
-        mean_y = y_sum / len(self.c.selection)
+        return index
 
-        return int(mean_x), int(mean_y)
+    def _placement_offset(self, target_op):
+        """Calculate how far to move the selection to avoid existing ops.
+
+        :param target_op: the op the selection is recreated inside.
+        :type  target_op: td.Op
+        :return: x, y offset, (0, 0) if the stashed position is free.
+        :rtype:  tuple
+        """
+        left, bottom, right, top = self.c.ops.bounds()
+        width = right - left + NODE_WIDTH
+        height = top - bottom + NODE_HEIGHT
+        center_x = (left + right) / 2.0
+        center_y = (bottom + top) / 2.0
+
+        network = self.network_index(target_op)
+        if not network.query_rect(center_x - width / 2.0,
+                                  center_y - height / 2.0,
+                                  center_x + width / 2.0,
+                                  center_y + height / 2.0):
+            return 0, 0
+
+        x, y = network.free_slot(center_x, center_y, width, height)
+
+        return int(x - center_x), int(y - center_y)
 
     def __setup(self):
         """Creates all necessary td-related ops."""
@@ -356,6 +532,10 @@ class TDGamComponentUI(object):
         # set dat comment
         self.stash_dat.comment = 'Created on {0}'.format(self.c.timestamp)
 
+        # position the selectCOMP before creating it, so it isn't counted
+        # as one of the ops it has to stay clear of.
+        x, y = self.calculate_placeholder_position()
+
         # create a selectCOMP where the user made the selection
         self.select_placeholder = self.parent_op.create(
             td.selectCOMP, self.c.name)
@@ -365,15 +545,12 @@ class TDGamComponentUI(object):
             + self.c.name
         self.select_placeholder.par.selectpanel.readOnly = True
         self.select_placeholder.viewer = 1
-
-        # set the select_placeholder position
-        x, y = self.calculate_placeholder_position()
         self.select_placeholder.nodeCenterX = x
         self.select_placeholder.nodeCenterY = y
 
         # destroy originally selected ops
-        for data_pack in self.c.selection:
-            self._destroy_op(data_pack["path"])
+        for index in self.c.ops.top_level():
+            self._destroy_op(self.c.ops.paths[index])
 
         # assign all controller tableDAT's
         self.controllers = {